@@ -0,0 +1,142 @@
+# bench_controllers.py
+#
+# Benchmark every controller mode offline, against the in-memory switches of
+# fakeof.py instead of Mininet and Open vSwitch. Each flow of a traffic.py
+# pattern sends an ARP request for its destination, then its first TCP
+# packet; the packet-ins those would cause are replayed into the controller
+# one at a time. Reports, per mode and fat tree size, the flow_mods of the
+# static table install, packet-ins per second, p50/p99 handler latency and
+# flow_mods sent per flow during the replay.
+#
+# Example usage:
+#   $ python bench/bench_controllers.py
+#   $ python bench/bench_controllers.py --k 4 8 --pattern stride2 --rounds 8
+#   $ python bench/bench_controllers.py --modes reactive gff --no-arp-proxy
+
+from argparse import ArgumentParser
+from timeit import default_timer
+
+import numpy as np
+
+from fakeof import (OFPT_FLOW_MOD, arp_request, connect_switches,
+                    install_fake_openflow, message_count, tcp_frame)
+
+from controllers.hederaController import HederaController
+from controllers.riplpox import RipLController
+from controllers.util import getRouting, hostLocations
+from ripllib.dctopo import FatTreeTopo
+from traffic import NO_DST, TRAFFIC
+
+# Mode name -> controller factory taking (topo, arp_proxy)
+MODES = (
+    ('reactive', lambda t, arp: RipLController(t, getRouting('hashed', t),
+                                               'reactive', arp)),
+    ('proactive', lambda t, arp: RipLController(t, getRouting('hashed', t),
+                                                'proactive', arp)),
+    ('hybrid', lambda t, arp: RipLController(t, getRouting('st', t),
+                                             'hybrid', arp)),
+    ('aggregate', lambda t, arp: RipLController(t, getRouting('hashed', t),
+                                                'aggregate', arp)),
+    ('gff', lambda t, arp: HederaController(t, getRouting('hashed', t),
+                                            poll_period = 0, arp_proxy = arp,
+                                            schedule = 'gff')),
+)
+
+# Proactive and aggregate switches route every host pair up front, so only
+# the ARP requests are replayed to them.
+TABLE_HIT_MODES = ('proactive', 'aggregate')
+
+# Hybrid VLAN tags number only four core switches.
+HYBRID_MAX_K = 4
+
+parser = ArgumentParser(description='Benchmark controller modes offline')
+parser.add_argument('--k', type=int, nargs='+', default=[4, 8, 16],
+                    help='Fat tree sizes to benchmark')
+parser.add_argument('--modes', nargs='+', default=[m[0] for m in MODES],
+                    choices=[m[0] for m in MODES], help='Modes to benchmark')
+parser.add_argument('--pattern', default='random', choices=sorted(TRAFFIC),
+                    help='traffic.py pattern giving each host its destination')
+parser.add_argument('--rounds', type=int, default=4,
+                    help='Flows per sending host, on distinct source ports')
+parser.add_argument('--no-arp-proxy', dest='arp_proxy', action='store_false',
+                    help='Flood ARP requests and learn MACs instead of '
+                         'answering from the topology')
+parser.add_argument('--seed', type=int, default=244, help='Random seed')
+
+
+def flow_frames(k, pattern, rounds, seed, hosts):
+    """
+    Return [(src host, ARP request frame, first TCP frame)] of every flow.
+
+    Round r of a pattern's matrix uses source port 10000 + r.
+    """
+    dsts = TRAFFIC[pattern](k, np.random.RandomState(seed))
+    flows = []
+    for r in xrange(rounds):
+        for src, dst in enumerate(dsts.tolist()):
+            if dst == NO_DST:
+                continue
+            ip, mac = hosts[src][:2]
+            dst_ip, dst_mac = hosts[dst][:2]
+            flows.append((src, arp_request(mac, ip, dst_ip),
+                          tcp_frame(mac, dst_mac, ip, dst_ip, 10000 + r,
+                                    5001)))
+    return flows
+
+
+def replay(controller, events):
+    "Handle each PacketIn in turn; return the handler latencies in seconds."
+    latencies = np.empty(len(events))
+    for i, event in enumerate(events):
+        start = default_timer()
+        controller._handle_PacketIn(event)
+        latencies[i] = default_timer() - start
+    return latencies
+
+
+def bench(k, args):
+    t = FatTreeTopo(k)
+    hosts = hostLocations(t)
+    flows = flow_frames(k, args.pattern, args.rounds, args.seed, hosts)
+    print 'k=%d: %d flows of %s' % (k, len(flows), args.pattern)
+    print '  %-10s %12s %10s %13s %9s %9s %14s' % (
+        'mode', 'setup mods', 'setup s', 'packet-ins/s', 'p50 us', 'p99 us',
+        'flow_mods/flow')
+    for name, make in MODES:
+        if name not in args.modes:
+            continue
+        if name == 'hybrid' and k > HYBRID_MAX_K:
+            print '  %-10s skipped: VLAN tags only encode k=%d' % (
+                name, HYBRID_MAX_K)
+            continue
+
+        controller = make(t, args.arp_proxy)
+        start = default_timer()
+        connections = connect_switches(controller, t)
+        setup = default_timer() - start
+        setup_mods = message_count(connections, OFPT_FLOW_MOD)
+
+        events = []
+        for src, arp_frame, tcp in flows:
+            conn = connections[hosts[src][2]]
+            port = hosts[src][3]
+            events.append(conn.packet_in(port, arp_frame))
+            if name not in TABLE_HIT_MODES:
+                events.append(conn.packet_in(port, tcp))
+
+        latencies = replay(controller, events) * 1e6
+        flow_mods = message_count(connections, OFPT_FLOW_MOD) - setup_mods
+        print '  %-10s %12d %10.2f %13.0f %9.1f %9.1f %14.2f' % (
+            name, setup_mods, setup, len(events) / latencies.sum() * 1e6,
+            np.percentile(latencies, 50), np.percentile(latencies, 99),
+            float(flow_mods) / len(flows))
+
+
+def main():
+    args = parser.parse_args()
+    install_fake_openflow()
+    for k in args.k:
+        bench(k, args)
+
+if __name__ == '__main__':
+    main()
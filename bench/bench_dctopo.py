@@ -0,0 +1,86 @@
+# bench_dctopo.py
+#
+# Benchmark the StructuredTopo layer and neighbour accessors against the
+# full-graph scans they replaced, on FatTreeTopos of increasing size.
+#
+# Example usage:
+#   $ python bench/bench_dctopo.py
+#   $ python bench/bench_dctopo.py --k 4 16 48
+
+import os
+import sys
+from argparse import ArgumentParser
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from ripllib.dctopo import FatTreeTopo
+
+# Keep calling each accessor until this many seconds have passed
+MIN_SECONDS = 0.2
+
+parser = ArgumentParser(description='Benchmark StructuredTopo lookups')
+parser.add_argument('--k', type=int, nargs='+', default=[4, 16, 48],
+                    help='Fat tree sizes to benchmark')
+
+
+def scan_layer_nodes(t, layer):
+    return [n for n in t.g.nodes() if t.layer(n) == layer]
+
+
+def scan_up_nodes(t, name):
+    layer = t.layer(name) - 1
+    return [n for n in t.g[name] if t.layer(n) == layer]
+
+
+def scan_down_nodes(t, name):
+    layer = t.layer(name) + 1
+    return [n for n in t.g[name] if t.layer(n) == layer]
+
+
+def seconds_per_call(fn, args_list):
+    """
+    Call fn once per argument tuple, repeating the whole list until
+    MIN_SECONDS have passed, and return the mean time per call.
+    """
+    calls = 0
+    start = time()
+    while True:
+        for args in args_list:
+            fn(*args)
+        calls += len(args_list)
+        elapsed = time() - start
+        if elapsed >= MIN_SECONDS:
+            return elapsed / calls
+
+
+def bench(k):
+    start = time()
+    t = FatTreeTopo(k)
+    print 'k=%d: %d nodes, built in %0.2fs' % (k, len(t.g.nodes()),
+                                                time() - start)
+
+    layers = [(t, l) for l in range(len(t.node_specs))]
+    switches = [(t, n) for n in t.switches()]
+    cases = (('layer_nodes', scan_layer_nodes, t.layer_nodes,
+              layers, [(l,) for _, l in layers]),
+             ('up_nodes', scan_up_nodes, t.up_nodes,
+              switches, [(n,) for _, n in switches]),
+             ('down_nodes', scan_down_nodes, t.down_nodes,
+              switches, [(n,) for _, n in switches]))
+
+    for name, scan, indexed, scan_args, indexed_args in cases:
+        before = seconds_per_call(scan, scan_args)
+        after = seconds_per_call(indexed, indexed_args)
+        print '  %-12s scan %10.2fus  indexed %6.2fus  speedup %8.1fx' %\
+              (name, before * 1e6, after * 1e6, before / after)
+
+
+def main():
+    args = parser.parse_args()
+    for k in args.k:
+        bench(k)
+
+if __name__ == '__main__':
+    main()
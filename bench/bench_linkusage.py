@@ -0,0 +1,109 @@
+# bench_linkusage.py
+#
+# Benchmark Global First Fit placement with the array-backed LinkUsage table
+# against the string-keyed link dict it replaced, on FatTreeTopos of
+# increasing size. Both place the same random flows and must agree.
+#
+# Example usage:
+#   $ python bench/bench_linkusage.py
+#   $ python bench/bench_linkusage.py --k 4 16 32 --flows 5000
+
+import os
+import random
+import sys
+from argparse import ArgumentParser
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from ripllib.dctopo import FatTreeTopo
+from ripllib.linkusage import LinkUsage
+from ripllib.routing import FatTreeRouting
+
+CAPACITY = 1
+
+parser = ArgumentParser(description='Benchmark GFF link reservations')
+parser.add_argument('--k', type=int, nargs='+', default=[4, 16, 32],
+                    help='Fat tree sizes to benchmark')
+parser.add_argument('--flows', type=int, default=2000,
+                    help='Flows to place per fat tree')
+parser.add_argument('--seed', type=int, default=244, help='Random seed')
+
+
+class DictUsage(object):
+    "The old HederaController scheme: one string key per directed link."
+
+    def __init__(self, t):
+        self.r = FatTreeRouting(t)
+        self.link_usage = {}
+        for layer in (t.LAYER_EDGE, t.LAYER_AGG):
+            for sw_name in t.layer_nodes(layer):
+                for up_name in t.up_nodes(sw_name):
+                    self.link_usage[self._link_key(sw_name, up_name)] = 0
+                    self.link_usage[self._link_key(up_name, sw_name)] = 0
+
+    def _link_key(self, sw1_name, sw2_name):
+        return sw1_name + "::" + sw2_name
+
+    def first_fit(self, src, dst, flow_demand):
+        paths = self.r.get_route(src, dst, None, True)
+        for x in range(len(paths)):
+            path = paths[x]
+            flow_fits = True
+            for i in range(0, len(path) - 1):
+                link_key = self._link_key(path[i], path[i + 1])
+                if self.link_usage[link_key] + flow_demand > CAPACITY:
+                    flow_fits = False
+                    break
+            if flow_fits:
+                for i in range(0, len(path) - 1):
+                    self.link_usage[self._link_key(path[i], path[i + 1])] += \
+                        flow_demand
+                    self.link_usage[self._link_key(path[i + 1], path[i])] += \
+                        flow_demand
+                return x
+        return None
+
+
+def bench(k, num_flows, seed):
+    t = FatTreeTopo(k)
+    edges = t.layer_nodes(t.LAYER_EDGE)
+    rng = random.Random(seed)
+    # Demands are binary fractions, so sums are exact in both schemes.
+    flows = [(rng.randrange(len(edges)), rng.randrange(len(edges)),
+              rng.choice((0.0625, 0.125, 0.25, 0.5)))
+             for _ in range(num_flows)]
+    names = sorted(edges, key = lambda n: (t.id_gen(name = n).pod,
+                                           t.id_gen(name = n).sw))
+    print 'k=%d: %d flows over %d edge switches' % (k, num_flows, len(edges))
+
+    old = DictUsage(t)
+    start = time()
+    old_fits = [old.first_fit(names[s], names[d], demand)
+                for s, d, demand in flows]
+    before = (time() - start) / num_flows
+
+    new = LinkUsage(t, CAPACITY)
+    start = time()
+    new_fits = []
+    for s, d, demand in flows:
+        x = new.first_fit(s, d, demand)
+        if x is not None:
+            new.reserve(s, d, x, demand)
+        new_fits.append(x)
+    after = (time() - start) / num_flows
+
+    assert old_fits == new_fits, 'placements differ'
+    placed = len([x for x in new_fits if x is not None])
+    print '  dict %8.1fus  array %8.1fus  speedup %6.1fx  (%d placed)' %\
+          (before * 1e6, after * 1e6, before / after, placed)
+
+
+def main():
+    args = parser.parse_args()
+    for k in args.k:
+        bench(k, args.flows, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# bench_packetin.py
+#
+# Benchmark the reactive packet-in path of both controllers: packet-ins per
+# second for the first packet of each flow of a random traffic matrix,
+# against in-memory switches (see fakeof.py), with the OpenFlow bytes sent
+# back per packet-in. Host tables are seeded (ARP proxy mode), so every
+# packet-in installs a route.
+#
+# Example usage:
+#   $ python bench/bench_packetin.py
+#   $ python bench/bench_packetin.py --k 4 8 16 --packets 20000
+
+from argparse import ArgumentParser
+from time import time
+
+import numpy as np
+
+from fakeof import connect_switches, install_fake_openflow, tcp_frame
+
+from controllers.hederaController import HederaController
+from controllers.riplpox import RipLController
+from controllers.util import getRouting, hostLocations
+from ripllib.dctopo import FatTreeTopo
+from traffic import traffic_random
+
+parser = ArgumentParser(description='Benchmark controller packet-ins')
+parser.add_argument('--k', type=int, nargs='+', default=[4, 8, 16],
+                    help='Fat tree sizes to benchmark')
+parser.add_argument('--packets', type=int, default=10000,
+                    help='Packet-ins per controller and fat tree')
+parser.add_argument('--seed', type=int, default=244, help='Random seed')
+
+CONTROLLERS = (
+    ('riplpox', lambda t: RipLController(t, getRouting('hashed', t),
+                                         'reactive', arp_proxy = True)),
+    ('hedera', lambda t: HederaController(t, getRouting('hashed', t),
+                                          poll_period = 0, arp_proxy = True)),
+)
+
+
+def packet_ins(t, connections, num_packets, seed):
+    "Return the first-packet PacketIn of num_packets distinct flows."
+    hosts = hostLocations(t)
+    dsts = traffic_random(t.k, np.random.RandomState(seed))
+    events = []
+    for i in xrange(num_packets):
+        src = i % len(hosts)
+        ip, mac, dpid, port = hosts[src]
+        dst_ip, dst_mac = hosts[dsts[src]][:2]
+        frame = tcp_frame(mac, dst_mac, ip, dst_ip, 10000 + i / len(hosts),
+                          5001)
+        events.append(connections[dpid].packet_in(port, frame))
+    return events
+
+
+def bench(k, num_packets, seed):
+    t = FatTreeTopo(k)
+    print 'k=%d: %d packet-ins' % (k, num_packets)
+    for name, make in CONTROLLERS:
+        controller = make(t)
+        connections = connect_switches(controller, t)
+        events = packet_ins(t, connections, num_packets, seed)
+        sent_before = sum(c.bytes_sent for c in connections.itervalues())
+
+        start = time()
+        for event in events:
+            controller._handle_PacketIn(event)
+        elapsed = time() - start
+
+        sent = sum(c.bytes_sent for c in connections.itervalues())
+        print '  %-8s %9.0f packet-ins/s  %6.0f bytes sent per packet-in' %\
+              (name, num_packets / elapsed,
+               float(sent - sent_before) / num_packets)
+
+
+def main():
+    args = parser.parse_args()
+    install_fake_openflow()
+    for k in args.k:
+        bench(k, args.packets, args.seed)
+
+if __name__ == '__main__':
+    main()
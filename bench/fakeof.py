@@ -0,0 +1,148 @@
+# fakeof.py
+#
+# In-memory OpenFlow switches for benchmarking the POX controllers without
+# Mininet or Open vSwitch. Registers a stand-in for core.openflow, connects
+# one FakeConnection per switch of the topology, and feeds the controller
+# PacketIn events built from raw frames. Everything a controller sends is
+# packed, as the real connection would, and tallied by OpenFlow message
+# type. Needs POX on the path (~/pox by default).
+
+import os
+import struct
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+POX_DIR = os.path.expanduser(os.environ.get('POX_DIR', '~/pox'))
+if os.path.isdir(POX_DIR):
+    sys.path.insert(1, POX_DIR)
+
+from pox.core import core
+from pox.openflow import PacketIn
+import pox.openflow.libopenflow_01 as of
+
+# OpenFlow 1.0 message types
+OFPT_PACKET_OUT = 13
+OFPT_FLOW_MOD = 14
+OFPT_SET_CONFIG = 9
+
+# What Open vSwitch sends of an unbuffered packet_in before set_config
+DEFAULT_MISS_SEND_LEN = 128
+
+
+class FakeOpenFlow(object):
+    "Stands in for core.openflow: controllers only add listeners to it."
+
+    def addListeners(self, listener, priority = 0):
+        return []
+
+
+class FakeFeatures(object):
+    def __init__(self, ports):
+        self.ports = ports
+
+
+class FakeConnection(object):
+    """
+    One switch's connection. Buffers packet_ins like Open vSwitch, keeping
+    only miss_send_len bytes of each frame, and counts what it is sent.
+    """
+
+    def __init__(self, dpid, ports = ()):
+        self.dpid = dpid
+        self.features = FakeFeatures(list(ports))
+        self.miss_send_len = DEFAULT_MISS_SEND_LEN
+        self.next_buffer_id = 0
+        self.counts = {}  # [OpenFlow message type] -> messages received
+        self.bytes_sent = 0
+
+    def addListeners(self, listener):
+        return []
+
+    def removeListeners(self, listeners):
+        pass
+
+    def send(self, msg):
+        if not isinstance(msg, bytes):
+            msg = msg.pack()
+        self.bytes_sent += len(msg)
+        offset = 0
+        while offset < len(msg):
+            msg_type, length = struct.unpack_from('!xBH', msg, offset)
+            self.counts[msg_type] = self.counts.get(msg_type, 0) + 1
+            if msg_type == OFPT_SET_CONFIG:
+                self.miss_send_len = struct.unpack_from('!H', msg,
+                                                        offset + 10)[0]
+            offset += length
+
+    def packet_in(self, in_port, frame, buffered = True):
+        "Return the PacketIn event for a frame arriving on a port."
+        msg = of.ofp_packet_in(in_port = in_port, total_len = len(frame))
+        if buffered:
+            msg.buffer_id = self.next_buffer_id
+            self.next_buffer_id += 1
+            msg.data = frame[:self.miss_send_len]
+        else:
+            msg.data = frame
+        return PacketIn(self, msg)
+
+
+class FakeEvent(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def install_fake_openflow():
+    "Register FakeOpenFlow as core.openflow, once."
+    if not isinstance(getattr(core, 'openflow', None), FakeOpenFlow):
+        core.register('openflow', FakeOpenFlow())
+
+
+def connect_switches(controller, topo):
+    """
+    Bring up a FakeConnection for every switch of a topology.
+
+    @return connections dict of dpid to FakeConnection
+    """
+    connections = {}
+    for name in topo.switches():
+        dpid = topo.id_gen(name = name).dpid
+        conn = FakeConnection(dpid)
+        connections[dpid] = conn
+        controller._handle_ConnectionUp(FakeEvent(dpid = dpid,
+                                                  connection = conn))
+    return connections
+
+
+def message_count(connections, msg_type):
+    "Return how many messages of a type all connections were sent."
+    return sum(conn.counts.get(msg_type, 0)
+               for conn in connections.itervalues())
+
+
+def mac_raw(mac):
+    return ''.join(chr(int(b, 16)) for b in mac.split(':'))
+
+
+def ip_raw(ip):
+    return ''.join(chr(int(b)) for b in ip.split('.'))
+
+
+def tcp_frame(src_mac, dst_mac, src_ip, dst_ip, src_port, dst_port,
+              payload_len = 1448):
+    "Return a raw Ethernet/IPv4/TCP frame, as iperf would send."
+    tcp_header = struct.pack('!HHIIBBHHH', src_port, dst_port, 0, 0, 5 << 4,
+                             0x18, 65535, 0, 0)
+    ip_len = 20 + len(tcp_header) + payload_len
+    ip_header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, ip_len, 0, 0x4000, 64,
+                            6, 0, ip_raw(src_ip), ip_raw(dst_ip))
+    return (mac_raw(dst_mac) + mac_raw(src_mac) + struct.pack('!H', 0x0800) +
+            ip_header + tcp_header + '\0' * payload_len)
+
+
+def arp_request(src_mac, src_ip, dst_ip):
+    "Return a raw broadcast ARP request frame."
+    body = struct.pack('!HHBBH', 1, 0x0800, 6, 4, 1)
+    body += mac_raw(src_mac) + ip_raw(src_ip) + '\0' * 6 + ip_raw(dst_ip)
+    return ('\xff' * 6 + mac_raw(src_mac) + struct.pack('!H', 0x0806) +
+            body + '\0' * 18)
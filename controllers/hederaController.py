@@ -1,39 +1,67 @@
 """
 HederaController
-To do: poll edge switches for flow byte counts
-When a flow exceeds threshold (>10 percent of host link capacity)
-do a demand estimation
-find a link which will accommodate that demand and reserve
+Places each new flow with Global First Fit on its first packet, then polls
+edge switches for flow byte counts. When a flow crosses the elephant
+threshold (10 percent of host link capacity), find a path which will
+accommodate its estimated demand and reserve it; when it drops below,
+release its reservation.
+
+With the anneal schedule, new flows are hashed instead, and every poll
+period all elephants are placed together by simulated annealing.
 """
 
 import logging
 import random
+from time import time
 from struct import pack
 from zlib import crc32
 
 from pox.core import core
-from pox.lib.util import dpidToStr
+from pox.lib.util import dpidToStr, str_to_bool
 import pox.openflow.libopenflow_01 as of
 from pox.lib.revent import EventMixin
-from pox.lib.addresses import EthAddr
+from pox.lib.recoco import Timer
+from pox.lib.addresses import EthAddr, IPAddr
+from pox.lib.packet.arp import arp
+from pox.lib.packet.ethernet import ethernet
 from pox.lib.packet.ipv4 import ipv4
 from pox.lib.packet.udp import udp
 from pox.lib.packet.tcp import tcp
 
 from ripllib.mn import topos
+from ripllib.pathtable import PathTable
+from ripllib.routing import CachedRouting
+from ripllib.linkusage import LinkUsage
+from ripllib.demand import DemandEstimator, EPSILON as DEMAND_EPSILON
+from ripllib.flowindex import FlowIndex, NO_PATH
+from ripllib.anneal import Annealer, DEFAULT_ITERATIONS, DEFAULT_DEADLINE
 
-from util import buildTopo, getRouting
+from util import buildTopo, getRouting, hostLocations
+from util import ethType, headerMatch, ETH_TYPE_ARP, ETH_TYPE_IP, HEADER_LEN
 
 log = core.getLogger()
 log.setLevel(logging.WARNING)
 
-# Number of bytes to send for packet_ins
+# Number of bytes to send for packet_ins.  Unknown destinations are flooded
+# from the controller, which needs whole frames; with the ARP proxy every
+# host is known, so just the headers we match on are enough, and switches
+# buffer the rest until a flow_mod or packet_out releases it.
 MISS_SEND_LEN = 2000
+PROXY_MISS_SEND_LEN = HEADER_LEN
 
 
 IDLE_TIMEOUT = 10
 CAPACITY = 1
 
+# Seconds between flow stats polls of the edge switches
+POLL_PERIOD = 5
+
+# Fraction of host link capacity above which a flow is an elephant
+ELEPHANT_THRESHOLD = 0.1
+
+# Elephant placement algorithms
+SCHEDULES = ('gff', 'anneal')
+
 
 # Borrowed from pox/forwarding/l2_multi
 class Switch (object):
@@ -69,19 +97,35 @@ class Switch (object):
     msg.actions.append(of.ofp_action_output(port = outport))
     self.connection.send(msg)
 
+  def send_packet_data_ports(self, outports, data = None):
+    "Send one packet_out that outputs the packet on every given port."
+    msg = of.ofp_packet_out(in_port=of.OFPP_NONE, data = data)
+    for outport in outports:
+      msg.actions.append(of.ofp_action_output(port = outport))
+    self.connection.send(msg)
+
   def send_packet_bufid(self, outport, buffer_id = None):
     msg = of.ofp_packet_out(in_port=of.OFPP_NONE)
     msg.actions.append(of.ofp_action_output(port = outport))
     msg.buffer_id = buffer_id
     self.connection.send(msg)
 
+  def send_packet_bufid_ports(self, outports, buffer_id):
+    "Release a buffered packet on every given port; no ports drops it."
+    msg = of.ofp_packet_out(in_port=of.OFPP_NONE)
+    for outport in outports:
+      msg.actions.append(of.ofp_action_output(port = outport))
+    msg.buffer_id = buffer_id
+    self.connection.send(msg)
+
   def install(self, port, match, buf = None, idle_timeout = 0, hard_timeout = 0,
-              priority = of.OFP_DEFAULT_PRIORITY):
+              priority = of.OFP_DEFAULT_PRIORITY, flags = 0):
     msg = of.ofp_flow_mod()
     msg.match = match
     msg.idle_timeout = idle_timeout
     msg.hard_timeout = hard_timeout
     msg.priority = priority
+    msg.flags = flags
     msg.actions.append(of.ofp_action_output(port = port))
     msg.buffer_id = buf
     self.connection.send(msg)
@@ -108,116 +152,206 @@ def sep():
 
 class HederaController(object):
 
-  def __init__ (self, t, r):
+  def __init__ (self, t, r, poll_period = POLL_PERIOD, arp_proxy = False,
+                schedule = 'gff', iterations = DEFAULT_ITERATIONS,
+                deadline = DEFAULT_DEADLINE):
     self.switches = {}  # Switches seen: [dpid] -> Switch
     self.t = t  # Master Topo object, passed in and never modified.
     self.r = r  # Master Routing object, passed in and reused.
     self.macTable = {}  # [mac] -> (dpid, port)
-    self.paths = {}
-    self.flows = {}
-    self.link_usage = {}
+    self.flood_ports = None  # [(dpid, host ports)] of every edge switch
+    self.flood_msgs_saved = 0  # packet_outs avoided by multi-port floods
+    self.arp_table = None  # [ip] -> mac of every host, in ARP proxy mode
+    if arp_proxy:
+      self._seed_hosts()
+    self.path_table = None  # PathTable, built once all switches are up
+    self.flows = FlowIndex(t.k / 2)  # Active flows, by 5-tuple flow_key
+    self.reservations = {}  # [flow_key] -> (link ids, demand)
+    self.link_usage = None  # LinkUsage, built with the path table
+    self.demands = DemandEstimator(len(t.hosts()))  # Natural flow demands
+    self.schedule = schedule
+    self.anneal_args = (iterations, deadline)
+    self.annealer = None  # Annealer, built with the path table if annealing
+
+    # Flow stats, per edge switch, for flows sent by hosts below it.
+    self.edge_dpids = []
+    self.flow_bytes = {}  # [dpid] -> {flow_key: byte count at last poll}
+    self.poll_times = {}  # [dpid] -> time of last stats reply
+    self.elephants = set()  # flow_keys last classified as elephants
+    self.elephant_flows = {}  # [flow_key] -> (hosts, matches), if annealing
+    self.poll_period = poll_period
+    host_speed = t.edge_specs[-1].speed  # Gbps
+    self.elephant_rate = ELEPHANT_THRESHOLD * host_speed * 1e9 / 8  # bytes/s
 
     # TODO: generalize all_switches_up to a more general state machine.
     self.all_switches_up = False  # Sequences event handling.
     core.openflow.addListeners(self, priority=0)
+    if poll_period:
+      Timer(poll_period, self._poll_flow_stats, recurring = True)
 
   def _raw_dpids(self, arr):
     "Convert a list of name strings (from Topo object) to numbers."
     return [self.t.id_gen(name = a).dpid for a in arr]
 
-  def _flow_key(self, src_ip, dst_ip):
-    return str(src_ip) + "::" + str(dst_ip)   
+  def _flow_key(self, match):
+    "Return the 5-tuple of an exact match; _ecmp_hash hashes the same fields."
+    return (match.nw_src.toUnsigned(), match.nw_dst.toUnsigned(),
+            match.nw_proto, match.tp_src, match.tp_dst)
 
   def _path_key(self, src_sw_name, dst_sw_name):
-     return src_sw_name + "::" + dst_sw_name 
-
-  def _link_key(self, sw1_name, sw2_name):
-      return sw1_name + "::" + sw2_name
-
-  def _ecmp_hash(self, packet):
-    "Return an ECMP-style 5-tuple hash for TCP/IP packets, otherwise 0."
-    hash_input = [0] * 5
-    if isinstance(packet.next, ipv4):
-      ip = packet.next
-      hash_input[0] = ip.srcip.toUnsigned()
-      hash_input[1] = ip.dstip.toUnsigned()
-      hash_input[2] = ip.protocol
-      if isinstance(ip.next, tcp) or isinstance(ip.next, udp):
-        l4 = ip.next
-        hash_input[3] = l4.srcport
-        hash_input[4] = l4.dstport
-        return crc32(pack('LLHHH', *hash_input))
-    return 0
-
-  def _global_first_fit(self, flow_key, path_key, flow_demand, packet):
-    if (flow_key in self.flows and self.flows[flow_key] != -1):
-      return self.paths[path_key][self.flows[flow_key]]
-    
-    for x, path in enumerate(self.paths[path_key]):
-      flow_fits = True
-      path_len = len(path)
-      for i in range(0, path_len - 1):
-        link_key = self._link_key(path[i], path[i + 1])
-        reverse_link_key = self._link_key(path[i + 1], path[i])
-        if self.link_usage[link_key] + flow_demand > CAPACITY:
-          flow_fits = False
-          break
-      if flow_fits:
-        for i in range(0, path_len - 1):
-          link_key = self._link_key(path[i], path[i + 1])
-          reverse_link_key = self._link_key(path[i + 1], path[i])
-          self.link_usage[link_key] += flow_demand
-          self.link_usage[reverse_link_key] += flow_demand
-        self.flows[flow_key] = x
-        return path
-
-    hash_ = self._ecmp_hash(packet)
-    choice = hash_ % len(self.paths[path_key])
-    path = sorted(self.paths[path_key])[choice]
-    return path
-
-  def _get_flow_demand(self, dst_ip):
-    suffix = "::" + str(dst_ip)
-
-    num_dst_incoming_flows = 0
-    for key in self.flows:
-      if key.endswith(suffix):
-        num_dst_incoming_flows += 1
-    return 1/num_dst_incoming_flows
-
-  def _install_reactive_path(self, event, out_dpid, final_out_port, packet):
-    "Install entries on route between two switches."
-
-    if isinstance(packet.next, ipv4):
-      ip = packet.next
-
-      in_name = self.t.id_gen(dpid = event.dpid).name_str()
-      out_name = self.t.id_gen(dpid = out_dpid).name_str()
-
-      flow_key = self._flow_key(ip.srcip, ip.dstip)
+    "Return the edge indices of two switches, or None unless both are edges."
+    src_idx = self.path_table.edge_index(src_sw_name)
+    dst_idx = self.path_table.edge_index(dst_sw_name)
+    if src_idx is None or dst_idx is None:
+      return None
+    return (src_idx, dst_idx)
+
+  def _ecmp_hash(self, match):
+    "Return an ECMP-style 5-tuple hash for TCP/UDP matches, otherwise 0."
+    if match.tp_src is None:
+      return 0
+    return crc32(pack('LLHHH', match.nw_src.toUnsigned(),
+                      match.nw_dst.toUnsigned(), match.nw_proto,
+                      match.tp_src, match.tp_dst))
+
+  def _global_first_fit(self, flow_key, path_key, flow_demand, match):
+    src_idx, dst_idx = path_key
+    x = self.flows.path(flow_key)
+    if x != NO_PATH:
+      return self.path_table.path_names(src_idx, dst_idx, x)
+
+    # Annealing places flows only in its scheduling rounds.
+    if self.annealer is None:
+      x = self._first_fit(flow_key, path_key, flow_demand)
+      if x is not None:
+        return self.path_table.path_names(src_idx, dst_idx, x)
+
+    hash_ = self._ecmp_hash(match)
+    return self.path_table.route(src_idx, dst_idx, hash_)
+
+  def _first_fit(self, flow_key, path_key, flow_demand):
+    "Reserve the first path with room for a flow; return its index or None."
+    src_idx, dst_idx = path_key
+    x = self.link_usage.first_fit(src_idx, dst_idx, flow_demand)
+    if x is None:
+      return None
+    links = self.link_usage.reserve(src_idx, dst_idx, x, flow_demand)
+    self.flows.set_path(flow_key, x)
+    self.reservations[flow_key] = (links, flow_demand)
+    return x
+
+  def _release(self, flow_key):
+    "Release the links reserved by a flow, if any."
+    reservation = self.reservations.pop(flow_key, None)
+    if reservation is None:
+      return
+    links, flow_demand = reservation
+    self.link_usage.release(links, flow_demand)
+    self.flows.set_path(flow_key, NO_PATH)
+
+  def _update_reservations(self, src_hosts):
+    "Re-reserve the placed flows of senders whose demands were re-estimated."
+    half = self.t.k / 2
+    for src_host in src_hosts:
+      for flow_key in self.flows.sent_by(src_host):
+        reservation = self.reservations.get(flow_key)
+        if reservation is None:
+          continue
+        links, old_demand = reservation
+        dst_host = self.flows.hosts(flow_key)[1]
+        flow_demand = self.demands.demand(src_host, dst_host)
+        if abs(flow_demand - old_demand) <= DEMAND_EPSILON:
+          continue
+        self.link_usage.release(links, old_demand)
+        links = self.link_usage.reserve(src_host / half, dst_host / half,
+                                        self.flows.path(flow_key), flow_demand)
+        self.reservations[flow_key] = (links, flow_demand)
+
+  def _host_index(self, ip):
+    "Return host index of a 10.pod.sw.host address."
+    addr = ip.toUnsigned()
+    half = self.t.k / 2
+    pod, sw, host = (addr >> 16) & 0xff, (addr >> 8) & 0xff, addr & 0xff
+    return pod * half * half + sw * half + host - 2
+
+  def _host_name(self, host_idx):
+    "Return name of a host from its host index."
+    half = self.t.k / 2
+    pod, rest = divmod(host_idx, half * half)
+    return self.t.id_gen(pod, rest / half, rest % half + 2).name_str()
+
+  def _install_reactive_path(self, event, out_dpid, final_out_port, match):
+    """
+    Install entries on route between two switches.
+
+    IPv4 flows between edge switches are placed by Global First Fit; other
+    packets take the routing engine's path.
+    """
+    in_name = self.t.id_gen(dpid = event.dpid).name_str()
+    out_name = self.t.id_gen(dpid = out_dpid).name_str()
+
+    route = None
+    path_key = None
+    if (match.dl_type == ETH_TYPE_IP and match.nw_src is not None and
+        self.path_table is not None):
       path_key = self._path_key(in_name, out_name)
-
-      route = None
-      if path_key in self.paths:
-        self.flows[flow_key] = -1
-        flow_demand = self._get_flow_demand(ip.dstip)
-        route = self._global_first_fit(flow_key, path_key, flow_demand, packet)
+    if path_key is not None:
+      flow_key = self._flow_key(match)
+      src_host = self._host_index(match.nw_src)
+      dst_host = self._host_index(match.nw_dst)
+      if self.flows.add(flow_key, src_host, dst_host):
+        self._update_reservations(self.demands.add_flow(src_host, dst_host))
+        if self.annealer is None:
+          self.elephants.add(flow_key)  # Placed as one until first polled.
+      flow_demand = self.demands.demand(src_host, dst_host)
+      route = self._global_first_fit(flow_key, path_key, flow_demand, match)
+    else:
+      # Not IPv4, or not edge to edge: an agg or core switch whose entry
+      # expired before the ingress edge's raised this packet-in.
+      hash_ = self._ecmp_hash(match)
+      route = self.r.get_route(in_name, out_name, hash_, False)
+
+    log.info("route: %s" % route)
+    self._install_route(route, match, final_out_port, event.ofp.buffer_id)
+
+  def _install_route(self, route, match, final_out_port, buf = None):
+    """
+    Install one match on every switch of a route.
+
+    Only the first switch, the sender's edge, reports when its entry expires.
+    Entries go in from the far end, so the first switch's, which releases
+    buffer buf, is installed last.
+    """
+    ports = self.t.path_ports(route)
+    for i in reversed(xrange(len(route))):
+      node_dpid = self.t.id_gen(name = route[i]).dpid
+      if i < len(ports):
+        out_port = ports[i][0]
+      else:
+        out_port = final_out_port
+      if i == 0:
+        self.switches[node_dpid].install(out_port, match, buf, idle_timeout =
+                                         IDLE_TIMEOUT,
+                                         flags = of.OFPFF_SEND_FLOW_REM)
       else:
-        hash_ = self._ecmp_hash(packet)
-        route = self.r.get_route(in_name, out_name, hash_, False)
-
-      log.info("route: %s" % route)
-      match = of.ofp_match.from_packet(packet)
-      for i, node in enumerate(route):
-        node_dpid = self.t.id_gen(name = node).dpid
-        if i < len(route) - 1:
-          next_node = route[i + 1]
-          out_port, next_in_port = self.t.port(node, next_node)
-        else:
-          out_port = final_out_port
         self.switches[node_dpid].install(out_port, match, idle_timeout =
                                          IDLE_TIMEOUT)
 
+  def _handle_FlowRemoved(self, event):
+    "Forget a flow and release its reservation once its entry expires."
+    match = event.ofp.match
+    if match.nw_src is None or match.nw_dst is None:
+      return
+    flow_key = self._flow_key(match)
+    if flow_key not in self.flows:
+      return
+
+    self._release(flow_key)
+    src_host, dst_host = self.flows.remove(flow_key)
+    self.elephants.discard(flow_key)
+    self.elephant_flows.pop(flow_key, None)
+    self._update_reservations(self.demands.remove_flow(src_host, dst_host))
+
   def _eth_to_int(self, eth):
     return sum(([ord(x)*2**((5-i)*8) for i,x in enumerate(eth.raw)]))
 
@@ -228,53 +362,98 @@ class HederaController(object):
     "Return a hash based on src and dst dpids."
     return crc32(pack('QQ', src_dpid, dst_dpid))
 
+  def _seed_hosts(self):
+    "Fill the MAC and ARP tables from the topology, for ARP proxy mode."
+    self.arp_table = {}
+    for ip, mac, dpid, port in hostLocations(self.t):
+      self.arp_table[IPAddr(ip)] = EthAddr(mac)
+      self.macTable[EthAddr(mac)] = (dpid, port)
+
+  def _proxy_arp(self, event):
+    "Answer an ARP request for a known host; return True if answered."
+    request = event.parsed.next
+    if request.opcode != arp.REQUEST:
+      return False
+    mac = self.arp_table.get(request.protodst)
+    if mac is None:
+      return False
+
+    reply = arp()
+    reply.opcode = arp.REPLY
+    reply.hwsrc = mac
+    reply.hwdst = request.hwsrc
+    reply.protosrc = request.protodst
+    reply.protodst = request.protosrc
+    frame = ethernet(type = ethernet.ARP_TYPE, src = mac, dst = request.hwsrc)
+    frame.payload = reply
+    sw = self.switches[event.dpid]
+    sw.send_packet_data(event.port, frame.pack())
+    if event.ofp.buffer_id is not None:
+      sw.send_packet_bufid_ports([], event.ofp.buffer_id)  # Drop the request.
+    return True
+
+  def _flood_ports(self):
+    "Return [(dpid, host-facing ports)] for every edge switch, cached."
+    if self.flood_ports is None:
+      t = self.t
+      self.flood_ports = []
+      for sw_name in t.layer_nodes(t.LAYER_EDGE):
+        ports = [t.port(sw_name, host)[0] for host in t.down_nodes(sw_name)]
+        self.flood_ports.append((t.id_gen(name = sw_name).dpid, ports))
+    return self.flood_ports
+
   def _flood(self, event):
-    packet = event.parsed
     dpid = event.dpid
-    #log.info("PacketIn: %s" % packet)
     in_port = event.port
-    t = self.t
+    buffer_id = event.ofp.buffer_id
+    truncated = event.ofp.total_len > len(event.data)
 
-    # Broadcast to every output port except the input on the input switch.
+    # Broadcast to every host port except the input on the input switch,
+    # with one packet_out per edge switch.  The input switch releases its
+    # buffered copy; the others need the whole frame, which only a packet
+    # bigger than PROXY_MISS_SEND_LEN, to no host, can lack.
     # Hub behavior, baby!
-    for sw in self._raw_dpids(t.layer_nodes(t.LAYER_EDGE)):
-      #log.info("considering sw %s" % sw)
-      ports = []
-      sw_name = t.id_gen(dpid = sw).name_str()
-      for host in t.down_nodes(sw_name):
-        sw_port, host_port = t.port(sw_name, host)
-        if sw != dpid or (sw == dpid and in_port != sw_port):
-          ports.append(sw_port)
-      # Send packet out each non-input host port
-      # TODO: send one packet only.
-      for port in ports:
-        #log.info("sending to port %s on switch %s" % (port, sw))
-        #buffer_id = event.ofp.buffer_id
-        #if sw == dpid:
-        #  self.switches[sw].send_packet_bufid(port, event.ofp.buffer_id)
-        #else:
-        self.switches[sw].send_packet_data(port, event.data)
-        #  buffer_id = None
-
-  def _handle_packet_reactive(self, event):
-    packet = event.parsed
+    for sw, ports in self._flood_ports():
+      if sw == dpid:
+        ports = [port for port in ports if port != in_port]
+        if buffer_id is not None:
+          self.switches[sw].send_packet_bufid_ports(ports, buffer_id)
+          self.flood_msgs_saved += max(len(ports) - 1, 0)
+          buffer_id = None
+          continue
+      if not ports:
+        continue
+      if truncated:
+        log.warn("cannot flood truncated packet to %s" % dpidToStr(sw))
+        continue
+      self.switches[sw].send_packet_data_ports(ports, event.data)
+      self.flood_msgs_saved += len(ports) - 1
+    if buffer_id is not None:
+      self.switches[dpid].send_packet_bufid_ports([], buffer_id)
+    log.info("flood messages saved: %d" % self.flood_msgs_saved)
+
+  def _handle_packet_reactive(self, event, match):
     dpid = event.dpid
-    #log.info("PacketIn: %s" % packet)
+    #log.info("PacketIn: %s" % match)
     in_port = event.port
     t = self.t
 
-    # Learn MAC address of the sender on every packet-in.
-    self.macTable[packet.src] = (dpid, in_port)
+    # Learn MAC address of the sender on every packet-in, unless the table
+    # was seeded from the topology.
+    if self.arp_table is None:
+      self.macTable[match.dl_src] = (dpid, in_port)
 
     #log.info("mactable: %s" % self.macTable)
 
-    # Insert flow, deliver packet directly to destination.
-    if packet.dst in self.macTable:
-      out_dpid, out_port = self.macTable[packet.dst]
-      self._install_reactive_path(event, out_dpid, out_port, packet)
+    # Insert flow; the ingress entry releases the buffered packet, else
+    # deliver it directly to the destination.
+    if match.dl_dst in self.macTable:
+      out_dpid, out_port = self.macTable[match.dl_dst]
+      self._install_reactive_path(event, out_dpid, out_port, match)
 
       #log.info("sending to entry in mactable: %s %s" % (out_dpid, out_port))
-      self.switches[out_dpid].send_packet_data(out_port, event.data)
+      if event.ofp.buffer_id is None:
+        self.switches[out_dpid].send_packet_data(out_port, event.data)
 
     else:
       self._flood(event)
@@ -285,42 +464,142 @@ class HederaController(object):
     return node.pod * ((self.t.k ** 2) / 4) + node.sw * (self.t.k / 2) + ((port - 2) / 2)
 
   def _handle_PacketIn(self, event):
-    #log.info("Parsing PacketIn.")
+    # Classify by ethertype from the raw frame; only ARP is fully parsed.
     if not self.all_switches_up:
       log.info("Saw PacketIn before all switches were up - ignoring.")
       return
+    eth_type = ethType(event.data)[0]
+    if eth_type is None:
+      return
+    elif (eth_type == ETH_TYPE_ARP and self.arp_table is not None and
+          self._proxy_arp(event)):
+      return
     else:
-        self._handle_packet_reactive(event)
-
-  def _get_links_from_path(self, path):
-    path_len = len(path)
-    for i in range(0, path_len - 1):
-      link_key = self._link_key(path[i], path[i + 1])
-      reverse_link_key = self._link_key(path[i + 1], path[i])
-      #if link_key is not in self.link_usage and reverse_link_key is not in self.link_usage:
-      self.link_usage[link_key] = 0
-      self.link_usage[reverse_link_key] = 0
-
-  def  _get_equal_cost_routes(self, src, dst):
-    src_host_name = self.t.id_gen(dpid = src).name_str()
-    src_sw = self.t.up_nodes(src_host_name)
-    assert len(src_sw) == 1
-    src_sw_name = src_sw[0]
-    dst_host_name = self.t.id_gen(dpid = dst).name_str()
-    dst_sw = self.t.up_nodes(dst_host_name)
-    assert len(dst_sw) == 1
-    dst_sw_name = dst_sw[0]
-    all_paths = self.r.get_route(src_sw_name, dst_sw_name, None, True)
-    for path in all_paths:
-      self._get_links_from_path(path)
-    self.paths[self._path_key(src_sw_name, dst_sw_name)] = all_paths
+        self._handle_packet_reactive(event, headerMatch(event.data))
+
+  def _poll_flow_stats(self):
+    "Ask every edge switch for its IP flow counters, in one batch."
+    if not self.all_switches_up:
+      return
+    if self.annealer is not None:
+      self._anneal_round()
+    for dpid in self.edge_dpids:
+      connection = self.switches[dpid].connection
+      if connection is None:
+        continue  # Down; polled again once it reconnects.
+      msg = of.ofp_stats_request(body = of.ofp_flow_stats_request(
+          match = of.ofp_match(dl_type = ethernet.IP_TYPE)))
+      connection.send(msg)
+
+  def _handle_FlowStatsReceived(self, event):
+    "Update byte rates of flows sent from hosts below an edge switch."
+    if self.path_table is None:
+      return
+    now = time()
+    half = self.t.k / 2
+    node = self.t.id_gen(dpid = event.dpid)
+    edge_idx = node.pod * half + node.sw
+
+    counts = {}  # [flow_key] -> bytes, summed over the flow's entries
+    matches = {}  # [flow_key] -> [match]
+    for stats in event.stats:
+      match = stats.match
+      if match.nw_src is None or match.nw_dst is None:
+        continue
+      flow_key = self._flow_key(match)
+      if flow_key not in self.flows:
+        continue
+      if self.flows.hosts(flow_key)[0] / half != edge_idx:
+        continue  # Counted at the sender's edge switch instead.
+      counts[flow_key] = counts.get(flow_key, 0) + stats.byte_count
+      matches.setdefault(flow_key, []).append(match)
+
+    last_bytes = self.flow_bytes.get(event.dpid, {})
+    elapsed = now - self.poll_times.get(event.dpid, now - self.poll_period)
+    self.flow_bytes[event.dpid] = counts
+    self.poll_times[event.dpid] = now
+    if elapsed <= 0:
+      return
+
+    for flow_key, byte_count in counts.iteritems():
+      delta = byte_count - last_bytes.get(flow_key, 0)
+      if delta < 0:
+        delta = byte_count  # Entries expired and were reinstalled.
+      elephant = delta / elapsed >= self.elephant_rate
+      if elephant and self.annealer is not None:
+        self.elephant_flows[flow_key] = (self.flows.hosts(flow_key),
+                                         matches[flow_key])
+      if elephant == (flow_key in self.elephants):
+        continue
+      if elephant:
+        self.elephants.add(flow_key)
+        if self.annealer is None:
+          self._place_elephant(flow_key, self.flows.hosts(flow_key),
+                               matches[flow_key])
+      else:
+        self.elephants.discard(flow_key)
+        self.elephant_flows.pop(flow_key, None)
+        self._release(flow_key)
+
+  def _place_elephant(self, flow_key, hosts, matches):
+    "Re-run Global First Fit for a new elephant and move it if it fits."
+    src_host, dst_host = hosts
+    half = self.t.k / 2
+    path_key = (src_host / half, dst_host / half)
+    old_x = self.flows.path(flow_key)
+    self._release(flow_key)
+    x = self._first_fit(flow_key, path_key,
+                        self.demands.demand(src_host, dst_host))
+    if x is None or x == old_x:
+      return
+    self._move_flow(flow_key, path_key, x, dst_host, matches)
+
+  def _anneal_round(self):
+    "Place every elephant by simulated annealing; move those that changed."
+    keys = [key for key in self.elephants if key in self.elephant_flows]
+    if not keys:
+      return
+    hosts = [self.elephant_flows[key][0] for key in keys]
+    demands = [self.demands.demand(src, dst) for src, dst in hosts]
+    start = time()
+    paths = self.annealer.schedule([src for src, dst in hosts],
+                                   [dst for src, dst in hosts], demands)
+    log.info("annealed %d elephants in %0.3fs" % (len(keys), time() - start))
+
+    half = self.t.k / 2
+    for key, (src_host, dst_host), demand, x in zip(keys, hosts, demands,
+                                                    paths):
+      path_key = (src_host / half, dst_host / half)
+      old_x = self.flows.path(key)
+      self._release(key)
+      links = self.link_usage.reserve(path_key[0], path_key[1], x, demand)
+      self.flows.set_path(key, x)
+      self.reservations[key] = (links, demand)
+      if x != old_x:
+        self._move_flow(key, path_key, x, dst_host,
+                        self.elephant_flows[key][1])
+
+  def _move_flow(self, flow_key, path_key, x, dst_host, matches):
+    "Reinstall every entry of a flow along path x."
+    route = self.path_table.path_names(path_key[0], path_key[1], x)
+    log.info("moving %s to route: %s" % (flow_key, route))
+    dst_name = self._host_name(dst_host)
+    final_out_port = self.t.port(route[-1], dst_name)[0]
+    for match in matches:
+      self._install_route(route, match, final_out_port)
 
   def _get_all_paths(self):
     t = self.t
-    # Install L2 src/dst flow for every possible pair of hosts.
-    for src in sorted(self._raw_dpids(t.layer_nodes(t.LAYER_HOST))):
-      for dst in sorted(self._raw_dpids(t.layer_nodes(t.LAYER_HOST))):
-        self._get_equal_cost_routes(src, dst)
+    # Every edge-to-edge path set, built once for the whole topology.
+    self.path_table = PathTable(t)
+    log.info("path table: %s" % self.path_table.memory_report())
+
+    self.link_usage = LinkUsage(t, CAPACITY)
+    if self.schedule == 'anneal':
+      iterations, deadline = self.anneal_args
+      self.annealer = Annealer(self.link_usage, iterations, deadline)
+
+    self.edge_dpids = self._raw_dpids(t.layer_nodes(t.LAYER_EDGE))
 
   def _handle_ConnectionUp (self, event):
     sw = self.switches.get(event.dpid)
@@ -338,28 +617,68 @@ class HederaController(object):
     else:
       log.info("Odd - already saw switch %s come up" % sw_str)
       sw.connect(event.connection)
-    sw.connection.send(of.ofp_set_config(miss_send_len=MISS_SEND_LEN))
+    if self.arp_table is not None:
+      miss_send_len = PROXY_MISS_SEND_LEN
+    else:
+      miss_send_len = MISS_SEND_LEN
+    sw.connection.send(of.ofp_set_config(miss_send_len=miss_send_len))
 
     if len(self.switches) == len(self.t.switches()):
       log.info("Woo!  All switches up")
       self.all_switches_up = True
       self._get_all_paths()
 
+  def _handle_ConnectionDown (self, event):
+    "Drop cached routes through a switch that went down."
+    if isinstance(self.r, CachedRouting):
+      name = self.t.id_gen(dpid = event.dpid).name_str()
+      log.info("dropped %d cached routes through %s" %
+               (self.r.invalidate(name), name))
+
 
-def launch(topo = None):
+def launch(topo = None, routing = None, cache = None, poll = None,
+           arp = False, schedule = None, iterations = None, deadline = None):
   """
   Launch Hedera Controller
 
   topo is in format toponame,arg1,arg2,...
+  routing is a hashed routing type (hashed or fattree), for the ECMP fallback
+  cache is the number of routes to keep in an LRU route cache (default none)
+  poll is the flow stats polling period in seconds (default 5, 0 disables)
+  arp answers host ARP requests from the topology instead of flooding them
+  schedule places elephants with gff (default) or anneal (needs poll above 0)
+  iterations is the annealing budget per poll period (default 1000)
+  deadline is the annealing time limit per poll period (default 0.1 s)
   """
+  if not routing:
+    routing = 'hashed'
 
   # Instantiate a topo object from the passed-in file.
   if not topo:
     raise Exception("please specify topo and args on cmd line")
   else:
     t = buildTopo(topo, topos)
-    r = getRouting('hashed', t)
+    r = getRouting(routing, t, cache)
 
-  core.registerNew(HederaController, t, r)
-
-  log.info("Hedera running with topo=%s." % topo)
+  if poll is None:
+    poll_period = POLL_PERIOD
+  else:
+    poll_period = float(poll)
+
+  if not schedule:
+    schedule = 'gff'
+  if schedule not in SCHEDULES:
+    raise Exception("unknown schedule %s; use one of %s" %
+                    (schedule, ", ".join(SCHEDULES)))
+  if schedule == 'anneal' and not poll_period:
+    raise Exception("schedule anneal runs every poll period; "
+                    "set poll above 0")
+  if iterations is None:
+    iterations = DEFAULT_ITERATIONS
+  if deadline is None:
+    deadline = DEFAULT_DEADLINE
+
+  core.registerNew(HederaController, t, r, poll_period, str_to_bool(arp),
+                   schedule, int(iterations), float(deadline))
+
+  log.info("Hedera running with topo=%s, schedule=%s." % (topo, schedule))
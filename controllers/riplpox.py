@@ -4,31 +4,48 @@ RipL+POX.  As simple a data center controller as possible.
 
 import logging
 import random
+from time import time
 from struct import pack
 from zlib import crc32
 
 from pox.core import core
-from pox.lib.util import dpidToStr
+from pox.lib.util import dpidToStr, str_to_bool
 import pox.openflow.libopenflow_01 as of
 from pox.lib.revent import EventMixin
-from pox.lib.addresses import EthAddr
+from pox.lib.addresses import EthAddr, IPAddr
+from pox.lib.packet.arp import arp
+from pox.lib.packet.ethernet import ethernet
 from pox.lib.packet.ipv4 import ipv4
 from pox.lib.packet.udp import udp
 from pox.lib.packet.tcp import tcp
 
+from ripllib.dctopo import FatTreeTopo
 from ripllib.mn import topos
+from ripllib.pathtable import PathTable
+from ripllib.routing import HashedStructuredRouting, FatTreeRouting
+from ripllib.routing import CachedRouting
 
-from util import buildTopo, getRouting
+from util import buildTopo, getRouting, hostLocations
+from util import ethType, headerMatch, ETH_TYPE_ARP, ETH_TYPE_IP, HEADER_LEN
 
 log = core.getLogger()
 log.setLevel(logging.WARNING)
 
-# Number of bytes to send for packet_ins
+# Number of bytes to send for packet_ins.  Unknown destinations are flooded
+# from the controller, which needs whole frames; with the ARP proxy every
+# host is known, so just the headers we match on are enough, and switches
+# buffer the rest until a flow_mod or packet_out releases it.
 MISS_SEND_LEN = 2000
+PROXY_MISS_SEND_LEN = HEADER_LEN
 
-MODES = ['reactive', 'proactive', 'hybrid']
+MODES = ['reactive', 'proactive', 'hybrid', 'aggregate']
 DEF_MODE = MODES[0]
 
+# How aggregate mode spreads upward traffic over uplinks: by the position of
+# the source below the switch, or by a hash of its address.
+SPLITS = ['source', 'hash']
+DEF_SPLIT = SPLITS[0]
+
 IDLE_TIMEOUT = 10
 
 HYBRID_IDLE_TIMEOUT = 0
@@ -38,6 +55,12 @@ PRIO_HYBRID_VLAN_DOWN = 900
 PRIO_HYBRID_FLOW_UP = 500
 PRIO_HYBRID_VLAN_UP = 10
 
+PRIO_AGGREGATE_DOWN = 1000
+PRIO_AGGREGATE_UP = 500
+
+# Most flow_mods to pack into one write while batching
+BATCH_SIZE = 1024
+
 
 # Borrowed from pox/forwarding/l2_multi
 class Switch (object):
@@ -46,6 +69,8 @@ class Switch (object):
     self.ports = None
     self.dpid = None
     self._listeners = None
+    self._batch = None  # Packed flow_mods waiting to be written, if batching
+    self._barriers = {}  # [barrier xid] -> completion callback
 
   def __repr__ (self):
     return dpidToStr(self.dpid)
@@ -73,12 +98,54 @@ class Switch (object):
     msg.actions.append(of.ofp_action_output(port = outport))
     self.connection.send(msg)
 
+  def send_packet_data_ports(self, outports, data = None):
+    "Send one packet_out that outputs the packet on every given port."
+    msg = of.ofp_packet_out(in_port=of.OFPP_NONE, data = data)
+    for outport in outports:
+      msg.actions.append(of.ofp_action_output(port = outport))
+    self.connection.send(msg)
+
   def send_packet_bufid(self, outport, buffer_id = None):
     msg = of.ofp_packet_out(in_port=of.OFPP_NONE)
     msg.actions.append(of.ofp_action_output(port = outport))
     msg.buffer_id = buffer_id
     self.connection.send(msg)
 
+  def send_packet_bufid_ports(self, outports, buffer_id):
+    "Release a buffered packet on every given port; no ports drops it."
+    msg = of.ofp_packet_out(in_port=of.OFPP_NONE)
+    for outport in outports:
+      msg.actions.append(of.ofp_action_output(port = outport))
+    msg.buffer_id = buffer_id
+    self.connection.send(msg)
+
+  def begin_batch(self):
+    "Buffer flow_mods from install calls until end_batch."
+    if self._batch is None:
+      self._batch = []
+
+  def end_batch(self, callback = None):
+    """
+    Write buffered flow_mods followed by a barrier.
+
+    callback(switch) runs once the switch has processed every flow_mod.
+    """
+    batch = self._batch or []
+    self._batch = None
+    barrier = of.ofp_barrier_request()
+    self._barriers[barrier.xid] = callback
+    batch.append(barrier.pack())
+    self.connection.send(b''.join(batch))
+
+  def _send_flow_mod(self, msg):
+    if self._batch is None:
+      self.connection.send(msg)
+      return
+    self._batch.append(msg.pack())
+    if len(self._batch) >= BATCH_SIZE:
+      self.connection.send(b''.join(self._batch))
+      self._batch = []
+
   def install(self, port, match, buf = None, idle_timeout = 0, hard_timeout = 0,
               priority = of.OFP_DEFAULT_PRIORITY):
     msg = of.ofp_flow_mod()
@@ -88,7 +155,7 @@ class Switch (object):
     msg.priority = priority
     msg.actions.append(of.ofp_action_output(port = port))
     msg.buffer_id = buf
-    self.connection.send(msg)
+    self._send_flow_mod(msg)
 
   def install_multiple(self, actions, match, buf = None, idle_timeout = 0,
                        hard_timeout = 0, priority = of.OFP_DEFAULT_PRIORITY):
@@ -100,7 +167,13 @@ class Switch (object):
     for a in actions:
       msg.actions.append(a)
     msg.buffer_id = buf
-    self.connection.send(msg)
+    self._send_flow_mod(msg)
+
+  def _handle_BarrierIn (self, event):
+    if event.xid in self._barriers:
+      callback = self._barriers.pop(event.xid)
+      if callback is not None:
+        callback(self)
 
   def _handle_ConnectionDown (self, event):
     self.disconnect()
@@ -112,12 +185,21 @@ def sep():
 
 class RipLController(object):
 
-  def __init__ (self, t, r, mode):
+  def __init__ (self, t, r, mode, arp_proxy = False, split = DEF_SPLIT):
     self.switches = {}  # Switches seen: [dpid] -> Switch
     self.t = t  # Master Topo object, passed in and never modified.
     self.r = r  # Master Routing object, passed in and reused.
     self.mode = mode # One in MODES.
+    self.split = split # One in SPLITS, for aggregate mode.
     self.macTable = {}  # [mac] -> (dpid, port)
+    self.flood_ports = None  # [(dpid, host ports)] of every edge switch
+    self.flood_msgs_saved = 0  # packet_outs avoided by multi-port floods
+    self.arp_table = None  # [ip] -> mac of every host, in ARP proxy mode
+    if arp_proxy:
+      self._seed_hosts()
+    self.path_table = None  # PathTable for hashed proactive installs
+    self.install_start = None  # When the static table install began
+    self.pending_switches = set()  # dpids still installing the static table
 
     # TODO: generalize all_switches_up to a more general state machine.
     self.all_switches_up = False  # Sequences event handling.
@@ -127,37 +209,38 @@ class RipLController(object):
     "Convert a list of name strings (from Topo object) to numbers."
     return [self.t.id_gen(name = a).dpid for a in arr]
 
-  def _ecmp_hash(self, packet):
-    "Return an ECMP-style 5-tuple hash for TCP/IP packets, otherwise 0."
-    hash_input = [0] * 5
-    if isinstance(packet.next, ipv4):
-      ip = packet.next
-      hash_input[0] = ip.srcip.toUnsigned()
-      hash_input[1] = ip.dstip.toUnsigned()
-      hash_input[2] = ip.protocol
-      if isinstance(ip.next, tcp) or isinstance(ip.next, udp):
-        l4 = ip.next
-        hash_input[3] = l4.srcport
-        hash_input[4] = l4.dstport
-        return crc32(pack('LLHHH', *hash_input))
-    return 0
-
-  def _install_reactive_path(self, event, out_dpid, final_out_port, packet):
-    "Install entries on route between two switches."
+  def _ecmp_hash(self, match):
+    "Return an ECMP-style 5-tuple hash for TCP/UDP matches, otherwise 0."
+    if match.tp_src is None:
+      return 0
+    return crc32(pack('LLHHH', match.nw_src.toUnsigned(),
+                      match.nw_dst.toUnsigned(), match.nw_proto,
+                      match.tp_src, match.tp_dst))
+
+  def _install_reactive_path(self, event, out_dpid, final_out_port, match):
+    """
+    Install entries on route between two switches.
+
+    Entries go in from the far end, so the ingress entry, which releases the
+    buffered packet, is installed last.
+    """
     in_name = self.t.id_gen(dpid = event.dpid).name_str()
     out_name = self.t.id_gen(dpid = out_dpid).name_str()
-    hash_ = self._ecmp_hash(packet)
+    hash_ = self._ecmp_hash(match)
     route = self.r.get_route(in_name, out_name, hash_, False)
     log.info("route: %s" % route)
-    match = of.ofp_match.from_packet(packet)
-    for i, node in enumerate(route):
-      node_dpid = self.t.id_gen(name = node).dpid
-      if i < len(route) - 1:
-        next_node = route[i + 1]
-        out_port, next_in_port = self.t.port(node, next_node)
+    ports = self.t.path_ports(route)
+    for i in reversed(xrange(len(route))):
+      node_dpid = self.t.id_gen(name = route[i]).dpid
+      if i < len(ports):
+        out_port = ports[i][0]
       else:
         out_port = final_out_port
-      self.switches[node_dpid].install(out_port, match, idle_timeout =
+      if i == 0:
+        buf = event.ofp.buffer_id
+      else:
+        buf = None
+      self.switches[node_dpid].install(out_port, match, buf, idle_timeout =
                                        IDLE_TIMEOUT)
 
   def _eth_to_int(self, eth):
@@ -182,7 +265,12 @@ class RipLController(object):
     assert len(dst_sw) == 1
     dst_sw_name = dst_sw[0]
     hash_ = self._src_dst_hash(src, dst)
-    route = self.r.get_route(src_sw_name, dst_sw_name, hash_, False)
+    if self.path_table is not None:
+      route = self.path_table.route(self.path_table.edge_index(src_sw_name),
+                                    self.path_table.edge_index(dst_sw_name),
+                                    hash_)
+    else:
+      route = self.r.get_route(src_sw_name, dst_sw_name, hash_, False)
     log.info("route: %s" % route)
 
     # Form OF match
@@ -192,91 +280,142 @@ class RipLController(object):
 
     dst_host_name = self.t.id_gen(dpid = dst).name_str()
     final_out_port, ignore = self.t.port(route[-1], dst_host_name)
+    ports = self.t.path_ports(route)
     for i, node in enumerate(route):
       node_dpid = self.t.id_gen(name = node).dpid
-      if i < len(route) - 1:
-        next_node = route[i + 1]
-        out_port, next_in_port = self.t.port(node, next_node)
+      if i < len(ports):
+        out_port = ports[i][0]
       else:
         out_port = final_out_port
       self.switches[node_dpid].install(out_port, match)
 
+  def _seed_hosts(self):
+    "Fill the MAC and ARP tables from the topology, for ARP proxy mode."
+    self.arp_table = {}
+    for ip, mac, dpid, port in hostLocations(self.t):
+      self.arp_table[IPAddr(ip)] = EthAddr(mac)
+      self.macTable[EthAddr(mac)] = (dpid, port)
+
+  def _proxy_arp(self, event):
+    "Answer an ARP request for a known host; return True if answered."
+    request = event.parsed.next
+    if request.opcode != arp.REQUEST:
+      return False
+    mac = self.arp_table.get(request.protodst)
+    if mac is None:
+      return False
+
+    reply = arp()
+    reply.opcode = arp.REPLY
+    reply.hwsrc = mac
+    reply.hwdst = request.hwsrc
+    reply.protosrc = request.protodst
+    reply.protodst = request.protosrc
+    frame = ethernet(type = ethernet.ARP_TYPE, src = mac, dst = request.hwsrc)
+    frame.payload = reply
+    sw = self.switches[event.dpid]
+    sw.send_packet_data(event.port, frame.pack())
+    if event.ofp.buffer_id is not None:
+      sw.send_packet_bufid_ports([], event.ofp.buffer_id)  # Drop the request.
+    return True
+
+  def _flood_ports(self):
+    "Return [(dpid, host-facing ports)] for every edge switch, cached."
+    if self.flood_ports is None:
+      t = self.t
+      self.flood_ports = []
+      for sw_name in t.layer_nodes(t.LAYER_EDGE):
+        ports = [t.port(sw_name, host)[0] for host in t.down_nodes(sw_name)]
+        self.flood_ports.append((t.id_gen(name = sw_name).dpid, ports))
+    return self.flood_ports
+
   def _flood(self, event):
-    packet = event.parsed
     dpid = event.dpid
-    #log.info("PacketIn: %s" % packet)
     in_port = event.port
-    t = self.t
+    buffer_id = event.ofp.buffer_id
+    truncated = event.ofp.total_len > len(event.data)
 
-    # Broadcast to every output port except the input on the input switch.
+    # Broadcast to every host port except the input on the input switch,
+    # with one packet_out per edge switch.  The input switch releases its
+    # buffered copy; the others need the whole frame, which only a packet
+    # bigger than PROXY_MISS_SEND_LEN, to no host, can lack.
     # Hub behavior, baby!
-    for sw in self._raw_dpids(t.layer_nodes(t.LAYER_EDGE)):
-      #log.info("considering sw %s" % sw)
-      ports = []
-      sw_name = t.id_gen(dpid = sw).name_str()
-      for host in t.down_nodes(sw_name):
-        sw_port, host_port = t.port(sw_name, host)
-        if sw != dpid or (sw == dpid and in_port != sw_port):
-          ports.append(sw_port)
-      # Send packet out each non-input host port
-      # TODO: send one packet only.
-      for port in ports:
-        #log.info("sending to port %s on switch %s" % (port, sw))
-        #buffer_id = event.ofp.buffer_id
-        #if sw == dpid:
-        #  self.switches[sw].send_packet_bufid(port, event.ofp.buffer_id)
-        #else:
-        self.switches[sw].send_packet_data(port, event.data)
-        #  buffer_id = None
-
-  def _handle_packet_reactive(self, event):
-    packet = event.parsed
+    for sw, ports in self._flood_ports():
+      if sw == dpid:
+        ports = [port for port in ports if port != in_port]
+        if buffer_id is not None:
+          self.switches[sw].send_packet_bufid_ports(ports, buffer_id)
+          self.flood_msgs_saved += max(len(ports) - 1, 0)
+          buffer_id = None
+          continue
+      if not ports:
+        continue
+      if truncated:
+        log.warn("cannot flood truncated packet to %s" % dpidToStr(sw))
+        continue
+      self.switches[sw].send_packet_data_ports(ports, event.data)
+      self.flood_msgs_saved += len(ports) - 1
+    if buffer_id is not None:
+      self.switches[dpid].send_packet_bufid_ports([], buffer_id)
+    log.info("flood messages saved: %d" % self.flood_msgs_saved)
+
+  def _handle_packet_reactive(self, event, match):
     dpid = event.dpid
-    #log.info("PacketIn: %s" % packet)
+    #log.info("PacketIn: %s" % match)
     in_port = event.port
     t = self.t
 
-    # Learn MAC address of the sender on every packet-in.
-    self.macTable[packet.src] = (dpid, in_port)
+    # Learn MAC address of the sender on every packet-in, unless the table
+    # was seeded from the topology.
+    if self.arp_table is None:
+      self.macTable[match.dl_src] = (dpid, in_port)
 
     #log.info("mactable: %s" % self.macTable)
 
-    # Insert flow, deliver packet directly to destination.
-    if packet.dst in self.macTable:
-      out_dpid, out_port = self.macTable[packet.dst]
-      self._install_reactive_path(event, out_dpid, out_port, packet)
+    # Insert flow; the ingress entry releases the buffered packet, else
+    # deliver it directly to the destination.
+    if match.dl_dst in self.macTable:
+      out_dpid, out_port = self.macTable[match.dl_dst]
+      self._install_reactive_path(event, out_dpid, out_port, match)
 
       #log.info("sending to entry in mactable: %s %s" % (out_dpid, out_port))
-      self.switches[out_dpid].send_packet_data(out_port, event.data)
+      if event.ofp.buffer_id is None:
+        self.switches[out_dpid].send_packet_data(out_port, event.data)
 
     else:
       self._flood(event)
 
-  def _handle_packet_proactive(self, event):
-    packet = event.parse()
-
-    if packet.dst.is_multicast:
+  def _handle_packet_proactive(self, event, match):
+    if match.dl_dst.is_multicast:
       self._flood(event)
     else:
       hosts = self._raw_dpids(self.t.layer_nodes(self.t.LAYER_HOST))
-      if self._eth_to_int(packet.src) not in hosts:
-        raise Exception("unrecognized src: %s" % packet.src)
-      if self._eth_to_int(packet.dst) not in hosts:
-        raise Exception("unrecognized dst: %s" % packet.dst)
+      if self._eth_to_int(match.dl_src) not in hosts:
+        raise Exception("unrecognized src: %s" % match.dl_src)
+      if self._eth_to_int(match.dl_dst) not in hosts:
+        raise Exception("unrecognized dst: %s" % match.dl_dst)
       raise Exception("known host MACs but entries weren't pushed down?!?")
 
+  def _handle_packet_aggregate(self, event, match):
+    # Prefix entries route IP and ARP between all hosts, so only broadcasts
+    # they cannot place, and traffic outside 10/8, get here.
+    if match.dl_dst.is_multicast:
+      self._flood(event)
+    else:
+      log.warn("no prefix entry for %s" % match)
+
   # Get host index.
   def dpid_port_to_host_index(self, dpid, port):
     node = self.t.id_gen(dpid = dpid)
     return node.pod * ((self.t.k ** 2) / 4) + node.sw * (self.t.k / 2) + ((port - 2) / 2)
 
-  def _install_hybrid_dynamic_flows(self, event, out_dpid, final_out_port, packet):
-    "Install entry at ingress switch."
+  def _install_hybrid_dynamic_flows(self, event, out_dpid, final_out_port, match):
+    "Install entry at ingress switch, releasing the buffered packet."
     in_name = self.t.id_gen(dpid = event.dpid).name_str()
     #log.info("in_name: %s" % in_name)
     out_name = self.t.id_gen(dpid = out_dpid).name_str()
     #log.info("out_name: %s" % out_name)
-    hash_ = self._ecmp_hash(packet)
+    hash_ = self._ecmp_hash(match)
     src_dst_route = self.r.get_route(in_name, out_name, hash_, False)
     # Choose a random core switch.
     core_sws = sorted(self._raw_dpids(self.t.layer_nodes(self.t.LAYER_CORE)))
@@ -288,8 +427,6 @@ class RipLController(object):
     assert len(route) == 3
     log.info("route: %s" % route)
 
-    match = of.ofp_match.from_packet(packet)
-
     assert core_sw_id.pod == self.t.k
     core_sw_index = ((core_sw_id.sw - 1) * 2) + (core_sw_id.host - 1)
     #log.info("core_sw_index: %s" % core_sw_index)
@@ -305,7 +442,8 @@ class RipLController(object):
       # Don't bother with VLAN append; directly send to out port.
       log.info("adding edge-only entry from %s to %s on sw %s" %
                (match.dl_src, match.dl_dst, in_name))
-      self.switches[event.dpid].install(final_out_port, match, idle_timeout =
+      self.switches[event.dpid].install(final_out_port, match,
+                                     event.ofp.buffer_id, idle_timeout =
                                      HYBRID_IDLE_TIMEOUT,
                                      priority = PRIO_HYBRID_FLOW_DOWN)
     else:
@@ -313,54 +451,143 @@ class RipLController(object):
       src_port, dst_port = self.t.port(route[0], route[1])
       actions = [of.ofp_action_vlan_vid(vlan_vid = vlan),
                  of.ofp_action_output(port = src_port)]
-      self.switches[event.dpid].install_multiple(actions, match, idle_timeout =
+      self.switches[event.dpid].install_multiple(actions, match,
+                                              event.ofp.buffer_id,
+                                              idle_timeout =
                                               HYBRID_IDLE_TIMEOUT,
                                               priority = PRIO_HYBRID_FLOW_UP)
 
-  def _handle_packet_hybrid(self, event):
-    packet = event.parsed
+  def _handle_packet_hybrid(self, event, match):
     dpid = event.dpid
-    #log.info("PacketIn: %s" % packet)
+    #log.info("PacketIn: %s" % match)
     in_port = event.port
     t = self.t
 
-    # Learn MAC address of the sender on every packet-in.
-    self.macTable[packet.src] = (dpid, in_port)
+    # Learn MAC address of the sender on every packet-in, unless the table
+    # was seeded from the topology.
+    if self.arp_table is None:
+      self.macTable[match.dl_src] = (dpid, in_port)
     #log.info("mactable: %s" % self.macTable)
-    #log.info("learned that %s is on dpid %s, port %s" % (packet.src, dpid, in_port))
+    #log.info("learned that %s is on dpid %s, port %s" % (match.dl_src, dpid, in_port))
 
-    # Insert flow, deliver packet directly to destination.
-    if packet.dst in self.macTable:
-      out_dpid, out_port = self.macTable[packet.dst]
-      log.info("found %s on dpid %s, port %s" % (packet.dst, out_dpid, out_port))
-      self._install_hybrid_dynamic_flows(event, out_dpid, out_port, packet)
+    # Insert flow; the ingress entry releases the buffered packet, else
+    # deliver it directly to the destination.
+    if match.dl_dst in self.macTable:
+      out_dpid, out_port = self.macTable[match.dl_dst]
+      log.info("found %s on dpid %s, port %s" % (match.dl_dst, out_dpid, out_port))
+      self._install_hybrid_dynamic_flows(event, out_dpid, out_port, match)
 
       #log.info("sending to entry in mactable: %s %s" % (out_dpid, out_port))
-      self.switches[out_dpid].send_packet_data(out_port, event.data)
+      if event.ofp.buffer_id is None:
+        self.switches[out_dpid].send_packet_data(out_port, event.data)
 
     else:
       self._flood(event)
 
   def _handle_PacketIn(self, event):
-    #log.info("Parsing PacketIn.")
+    # Classify by ethertype from the raw frame; only ARP is fully parsed.
     if not self.all_switches_up:
       log.info("Saw PacketIn before all switches were up - ignoring.")
       return
+    eth_type = ethType(event.data)[0]
+    if eth_type is None:
+      return
+    elif (eth_type == ETH_TYPE_ARP and self.arp_table is not None and
+          self._proxy_arp(event)):
+      return
     else:
+      match = headerMatch(event.data)
       if self.mode == 'reactive':
-        self._handle_packet_reactive(event)
+        self._handle_packet_reactive(event, match)
       elif self.mode == 'proactive':
-        self._handle_packet_proactive(event)
+        self._handle_packet_proactive(event, match)
       elif self.mode == 'hybrid':
-        self._handle_packet_hybrid(event)
+        self._handle_packet_hybrid(event, match)
+      elif self.mode == 'aggregate':
+        self._handle_packet_aggregate(event, match)
+
+  def _begin_static_install(self):
+    "Batch flow_mods on every switch until _end_static_install."
+    self.install_start = time()
+    for sw in self.switches.itervalues():
+      sw.begin_batch()
+
+  def _end_static_install(self):
+    "Flush every switch's batch; log once all switches have applied theirs."
+    self.pending_switches = set(self.switches)
+    for sw in self.switches.values():
+      sw.end_batch(self._switch_installed)
+
+  def _switch_installed(self, sw):
+    self.pending_switches.discard(sw.dpid)
+    if not self.pending_switches:
+      log.info("Static flow table installed on %d switches in %0.2fs" %
+               (len(self.switches), time() - self.install_start))
 
   def _install_proactive_flows(self):
     t = self.t
+    # The table holds exactly the paths the hashed engines choose from.
+    r = self.r
+    if isinstance(r, CachedRouting):
+      r = r.routing
+    if isinstance(r, (HashedStructuredRouting, FatTreeRouting)):
+      self.path_table = PathTable(t)
+      log.info("path table: %s" % self.path_table.memory_report())
     # Install L2 src/dst flow for every possible pair of hosts.
     for src in sorted(self._raw_dpids(t.layer_nodes(t.LAYER_HOST))):
       for dst in sorted(self._raw_dpids(t.layer_nodes(t.LAYER_HOST))):
         self._install_proactive_path(src, dst)
 
+  def _uplink(self, up_nodes, position, key):
+    "Return the node above a switch that a source or subnet goes up to."
+    if self.split == 'hash':
+      return up_nodes[crc32(key) % len(up_nodes)]
+    return up_nodes[position % len(up_nodes)]
+
+  def _install_prefix(self, sw_name, next_name, field, prefix, priority):
+    "Send IP and ARP packets whose nw_src or nw_dst is in prefix to a node."
+    port = self.t.port(sw_name, next_name)[0]
+    sw = self.switches[self.t.id_gen(name = sw_name).dpid]
+    for dl_type in (ETH_TYPE_IP, ETH_TYPE_ARP):
+      match = of.ofp_match(dl_type = dl_type)
+      setattr(match, field, prefix)
+      sw.install(port, match, priority = priority)
+
+  def _install_aggregate_flows(self):
+    """
+    Install prefix entries from the 10.pod.sw.host addresses of a fat tree.
+
+    Every switch sends destinations below it down by prefix: a host's /32
+    at its edge switch, an edge switch's 10.pod.sw/24 at the agg switches
+    of its pod, and a pod's 10.pod/16 at the core switches.  Anything else
+    goes up, split by source: host i of an edge switch to its i-th agg
+    switch and edge switch j of a pod to the j-th core switch above each agg
+    switch, so the hosts of a pod reach the core over distinct paths.  With
+    ARP matched the same way, each switch holds 2k entries.
+    """
+    t = self.t
+    for edge in sorted(t.layer_nodes(t.LAYER_EDGE)):
+      aggs = sorted(t.up_nodes(edge))
+      for i, host in enumerate(sorted(t.down_nodes(edge))):
+        ip = t.id_gen(name = host).ip_str()
+        self._install_prefix(edge, host, 'nw_dst', ip, PRIO_AGGREGATE_DOWN)
+        self._install_prefix(edge, self._uplink(aggs, i, ip), 'nw_src', ip,
+                             PRIO_AGGREGATE_UP)
+
+    for agg in sorted(t.layer_nodes(t.LAYER_AGG)):
+      cores = sorted(t.up_nodes(agg))
+      for j, edge in enumerate(sorted(t.down_nodes(agg))):
+        edge_id = t.id_gen(name = edge)
+        subnet = "10.%i.%i.0/24" % (edge_id.pod, edge_id.sw)
+        self._install_prefix(agg, edge, 'nw_dst', subnet, PRIO_AGGREGATE_DOWN)
+        self._install_prefix(agg, self._uplink(cores, j, subnet), 'nw_src',
+                             subnet, PRIO_AGGREGATE_UP)
+
+    for core in sorted(t.layer_nodes(t.LAYER_CORE)):
+      for agg in t.down_nodes(core):
+        pod = "10.%i.0.0/16" % t.id_gen(name = agg).pod
+        self._install_prefix(core, agg, 'nw_dst', pod, PRIO_AGGREGATE_DOWN)
+
   def _install_hybrid_static_flows(self):
     t = self.t
     hosts = sorted(self._raw_dpids(t.layer_nodes(t.LAYER_HOST)))
@@ -498,34 +725,64 @@ class RipLController(object):
     else:
       log.info("Odd - already saw switch %s come up" % sw_str)
       sw.connect(event.connection)
-    sw.connection.send(of.ofp_set_config(miss_send_len=MISS_SEND_LEN))
+    if self.arp_table is not None:
+      miss_send_len = PROXY_MISS_SEND_LEN
+    else:
+      miss_send_len = MISS_SEND_LEN
+    sw.connection.send(of.ofp_set_config(miss_send_len=miss_send_len))
 
     if len(self.switches) == len(self.t.switches()):
       log.info("Woo!  All switches up")
       self.all_switches_up = True
       if self.mode == 'proactive':
+        self._begin_static_install()
         self._install_proactive_flows()
+        self._end_static_install()
       if self.mode == 'hybrid':
+        self._begin_static_install()
         self._install_hybrid_static_flows()
+        self._end_static_install()
+      if self.mode == 'aggregate':
+        self._begin_static_install()
+        self._install_aggregate_flows()
+        self._end_static_install()
+
+  def _handle_ConnectionDown (self, event):
+    "Drop cached routes through a switch that went down."
+    if isinstance(self.r, CachedRouting):
+      name = self.t.id_gen(dpid = event.dpid).name_str()
+      log.info("dropped %d cached routes through %s" %
+               (self.r.invalidate(name), name))
 
 
-def launch(topo = None, routing = None, mode = None):
+def launch(topo = None, routing = None, mode = None, cache = None, arp = False,
+           split = None):
   """
   Launch RipL-POX
 
   topo is in format toponame,arg1,arg2,...
-  routing is a routing type (e.g., st, random, hashed)
-  mode is a controller mode (e.g., proactive, reactive, hybrid)
+  routing is a routing type (e.g., st, random, hashed, fattree)
+  mode is a controller mode (e.g., proactive, reactive, hybrid, aggregate)
+  cache is the number of routes to keep in an LRU route cache (default none)
+  arp answers host ARP requests from the topology instead of flooding them
+  split spreads aggregate mode uplinks by source (default) or hash
   """
   if not mode:
     mode = DEF_MODE
+  if not split:
+    split = DEF_SPLIT
+  if split not in SPLITS:
+    raise Exception("unknown split %s; use one of %s" %
+                    (split, ", ".join(SPLITS)))
   # Instantiate a topo object from the passed-in file.
   if not topo:
     raise Exception("please specify topo and args on cmd line")
   else:
     t = buildTopo(topo, topos)
-    r = getRouting(routing, t)
+    r = getRouting(routing, t, cache)
+  if mode == 'aggregate' and not isinstance(t, FatTreeTopo):
+    raise Exception("aggregate mode needs fat tree addressing; use topo ft")
 
-  core.registerNew(RipLController, t, r, mode)
+  core.registerNew(RipLController, t, r, mode, str_to_bool(arp), split)
 
   log.info("RipL-POX running with topo=%s." % topo)
@@ -1,9 +1,14 @@
 # Utility functions
 
+from struct import unpack_from
+
 from mininet.util import makeNumeric
+import pox.openflow.libopenflow_01 as of
+from pox.lib.addresses import EthAddr, IPAddr
 
 from ripllib.routing import STStructuredRouting, RandomStructuredRouting
-from ripllib.routing import HashedStructuredRouting
+from ripllib.routing import HashedStructuredRouting, FatTreeRouting
+from ripllib.routing import CachedRouting
 
 
 # TODO: this code is duplicated from mininet/bin/mn, except for TOPOS/topos.
@@ -34,14 +39,77 @@ DEF_ROUTING = 'st'
 ROUTING = {
     'st': STStructuredRouting,
     'random': RandomStructuredRouting,
-    'hashed': HashedStructuredRouting
+    'hashed': HashedStructuredRouting,
+    'fattree': FatTreeRouting
 }
 
-def getRouting( routing_type, topo ):
-    "Return Ripl Routing object given a type and a Topo object"
+def getRouting( routing_type, topo, cache_size = None ):
+    """Return Ripl Routing object given a type and a Topo object.
+       cache_size: if set, wrap it in an LRU cache holding that many routes"""
     if routing_type == None:
         routing_type = DEF_ROUTING
     if routing_type not in ROUTING:
         raise Exception("unknown routing type %s not in %s" % (routing_type, 
                                                                ROUTING.keys())) 
-    return ROUTING[routing_type](topo)
\ No newline at end of file
+    routing = ROUTING[routing_type](topo)
+    if cache_size:
+        routing = CachedRouting( routing, int( cache_size ) )
+    return routing
+
+def hostLocations( topo ):
+    """Return (ip, mac, edge dpid, edge port) of every host, with ip and mac
+       as strings, as assigned by the topology."""
+    locations = []
+    for host in topo.layer_nodes( topo.LAYER_HOST ):
+        edge = topo.up_nodes( host )[ 0 ]
+        host_id = topo.id_gen( name = host )
+        edge_port, host_port = topo.port( edge, host )
+        locations.append( ( host_id.ip_str(), host_id.mac_str(),
+                            topo.id_gen( name = edge ).dpid, edge_port ) )
+    return locations
+
+# Ethernet types and IP protocols the packet-in fast path looks at
+ETH_TYPE_IP = 0x0800
+ETH_TYPE_ARP = 0x0806
+ETH_TYPE_VLAN = 0x8100
+IP_PROTO_TCP = 6
+IP_PROTO_UDP = 17
+
+# Bytes of a frame the controllers need: Ethernet with one 802.1Q tag, an
+# IPv4 header with the most options, and TCP/UDP ports. ARP packets fit.
+HEADER_LEN = 14 + 4 + 60 + 4
+
+def ethType( data ):
+    """Return ( ethertype, offset of its payload ) of a raw Ethernet frame,
+       looking past one 802.1Q tag; ( None, None ) if it is too short."""
+    if len( data ) < 14:
+        return ( None, None )
+    eth_type, = unpack_from( '!H', data, 12 )
+    if eth_type != ETH_TYPE_VLAN:
+        return ( eth_type, 14 )
+    if len( data ) < 18:
+        return ( None, None )
+    return ( unpack_from( '!H', data, 16 )[ 0 ], 18 )
+
+def headerMatch( data ):
+    """Return an ofp_match from only the headers of a raw frame that the
+       controllers route on: Ethernet addresses and type and, for IPv4, the
+       addresses, protocol and TCP/UDP ports. Everything else, and anything
+       cut off, is wildcarded. Returns None for a runt frame."""
+    eth_type, offset = ethType( data )
+    if eth_type is None:
+        return None
+    match = of.ofp_match( dl_src = EthAddr( data[ 6:12 ] ),
+                          dl_dst = EthAddr( data[ 0:6 ] ),
+                          dl_type = eth_type )
+    if eth_type != ETH_TYPE_IP or len( data ) < offset + 20:
+        return match
+    vhl, frag, proto = unpack_from( '!BxxxxxHxB', data, offset )
+    match.nw_src = IPAddr( data[ offset + 12:offset + 16 ] )
+    match.nw_dst = IPAddr( data[ offset + 16:offset + 20 ] )
+    match.nw_proto = proto
+    offset += ( vhl & 0xf ) * 4
+    if ( proto in ( IP_PROTO_TCP, IP_PROTO_UDP ) and not frag & 0x1fff and
+         len( data ) >= offset + 4 ):
+        match.tp_src, match.tp_dst = unpack_from( '!HH', data, offset )
+    return match
@@ -0,0 +1,46 @@
+# convert_traffic.py
+#
+# Convert JSON traffic matrices written by traffic.py to the binary format of
+# ripllib.trafficfile, which loads by memory-mapping instead of parsing. Each
+# <name>.json is written to <name>.bin alongside it.
+#
+# Example usage:
+#   $ python convert_traffic.py traffic/*.json
+#   $ python convert_traffic.py --k 8 traffic/rand_k8.json
+#
+# by Anh Truong (anhlt92)
+# and Ian Walsh (iwalsh)
+# for CS 244, Spring 2015
+
+import os
+from argparse import ArgumentParser
+
+from ripllib.trafficfile import load_json, write_binary
+
+parser = ArgumentParser(description='Convert JSON traffic to binary')
+parser.add_argument('traffic', type=str, nargs='+',
+                    help='Traffic JSON files created by traffic.py')
+parser.add_argument('--k', type=int, default=None,
+                    help='Fat tree size to record; defaults to the smallest '
+                         'that holds every host')
+
+
+def main():
+    args = parser.parse_args()
+    for traffic_file in args.traffic:
+        if not os.path.isfile(traffic_file):
+            raise Exception('Traffic file "%s" does not exist!' % traffic_file)
+        k, flows = load_json(traffic_file)
+        if args.k is not None:
+            if args.k < k:
+                raise Exception('Traffic file "%s" needs k=%d' %
+                                (traffic_file, k))
+            k = args.k
+
+        outfile = os.path.splitext(traffic_file)[0] + '.bin'
+        with open(outfile, 'wb') as f:
+            write_binary(f, k, flows)
+        print 'Wrote %d flows for k=%d to %s' % (len(flows), k, outfile)
+
+if __name__ == '__main__':
+    main()
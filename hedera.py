@@ -7,6 +7,7 @@
 #
 # Running Mininet via this script (second terminal window)
 # $ sudo python hedera.py ecmp traffic/stride1.json
+# $ sudo python hedera.py ecmp traffic/stride1.json --interval 0.25
 #
 # ^ The 'ecmp' parameter here does NOT actually control which scheduling is
 # used - that is determined by the POX command. It just tells this script how
@@ -18,9 +19,10 @@
 
 import os
 import json
+import ctypes
+import subprocess
 
 from time import time, sleep
-from math import sqrt
 
 from mininet.node import RemoteController
 from mininet.net import Mininet
@@ -29,11 +31,13 @@ from mininet.util import dumpNodeConnections
 from mininet.cli import CLI
 
 from ripllib.dctopo import FatTreeTopo
+from ripllib.stats import StreamStats
+from ripllib.trafficfile import load as load_traffic
 
 from argparse import ArgumentParser
 
 # Number of seconds to sample the flows
-N_SAMPLES = 10
+SAMPLE_SECONDS = 10
 
 # We must skip at least the first sample to establish a baseline bytes_recvd
 SAMPLES_TO_SKIP = 1
@@ -45,21 +49,26 @@ IPERF_SECONDS = 3600
 
 OUTDIR = 'results/'
 
+# Seconds to wait for every switch to connect to the controller
+SWITCH_TIMEOUT = 60
+
 popens = {}
 popen_receivers = {}
 
-HOST_NAMES = ('0_0_2', '0_0_3', '0_1_2', '0_1_3',
-              '1_0_2', '1_0_3', '1_1_2', '1_1_3',
-              '2_0_2', '2_0_3', '2_1_2', '2_1_3',
-              '3_0_2', '3_0_3', '3_1_2', '3_1_3')
-
 lg.setLogLevel('info')
 
 parser = ArgumentParser(description='Reproducing Hedera results')
-parser.add_argument('algorithm', type=str, choices=('ecmp', 'gff'),
+parser.add_argument('algorithm', type=str, choices=('ecmp', 'gff', 'anneal'),
                     help='Routing algorithm for saving results')
 parser.add_argument('traffic', type=str,
-                    help='Traffic JSON file created by traffic.py to use')
+                    help='Traffic file created by traffic.py to use, '
+                         'JSON or binary')
+parser.add_argument('--interval', type=float, default=1.0,
+                    help='Seconds between rx byte samples (may be < 1)')
+parser.add_argument('--k', type=int, default=4,
+                    help='Switch degree of the FatTreeTopo')
+parser.add_argument('--port', type=int, default=6633,
+                    help='OpenFlow port of the controller')
 args = parser.parse_args()
 
 if not os.path.isfile(args.traffic):
@@ -69,111 +78,173 @@ if not os.path.isdir(OUTDIR):
     raise Exception('Output directory "%s" does not exist!' % OUTDIR)
 
 
-def start_traffic(net):
+def start_traffic(net, host_names):
     """
-    Start long-lived iperf flows for all the (src, dst) pairs in traffic_file.
+    Start long-lived iperf flows for all the (src, dst) pairs in traffic_file,
+    which may be a JSON or binary traffic matrix. Flows with a start time
+    begin that many seconds from now; demands are not enforced, since every
+    flow is a TCP iperf.
     """
-    with open(args.traffic, 'r') as f:
-        traffic = json.load(f)
+    k, flows = load_traffic(args.traffic)
+    if k != args.k:
+        raise Exception('Traffic file "%s" is for k=%d, not k=%d' %
+                        (args.traffic, k, args.k))
 
     # Start every flow on its own port
     port_count = 0
-    for src_idx in traffic:
-        src_name = HOST_NAMES[int(src_idx)]
+    for src_idx, dst_idx, start_time in zip(flows['src'].tolist(),
+                                            flows['dst'].tolist(),
+                                            flows['start'].tolist()):
+        src_name = host_names[src_idx]
         src = net.get(src_name)
-
-        for dst_idx in traffic[src_idx]:
-            dst_name = HOST_NAMES[dst_idx]
-            dst = net.get(dst_name)
-
-            port = IPERF_PORT_BASE + port_count
-            server = '%s -s -p %s &' % (IPERF_PATH, port)
-            client = '%s -c %s -p %s -t %d &' % (IPERF_PATH,
-                                                 dst.IP('%s-eth0' % dst_name),
-                                                 port, IPERF_SECONDS)
-            dst.cmd(server)
-            src.cmd(client)
-            print 'Started iperf flow %s (%s) -> %s (%s) on port %d' %\
-                  (src_name, src.IP('%s-eth0' % src_name), dst_name,
-                   dst.IP('%s-eth0' % dst_name), port)
-            port_count += 1
-
-
-def avg(lst):
-    return float(sum(lst)) / len(lst)
-
-
-def variance(lst):
-    mean = avg(lst)
-    diffs_sqrd = []
-    for val in lst:
-        diffs_sqrd.append((val - mean) ** 2)
-    return avg(diffs_sqrd)
-
-
-def bytes_to_throughputs(rxbytes, durations):
+        dst_name = host_names[dst_idx]
+        dst = net.get(dst_name)
+
+        port = IPERF_PORT_BASE + port_count
+        server = '%s -s -p %s &' % (IPERF_PATH, port)
+        client = '%s -c %s -p %s -t %d &' % (IPERF_PATH,
+                                             dst.IP('%s-eth0' % dst_name),
+                                             port, IPERF_SECONDS)
+        if start_time > 0:
+            client = 'sleep %f && %s' % (start_time, client)
+        dst.cmd(server)
+        src.cmd(client)
+        print 'Started iperf flow %s (%s) -> %s (%s) on port %d' %\
+              (src_name, src.IP('%s-eth0' % src_name), dst_name,
+               dst.IP('%s-eth0' % dst_name), port)
+        port_count += 1
+
+
+def wait_for_switches(net, timeout=SWITCH_TIMEOUT):
     """
-    Convert samples of cumulative bytes received to bytes per second.
-    If rxbytes has N_SAMPLES, then throughputs has N_SAMPLES - 1.
+    Block until Open vSwitch reports every switch connected to its
+    controller, instead of sleeping for a fixed time.
     """
-    throughputs = {}
-    for name in HOST_NAMES:
-        throughputs[name] = []
+    deadline = time() + timeout
+    while True:
+        out = subprocess.check_output(['ovs-vsctl', '--columns=is_connected',
+                                       'list', 'controller'])
+        connected = out.count('true')
+        if connected >= len(net.switches):
+            return
+        if time() > deadline:
+            raise Exception('Only %d of %d switches connected after %ds' %
+                            (connected, len(net.switches), timeout))
+        sleep(0.1)
 
-    for name in rxbytes:
-        for i, sample in enumerate(rxbytes[name]):
-            if i:  # i > 0
-                throughput = (sample - rxbytes[name][i - 1]) / durations[i]
-                throughputs[name].append(throughput)
 
-    return throughputs
+def to_gbps(bytes_per_sec):
+    return bytes_per_sec / (2 ** 30) * 8
 
 
-def sample_rxbytes(net, rxbytes):
+class ThroughputStats(object):
     """
-    For each host, parse received bytes from /proc/net/dev, which has the
-    format:
-
-    Inter-|   Receive                                             |  Transmit
-     face |bytes packets errs drop fifo frame compressed multicast|bytes packets errs drop fifo colls carrier compressed
-    lo:       0       0    0    0    0     0          0         0        0       0    0    0    0     0       0          0
-3_1_3-eth0: 33714765732 1133072    0    0    0     0          0         0 25308223734 1110457    0    0    0     0       0          0
+    Per-host and aggregate throughput, updated one rx byte sample at a time.
+    Only the previous sample is kept, so memory doesn't grow with run length.
     """
-    for name in HOST_NAMES:
-        host = net.get(name)
-        iface = '%s-eth0:' % name
-        bytes = None
-
-        res = host.cmd('cat /proc/net/dev')
-        lines = res.split('\n')
-        for line in lines:
-            if iface in line:
-                bytes = int(line.split()[1])
-                rxbytes[name].append(bytes)
-                break
-
-        if bytes is None:
-            lg.error('Couldn\'t parse rxbytes for host %s!\n' % name)
 
-
-def aggregate_statistics(rxbytes, sample_durations):
+    def __init__(self, names):
+        self.names = names
+        self.hosts = [StreamStats() for name in names]
+        self.aggregate = StreamStats()  # Sum over hosts, per interval
+        self.last = None  # (timestamp, counts) of the previous sample
+
+    def add_sample(self, timestamp, counts):
+        """
+        Add cumulative bytes received per host, in the order of names.
+        The first sample only establishes a baseline.
+        """
+        if self.last is not None:
+            last_timestamp, last_counts = self.last
+            duration = timestamp - last_timestamp
+            total = 0.0
+            for stats, count, last_count in zip(self.hosts, counts,
+                                                last_counts):
+                throughput = (count - last_count) / duration
+                stats.add(throughput)
+                total += throughput
+            self.aggregate.add(total)
+        self.last = (timestamp, counts)
+
+    def results(self, link_gbps):
+        """
+        Return a dict of results in Gbps. mean_gbps, stddev_gbps, p50_gbps
+        and p99_gbps describe the aggregate over sampling intervals.
+        bisection_fraction is the mean over the sum of host link speeds,
+        which are decimal Gbps.
+        """
+        mean = sum(stats.mean for stats in self.hosts)  # bytes/s
+        hosts = {}
+        for name, stats in zip(self.names, self.hosts):
+            hosts[name] = {'mean_gbps': to_gbps(stats.mean),
+                           'p50_gbps': to_gbps(stats.quantile(0.5)),
+                           'p99_gbps': to_gbps(stats.quantile(0.99))}
+        return {'mean_gbps': to_gbps(mean),
+                'stddev_gbps': to_gbps(self.aggregate.stddev()),
+                'p50_gbps': to_gbps(self.aggregate.quantile(0.5)),
+                'p99_gbps': to_gbps(self.aggregate.quantile(0.99)),
+                'bisection_fraction': mean * 8 /
+                                      (link_gbps * 1e9 * len(self.names)),
+                'hosts': hosts}
+
+
+class timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+CLOCK_MONOTONIC = 1
+librt = ctypes.CDLL('librt.so.1', use_errno=True)
+
+
+def monotonic():
     """
-    Return the average throughput and variance summed over each host, in
-    bytes/sec
+    Return seconds from CLOCK_MONOTONIC, which unlike time() never jumps
+    when the wall clock is adjusted.
     """
-    throughputs = bytes_to_throughputs(rxbytes, sample_durations)
-
-    agg_throughput = 0.0
-    agg_variance = 0.0
+    t = timespec()
+    if librt.clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t)) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return t.tv_sec + t.tv_nsec * 1e-9
 
-    for name in throughputs:
-        agg_throughput += avg(throughputs[name])
-        agg_variance += variance(throughputs[name])
 
-    return (agg_throughput, agg_variance)
+class RxSampler(object):
+    """
+    Reads the received byte counters of every host at once.
 
+    Each host's bytes received are the bytes transmitted by the switch-side
+    end of its link, which lives in the root namespace. Its counter file in
+    /sys/class/net is opened once and re-read from the start for each
+    sample, so sampling costs one read() per host and no subprocesses.
+    """
 
-def save_results(mean_gbps, stddev_gbps):
+    def __init__(self, net, names):
+        self.names = names
+        self.files = []
+        for name in names:
+            intf = net.get(name).defaultIntf()
+            link = intf.link
+            peer = link.intf2 if link.intf1 is intf else link.intf1
+            path = '/sys/class/net/%s/statistics/tx_bytes' % peer.name
+            self.files.append(open(path, 'r', 0))
+
+    def sample(self):
+        """
+        Return (timestamp, bytes) with the monotonic time of the sample and
+        the cumulative bytes received by each host, in the order of names.
+        """
+        timestamp = monotonic()
+        counts = []
+        for f in self.files:
+            f.seek(0)
+            counts.append(int(f.read()))
+        return (timestamp, counts)
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+
+def save_results(stats):
     """
     Save results as json to OUTDIR/<traffic_filename>.json
     (e.g. results/stride1.json).
@@ -191,8 +262,8 @@ def save_results(mean_gbps, stddev_gbps):
     else:
         results = {}
 
-    results['%s_mean_gbps' % args.algorithm] = mean_gbps
-    results['%s_stddev_gbps' % args.algorithm] = stddev_gbps
+    for key, value in stats.iteritems():
+        results['%s_%s' % (args.algorithm, key)] = value
 
     with open(outfile, 'w') as f:
         json.dump(results, f)
@@ -207,45 +278,47 @@ def main(args):
     os.system('killall -9 ' + IPERF_PATH)
 
     start = time()
-    topo = FatTreeTopo(k=4, speed=1.0)  # 1.0 Gbps links
+    link_gbps = 1.0
+    topo = FatTreeTopo(k=args.k, speed=link_gbps)  # 1.0 Gbps links
+    host_names = topo.host_names()
     net = Mininet(topo=topo)
     net.addController(name='hederaController', controller=RemoteController,
-                      ip='127.0.0.1', port=6633)
+                      ip='127.0.0.1', port=args.port)
     net.start()
     dumpNodeConnections(net.hosts)
 
-    sleep(5)
+    wait_for_switches(net)
 
     # CLI(net)
 
     print 'Generating the traffic pattern in "%s"...' % args.traffic
-    start_traffic(net)
-
-    # Sample the cumulative # of bytes received for each host, every second.
-    # The diff between adjacent samples gives us throughput for that second.
-    rxbytes = {}
-    sample_durations = []
-    for name in HOST_NAMES:
-        rxbytes[name] = []
-
-    now = time()
-    for i in xrange(N_SAMPLES):
-        print 'Taking sample %d of %d...' % (i, N_SAMPLES)
-        sample_durations.append(time() - now)
-        now = time()
-        sample_rxbytes(net, rxbytes)
-        sleep(1.0)
-
-    (agg_mean, agg_var) = aggregate_statistics(rxbytes, sample_durations)
-    agg_stddev = sqrt(agg_var)
-    mean_gbps = agg_mean / (2 ** 30) * 8
-    stddev_gbps = agg_stddev / (2 ** 30) * 8
-    print 'Total average throughput: %f bytes/sec (%f Gbps)' %\
-          (agg_mean, mean_gbps)
-    print 'Standard deviation: %f bytes/sec (%f Gbps)' %\
-          (agg_stddev, stddev_gbps)
-
-    save_results(mean_gbps, stddev_gbps)
+    start_traffic(net, host_names)
+
+    # Sample the cumulative # of bytes received for each host, every
+    # interval. The diff between adjacent samples gives us throughput for
+    # that interval.
+    throughputs = ThroughputStats(host_names)
+    sampler = RxSampler(net, host_names)
+    n_samples = int(round(SAMPLE_SECONDS / args.interval)) + 1
+    print 'Taking %d samples, %0.3fs apart...' % (n_samples, args.interval)
+    start_sampling = monotonic()
+    for i in xrange(n_samples):
+        # Sleep until the next deadline, so sampling cost doesn't add drift.
+        delay = start_sampling + i * args.interval - monotonic()
+        if delay > 0:
+            sleep(delay)
+        timestamp, counts = sampler.sample()
+        throughputs.add_sample(timestamp, counts)
+    sampler.close()
+
+    stats = throughputs.results(link_gbps)
+    print 'Total average throughput: %f Gbps' % stats['mean_gbps']
+    print 'Standard deviation: %f Gbps' % stats['stddev_gbps']
+    print 'Aggregate p50 / p99: %f / %f Gbps' % (stats['p50_gbps'],
+                                                 stats['p99_gbps'])
+    print 'Bisection bandwidth fraction: %f' % stats['bisection_fraction']
+
+    save_results(stats)
 
     # CLI(net)
 
@@ -3,95 +3,225 @@
 # Run the Mininet simulation and measure the resulting aggregate throughput
 # for every (traffic, scheduling).
 #
-# This operation can take a long time: there are 17 traffic patters and 2
-# scheduling algorithms, and each of the 34 runs takes from ~30 seconds
-# (on a fast EC2 instance) to ~2 minutes (on a slow laptop VM).
+# There are 17 traffic patterns and 3 scheduling algorithms. Each run starts
+# its own POX controller on its own OpenFlow port, in its own process group,
+# and waits for it to listen instead of sleeping. Mininet's switch and
+# interface names are global to the machine, so only one Mininet runs at a
+# time; with --jobs N, the next N - 1 controllers start up and the previous
+# ones shut down while it does.
+#
+# Results already in results/ are skipped, so an interrupted sweep resumes
+# where it stopped; pass --force to measure everything again.
 #
 # Usage:
 #     $ cd ~/244proj/
 #     $ sudo python measure_all_the_things.py
+#     $ sudo python measure_all_the_things.py --jobs 3 --algorithm gff
 #
 # by Anh Trong (anhlt92)
 # and Ian Walsh (iwalsh)
 # for CS 244, Spring 2015
 
+import json
 import os
+import signal
 import subprocess
-from multiprocessing import Process
+import threading
+from argparse import ArgumentParser
+from Queue import Queue
 from time import sleep, time
 
 TRAFFIC_DIR = 'traffic/'
-RESULTS_DIR = 'all_the_things/'
+RESULTS_DIR = 'results/'
+
+POX_PATH = os.path.expanduser('~/pox/pox.py')
+CONTROLLERS = {
+    'ecmp': 'controllers.riplpox --topo=ft,4 --routing=hashed --mode=reactive',
+    'gff': 'controllers.hederaController --topo=ft,4',
+    'anneal': 'controllers.hederaController --topo=ft,4 --schedule=anneal'
+}
+
+# OpenFlow port of the first job's controller; job i listens on BASE_PORT + i
+BASE_PORT = 6633
+
+# Seconds to wait for a controller to listen, and to exit once signalled
+LISTEN_TIMEOUT = 30
+EXIT_TIMEOUT = 10
+
+# TCP state code for LISTEN in /proc/net/tcp
+TCP_LISTEN = '0A'
+
+parser = ArgumentParser(description='Run every Hedera measurement')
+parser.add_argument('--jobs', type=int, default=2,
+                    help='Experiments in flight at once')
+parser.add_argument('--algorithm', type=str, nargs='+',
+                    default=sorted(CONTROLLERS), choices=sorted(CONTROLLERS),
+                    help='Scheduling algorithms to measure')
+parser.add_argument('--force', action='store_true',
+                    help='Measure again even if results exist')
 
+# Serializes Mininet runs; see the header.
+mininet_lock = threading.Lock()
 
-def run_ecmp_controller(stdout_fd):
+# Controllers still running, to tear down on Ctrl-C: their own process
+# groups don't get the terminal's SIGINT.
+running = set()
+running_lock = threading.Lock()
+
+
+def port_listening(port):
     """
-    Run the POX controller using ECMP flow scheduling. This runs forever, so
-    it must be killed by the parent process.
+    Return True if some process listens on the TCP port, without connecting
+    to it (a probe connection would show up in the controller as a switch).
     """
-    cmd = '/bin/sh -c ~/pox/pox.py controllers.riplpox --topo=ft,4 --routing=hashed --mode=reactive'
-    return subprocess.Popen(cmd.split())
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        if not os.path.isfile(table):
+            continue
+        with open(table, 'r') as f:
+            f.readline()  # Header
+            for line in f:
+                fields = line.split()
+                local_port = int(fields[1].rsplit(':', 1)[1], 16)
+                if local_port == port and fields[3] == TCP_LISTEN:
+                    return True
+    return False
 
 
-def run_gff_controller(stdout_fd):
+def start_controller(algorithm, port, log):
+    """
+    Start POX for an algorithm on an OpenFlow port, in a new process group,
+    and wait until it listens.
+    """
+    cmd = [POX_PATH, 'openflow.of_01', '--port=%d' % port]
+    cmd += CONTROLLERS[algorithm].split()
+    controller = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT,
+                                  preexec_fn=os.setsid)
+    with running_lock:
+        running.add(controller)
+
+    deadline = time() + LISTEN_TIMEOUT
+    while not port_listening(port):
+        if controller.poll() is not None:
+            stop_controller(controller)
+            raise Exception('Controller exited with status %d' %
+                            controller.returncode)
+        if time() > deadline:
+            stop_controller(controller)
+            raise Exception('Controller not listening on port %d after %ds' %
+                            (port, LISTEN_TIMEOUT))
+        sleep(0.1)
+    return controller
+
+
+def stop_controller(controller):
+    """
+    Terminate the controller's whole process group and wait for it to exit.
     """
-    Run the Hedera controller using Global First-Fit flow scheduling. Runs
-    forever, so the parent should kill it when hedera.py is done.
+    with running_lock:
+        running.discard(controller)
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(controller.pid, sig)
+        except OSError:
+            return  # Already gone
+        deadline = time() + EXIT_TIMEOUT
+        while controller.poll() is None and time() < deadline:
+            sleep(0.1)
+        if controller.poll() is not None:
+            return
+
+
+def measured(traffic_file, algorithm):
     """
-    cmd = '/bin/sh -c ~/pox/pox.py controllers.hederaController --topo=ft,4'
-    return subprocess.Popen(cmd.split())
+    Return True if results/ already holds this (traffic, algorithm).
+    """
+    outfile = RESULTS_DIR + traffic_file.split('/')[-1]
+    if not os.path.isfile(outfile):
+        return False
+    with open(outfile, 'r') as f:
+        return ('%s_mean_gbps' % algorithm) in json.load(f)
 
 
-def run_measurements(label, traffic_file):
+def run_experiment(traffic_file, algorithm, port):
     """
-    Run the hedera.py script to start Mininet and take one measurement of
-    aggregate throughput for a single traffic pattern and controller. This
-    completes in ~1 minute, so the caller blocks until it's done.
+    Take one measurement of aggregate throughput for a single traffic
+    pattern and controller.
     """
-    cmd = 'sudo python hedera.py %s %s' % (label, traffic_file)
-    return subprocess.Popen(cmd.split())
+    start = time()
+    with open('/dev/null', 'w') as devnull:
+        controller = start_controller(algorithm, port, devnull)
+        try:
+            with mininet_lock:
+                print '\nTaking the %s measurement for %s...' %\
+                      (algorithm.upper(), traffic_file)
+                cmd = ['python', 'hedera.py', algorithm, traffic_file,
+                       '--port', str(port)]
+                status = subprocess.call(cmd)
+        finally:
+            stop_controller(controller)
+
+    if status != 0:
+        raise Exception('hedera.py exited with status %d' % status)
+    print '\nFinished %s measurement for %s in %0.2fs!' %\
+          (algorithm.upper(), traffic_file, time() - start)
+
+
+def worker(port, experiments, failures):
+    while True:
+        experiment = experiments.get()
+        if experiment is None:
+            return
+        try:
+            run_experiment(experiment[0], experiment[1], port)
+        except Exception as e:
+            print '\n%s %s failed: %s' % (experiment[0], experiment[1], e)
+            failures.append(experiment)
 
 
 def main():
+    args = parser.parse_args()
     if not os.path.isdir(RESULTS_DIR):
         os.mkdir(RESULTS_DIR)
 
-    for name in os.listdir(TRAFFIC_DIR):
-        filepath = TRAFFIC_DIR + name
-        if not (os.path.isfile(filepath) and filepath.endswith('.json')):
-            continue
-
-        with open('/dev/null', 'w') as devnull:
-            # ECMP measurement
-            print '\nTaking the ECMP measurement for %s...' % filepath
-            print '=====================================\n'
-            start = time()
-
-            controller = run_ecmp_controller(devnull)
-            sleep(2)
-
-            mininet = run_measurements('ecmp', filepath)
-            mininet.wait()
-
-            controller.kill()
-            print '\nFinished ECMP measurement in %02fs!' % (time() - start)
-            sleep(5)
-
-            # GFF measurement
-            print '\nTaking the GFF measurement for %s...' % filepath
-            print '====================================\n'
-            start = time()
-
-            controller = run_gff_controller(devnull)
-            sleep(2)
-
-            mininet = run_measurements('gff', filepath)
-            mininet.wait()
-
-            controller.kill()
-            print '\nFinished ECMP measurement in %02fs!' % (time() - start)
-            sleep(5)
-
+    experiments = Queue()
+    n_experiments = 0
+    for algorithm in args.algorithm:
+        for name in sorted(os.listdir(TRAFFIC_DIR)):
+            filepath = TRAFFIC_DIR + name
+            if not (os.path.isfile(filepath) and filepath.endswith('.json')):
+                continue
+            if not args.force and measured(filepath, algorithm):
+                print 'Skipping %s %s: already measured' % (filepath, algorithm)
+                continue
+            experiments.put((filepath, algorithm))
+            n_experiments += 1
+
+    start = time()
+    failures = []
+    workers = []
+    for i in range(args.jobs):
+        experiments.put(None)
+        t = threading.Thread(target=worker,
+                             args=(BASE_PORT + i, experiments, failures))
+        t.daemon = True
+        t.start()
+        workers.append(t)
+    try:
+        for t in workers:
+            while t.is_alive():
+                t.join(1.0)
+    except KeyboardInterrupt:
+        print '\nInterrupted; stopping controllers...'
+        with running_lock:
+            controllers = list(running)
+        for controller in controllers:
+            stop_controller(controller)
+        raise
+
+    print '\nRan %d experiments in %0.2fs, %d failed' %\
+          (n_experiments, time() - start, len(failures))
+    for traffic_file, algorithm in failures:
+        print '  %s %s' % (traffic_file, algorithm)
     print '\nAll done! Whew!'
 
 if __name__ == '__main__':
@@ -22,18 +22,18 @@ from math import ceil
 
 RESULTS_DIR = 'results/'
 
-# Keys in the results/*.json dictionaries
-ECMP_MEAN = 'ecmp_mean_gbps'
-ECMP_STDDEV = 'ecmp_stddev_gbps'
-GFF_MEAN = 'gff_mean_gbps'
-GFF_STDDEV = 'gff_stddev_gbps'
+# Series to plot: (algorithm, label, color). Keys in the results/*.json
+# dictionaries are <algorithm>_mean_gbps and <algorithm>_stddev_gbps.
+SERIES = (('ecmp', 'ECMP', 'r'),
+          ('gff', 'Global First-Fit', 'g'),
+          ('anneal', 'Simulated Annealing', 'b'))
 
 # Plot params
 TRAFFICS_PER_ROW = 6
 LEGEND_BEST = 0
 LEGEND_UPPER_LEFT = 2
 LEGEND_CENTER_BOTTOM = 8
-BAR_WIDTH = 0.35
+BAR_WIDTH = 0.27
 OPACITY = 1.0
 ERROR_CONFIG = {'ecolor': '0.3'}
 
@@ -61,49 +61,26 @@ def load_data():
 
 def extract_means(data):
     """
-    Return two lists of means, ordered by traffic pattern in data's keyset
+    Return a list of means per series, ordered by traffic pattern in data's
+    keyset
     """
-    means_ecmp = []
-    means_gff = []
-
-    for label in sorted(data):
-        if ECMP_MEAN in data[label]:
-            means_ecmp.append(data[label][ECMP_MEAN])
-        else:
-            means_ecmp.append(0.0)
-
-        if GFF_MEAN in data[label]:
-            means_gff.append(data[label][GFF_MEAN])
-        else:
-            means_gff.append(0.0)
-
-    return (means_ecmp, means_gff)
+    return [[data[label].get('%s_mean_gbps' % algorithm, 0.0)
+             for label in sorted(data)]
+            for algorithm, _, _ in SERIES]
 
 
 def extract_stddevs(data):
     """
-    Extract two lists of stddevs, ordered by traffic pattern
+    Extract a list of stddevs per series, ordered by traffic pattern
     """
-    stddevs_ecmp = []
-    stddevs_gff = []
-
-    for label in sorted(data):
-        if ECMP_STDDEV in data[label]:
-            stddevs_ecmp.append(data[label][ECMP_STDDEV])
-        else:
-            stddevs_ecmp.append(0.0)
-
-        if GFF_STDDEV in data[label]:
-            stddevs_gff.append(data[label][GFF_STDDEV])
-        else:
-            stddevs_gff.append(0.0)
-
-    return (stddevs_ecmp, stddevs_gff)
+    return [[data[label].get('%s_stddev_gbps' % algorithm, 0.0)
+             for label in sorted(data)]
+            for algorithm, _, _ in SERIES]
 
 
 def plot(data):
-    (means_ecmp, means_gff) = extract_means(data)
-    (stddevs_ecmp, stddevs_gff) = extract_stddevs(data)
+    means = extract_means(data)
+    stddevs = extract_stddevs(data)
     traffics = sorted(data.keys())
 
     n_rows = int(ceil(float(len(traffics)) / TRAFFICS_PER_ROW))
@@ -114,34 +91,23 @@ def plot(data):
         upper = r * TRAFFICS_PER_ROW + TRAFFICS_PER_ROW
 
         # Slice data for this row
-        row_ecmp_avgs = means_ecmp[lower:upper]
-        row_ecmp_devs = stddevs_ecmp[lower:upper]
-        row_gff_avgs = means_gff[lower:upper]
-        row_gff_devs = stddevs_gff[lower:upper]
         row_traffics = traffics[lower:upper]
-
-        index = range(len(row_ecmp_avgs))
-        index2 = map(lambda x: x + BAR_WIDTH, index)
+        index = range(len(row_traffics))
 
         plt.subplot(n_rows, 1, r + 1)
 
-        # ECMP bars
-        plt.bar(index, row_ecmp_avgs, BAR_WIDTH,
-                alpha=OPACITY,
-                color='r',
-                yerr=row_ecmp_devs,
-                error_kw=ERROR_CONFIG,
-                label='ECMP')
-
-        # GFF bars
-        plt.bar(index2, row_gff_avgs, BAR_WIDTH,
-                alpha=OPACITY,
-                color='g',
-                yerr=row_gff_devs,
-                error_kw=ERROR_CONFIG,
-                label='Global First-Fit')
-
-        plt.xticks(index2, row_traffics)
+        # One bar per series, side by side
+        for i, (_, label, color) in enumerate(SERIES):
+            plt.bar(map(lambda x: x + i * BAR_WIDTH, index),
+                    means[i][lower:upper], BAR_WIDTH,
+                    alpha=OPACITY,
+                    color=color,
+                    yerr=stddevs[i][lower:upper],
+                    error_kw=ERROR_CONFIG,
+                    label=label)
+
+        plt.xticks(map(lambda x: x + BAR_WIDTH * len(SERIES) / 2, index),
+                   row_traffics)
 
         if r == 0:
             plt.title('Comparison of scheduling performance')
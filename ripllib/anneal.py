@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+'''@package anneal
+
+Simulated annealing flow placement for a FatTreeTopo, as in the Hedera paper.
+
+Instead of searching paths flow by flow, annealing assigns each destination
+host a core switch: every flow to the host crosses that core, which fixes its
+whole path.  Hosts in a pod start on distinct cores, and a move swaps the
+cores of two hosts in the same pod.  The energy of an assignment is the total
+load in excess of capacity over all links, kept in one array with an entry
+per link direction and updated only along the flows a move touches.
+'''
+
+import math
+import random
+from time import time
+
+import numpy as np
+
+# Iterations per scheduling round, and wall-clock seconds allowed for one
+DEFAULT_ITERATIONS = 1000
+DEFAULT_DEADLINE = 0.1
+
+# Energy below which an assignment overloads no link
+EPSILON = 1e-9
+
+
+class Annealer(object):
+    '''Assigns destination hosts to core switches by simulated annealing.
+
+    A core switch is numbered a * k/2 + c, from the position a of the agg
+    switch below it within a pod and its own position c among that agg
+    switch's cores.  A flow between pods crosses its destination's core; a
+    flow within a pod crosses the agg switch below that core; a flow within
+    an edge switch crosses no links.
+
+    Unlike LinkUsage reservations, loads are per direction: link id l of
+    LinkUsage is l going up and l + num_links going down.
+
+    The assignment is kept between rounds, so each round starts from the
+    last one's placement.
+    '''
+
+    def __init__(self, link_usage, iterations = DEFAULT_ITERATIONS,
+                 deadline = DEFAULT_DEADLINE, seed = None):
+        '''Create Annealer object.
+
+        @param link_usage LinkUsage of the topology, for its link ids and
+            path matrices; its reservations are not used
+        @param iterations maximum moves tried per round
+        @param deadline maximum seconds per round, or None for no limit
+        @param seed random seed
+        '''
+        self.link_usage = link_usage
+        self.iterations = iterations
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        half = link_usage.half
+        self.half = half
+        self.hosts_per_pod = half * half
+        self.num_hosts = 2 * half * self.hosts_per_pod
+
+        # Host i of each pod starts on core i.
+        self.cores = np.arange(self.num_hosts) % self.hosts_per_pod
+
+        # Row of each core, or of the agg switch below it, in path matrices.
+        self.inter_rows = np.empty(self.hosts_per_pod, dtype = np.int32)
+        self.inter_rows[link_usage.aggs * half + link_usage.cores] = \
+            np.arange(self.hosts_per_pod)
+        self.intra_rows = np.empty(half, dtype = np.int32)
+        self.intra_rows[link_usage.intra_aggs] = np.arange(half)
+
+        # Offset of each hop's directed link id, by path length: the first
+        # half of a path goes up, the rest comes down.
+        n = link_usage.num_links
+        self.directions = {0: np.zeros(0, dtype = np.int32),
+                           2: np.array([0, n], dtype = np.int32),
+                           4: np.array([0, 0, n, n], dtype = np.int32)}
+
+    def _path_idx(self, src_host, dst_host, core):
+        '''Return the index of the path a flow takes through a core.'''
+        half = self.half
+        if src_host / self.hosts_per_pod != dst_host / self.hosts_per_pod:
+            return int(self.inter_rows[core])
+        elif src_host / half != dst_host / half:
+            return int(self.intra_rows[core / half])
+        return 0
+
+    def _links(self, f, core):
+        '''Return the directed link ids flow f crosses through a core.'''
+        src_host = self.src_hosts[f]
+        dst_host = self.dst_hosts[f]
+        half = self.half
+        links = self.link_usage.path_links(src_host / half, dst_host / half)
+        return (links[self._path_idx(src_host, dst_host, core)] +
+                self.directions[links.shape[1]])
+
+    def schedule(self, src_hosts, dst_hosts, demands):
+        '''Place flows by annealing the core assignment.
+
+        @param src_hosts source host index of each flow
+        @param dst_hosts destination host index of each flow
+        @param demands demand of each flow, as a fraction of link capacity
+        @return paths path index of each flow, as in LinkUsage.path_links
+        '''
+        self.src_hosts = src_hosts = list(src_hosts)
+        self.dst_hosts = dst_hosts = list(dst_hosts)
+        demands = list(demands)
+        if not demands:
+            return []
+
+        flows_to = {}  # [dst_host] -> flow indices
+        for f, dst_host in enumerate(dst_hosts):
+            flows_to.setdefault(dst_host, []).append(f)
+        receivers = sorted(flows_to)
+
+        capacity = self.link_usage.capacity
+        load = np.zeros(2 * self.link_usage.num_links)
+        for f in range(len(demands)):
+            load[self._links(f, self.cores[dst_hosts[f]])] += demands[f]
+        energy = np.maximum(load - capacity, 0).sum()
+        best_energy = energy
+        best_cores = self.cores.copy()
+
+        # Start hot enough to accept a move that overloads one link by a
+        # whole flow's demand about a third of the time.
+        temperature = max(demands)
+        stop = None
+        if self.deadline is not None:
+            stop = time() + self.deadline
+
+        rng = self.rng
+        cores = self.cores
+        for i in xrange(self.iterations):
+            if best_energy <= EPSILON or (stop is not None and time() > stop):
+                break
+
+            h1 = rng.choice(receivers)
+            pod_start = h1 - h1 % self.hosts_per_pod
+            h2 = pod_start + rng.randrange(self.hosts_per_pod - 1)
+            if h2 >= h1:
+                h2 += 1
+            moved = flows_to[h1] + flows_to.get(h2, [])
+            old = [self._links(f, cores[dst_hosts[f]]) for f in moved]
+            cores[h1], cores[h2] = cores[h2], cores[h1]
+            new = [self._links(f, cores[dst_hosts[f]]) for f in moved]
+
+            touched = np.unique(np.concatenate(old + new))
+            before = np.maximum(load[touched] - capacity, 0).sum()
+            for f, old_links, new_links in zip(moved, old, new):
+                load[old_links] -= demands[f]
+                load[new_links] += demands[f]
+            delta = np.maximum(load[touched] - capacity, 0).sum() - before
+
+            t = temperature * (1.0 - float(i) / self.iterations)
+            if delta <= 0 or rng.random() < math.exp(-delta / t):
+                energy += delta
+                if energy < best_energy:
+                    best_energy = energy
+                    best_cores = cores.copy()
+            else:
+                for f, old_links, new_links in zip(moved, old, new):
+                    load[new_links] -= demands[f]
+                    load[old_links] += demands[f]
+                cores[h1], cores[h2] = cores[h2], cores[h1]
+
+        self.cores = best_cores
+        return [self._path_idx(src_hosts[f], dst_hosts[f],
+                               best_cores[dst_hosts[f]])
+                for f in range(len(demands))]
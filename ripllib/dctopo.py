@@ -20,6 +20,8 @@ PORT_BASE = 1  # starting index for OpenFlow switch ports
 class NodeID(object):
     '''Topo node identifier.'''
 
+    __slots__ = ('dpid',)
+
     def __init__(self, dpid = None):
         '''Init.
 
@@ -85,7 +87,11 @@ class StructuredEdgeSpec(object):
 
 
 class StructuredTopo(Topo):
-    '''Data center network representation for structured multi-trees.'''
+    '''Data center network representation for structured multi-trees.
+
+    Layer membership and up/down neighbours are indexed as nodes and links are
+    added, so the layer and neighbour accessors never scan the graph.
+    '''
 
     def __init__(self, node_specs, edge_specs):
         '''Create StructuredTopo object.
@@ -94,10 +100,81 @@ class StructuredTopo(Topo):
         @param edge_specs list of StructuredEdgeSpec objects for down-links,
             one per layer
         '''
+        self._layer_nodes = {}  # [layer] -> list of names
+        self._node_layer = {}  # [name] -> layer it is indexed under
+        self._up_nodes = {}  # [name] -> tuple of names one layer up
+        self._down_nodes = {}  # [name] -> tuple of names one layer down
+        self._up_edges = {}  # [name] -> tuple of name pairs one layer up
+        self._down_edges = {}  # [name] -> tuple of name pairs one layer down
         super(StructuredTopo, self).__init__()
         self.node_specs = node_specs
         self.edge_specs = edge_specs
 
+    def _index_node(self, name):
+        '''Add a node to the layer index, or move it if its layer changed.
+
+        @param name name of node
+        '''
+        layer = self.layer(name)
+        old_layer = self._node_layer.get(name)
+        if old_layer == layer:
+            return
+        if old_layer is not None:
+            self._layer_nodes[old_layer].remove(name)
+        self._node_layer[name] = layer
+        self._layer_nodes.setdefault(layer, []).append(name)
+        self._up_nodes.setdefault(name, ())
+        self._down_nodes.setdefault(name, ())
+        self._up_edges.setdefault(name, ())
+        self._down_edges.setdefault(name, ())
+
+    def add_switch(self, name, **opts):
+        '''Add switch and index it by layer.
+
+        @param name name of switch
+        @return name name of switch
+        '''
+        result = super(StructuredTopo, self).add_switch(name, **opts)
+        self._index_node(name)
+        return result
+
+    def add_host(self, name, **opts):
+        '''Add host and index it by layer.
+
+        @param name name of host
+        @return name name of host
+        '''
+        result = super(StructuredTopo, self).add_host(name, **opts)
+        self._index_node(name)
+        return result
+
+    def add_link(self, node1, node2, *args, **opts):
+        '''Add link and record it as an up or down neighbour.
+
+        Links between nodes that are not in adjacent layers are added to the
+        graph but not indexed, matching up_nodes and down_nodes.
+
+        @param node1 name of first node
+        @param node2 name of second node
+        @return key link key
+        '''
+        result = super(StructuredTopo, self).add_link(node1, node2, *args,
+                                                      **opts)
+        layer1 = self.layer(node1)
+        layer2 = self.layer(node2)
+        if layer1 == layer2 + 1:
+            lower, upper = node1, node2
+        elif layer2 == layer1 + 1:
+            lower, upper = node2, node1
+        else:
+            return result
+        if upper not in self._up_nodes[lower]:
+            self._up_nodes[lower] += (upper,)
+            self._up_edges[lower] += ((lower, upper),)
+            self._down_nodes[upper] += (lower,)
+            self._down_edges[upper] += ((upper, lower),)
+        return result
+
     def def_nopts(self, layer):
         '''Return default dict for a structured topo.
 
@@ -125,54 +202,53 @@ class StructuredTopo(Topo):
     def layer_nodes(self, layer):
         '''Return nodes at a provided layer.
 
+        The list is shared with the index; do not modify it.
+
         @param layer layer
         @return names list of names
         '''
-        def is_layer(n):
-            '''Returns true if node is at layer.'''
-            return self.layer(n) == layer
-
-        nodes = [n for n in self.g.nodes() if is_layer(n)]
-        return nodes
+        return self._layer_nodes.get(layer, [])
 
     def up_nodes(self, name):
         '''Return edges one layer higher (closer to core).
 
         @param name name
 
-        @return names list of names
+        @return names tuple of names
         '''
-        layer = self.layer(name) - 1
-        nodes = [n for n in self.g[name] if self.layer(n) == layer]
-        return nodes
+        return self._up_nodes[name]
 
     def down_nodes(self, name):
         '''Return edges one layer higher (closer to hosts).
 
         @param name name
-        @return names list of names
+        @return names tuple of names
         '''
-        layer = self.layer(name) + 1
-        nodes = [n for n in self.g[name] if self.layer(n) == layer]
-        return nodes
+        return self._down_nodes[name]
 
     def up_edges(self, name):
         '''Return edges one layer higher (closer to core).
 
         @param name name
-        @return up_edges list of name pairs
+        @return up_edges tuple of name pairs
         '''
-        edges = [(name, n) for n in self.up_nodes(name)]
-        return edges
+        return self._up_edges[name]
 
     def down_edges(self, name):
         '''Return edges one layer lower (closer to hosts).
 
         @param name name
-        @return down_edges list of name pairs
+        @return down_edges tuple of name pairs
         '''
-        edges = [(name, n) for n in self.down_nodes(name)]
-        return edges
+        return self._down_edges[name]
+
+    def path_ports(self, path):
+        '''Return the ports joining each consecutive pair of nodes on a path.
+
+        @param path list of names
+        @return ports list of (out_port, in_port) tuples, one per hop
+        '''
+        return [self.port(path[i], path[i + 1]) for i in range(len(path) - 1)]
 
 #    def draw(self, filename = None, edge_width = 1, node_size = 1,
 #             node_color = 'g', edge_color = 'b'):
@@ -230,7 +306,14 @@ class FatTreeTopo(StructuredTopo):
     LAYER_HOST = 3
 
     class FatTreeNodeID(NodeID):
-        '''Fat Tree-specific node.'''
+        '''Fat Tree-specific node.
+
+        Immutable, with its string conversions computed once, so that a
+        FatTreeTopo can intern one instance per node and hand it out from
+        id_gen.
+        '''
+
+        __slots__ = ('pod', 'sw', 'host', '_name', '_mac', '_ip')
 
         def __init__(self, pod = 0, sw = 0, host = 0, dpid = None, name = None):
             '''Create FatTreeNodeID object from custom params.
@@ -244,36 +327,40 @@ class FatTreeTopo(StructuredTopo):
             @param name optional name
             '''
             if dpid:
-                self.pod = (dpid & 0xff0000) >> 16
-                self.sw = (dpid & 0xff00) >> 8
-                self.host = (dpid & 0xff)
-                self.dpid = dpid
+                pod = (dpid & 0xff0000) >> 16
+                sw = (dpid & 0xff00) >> 8
+                host = (dpid & 0xff)
             elif name:
                 pod, sw, host = [int(s) for s in name.split('_')]
-                self.pod = pod
-                self.sw = sw
-                self.host = host
-                self.dpid = (pod << 16) + (sw << 8) + host
+                dpid = (pod << 16) + (sw << 8) + host
             else:
-                self.pod = pod
-                self.sw = sw
-                self.host = host
-                self.dpid = (pod << 16) + (sw << 8) + host
+                dpid = (pod << 16) + (sw << 8) + host
+            init = super(FatTreeTopo.FatTreeNodeID, self).__setattr__
+            init('pod', pod)
+            init('sw', sw)
+            init('host', host)
+            init('dpid', dpid)
+            init('_name', "%i_%i_%i" % (pod, sw, host))
+            init('_mac', "00:00:00:%02x:%02x:%02x" % (pod, sw, host))
+            init('_ip', "10.%i.%i.%i" % (pod, sw, host))
+
+        def __setattr__(self, name, value):
+            raise AttributeError("FatTreeNodeID is immutable")
 
         def __str__(self):
             return "(%i, %i, %i)" % (self.pod, self.sw, self.host)
 
         def name_str(self):
             '''Return name string'''
-            return "%i_%i_%i" % (self.pod, self.sw, self.host)
+            return self._name
 
         def mac_str(self):
             '''Return MAC string'''
-            return "00:00:00:%02x:%02x:%02x" % (self.pod, self.sw, self.host)
+            return self._mac
 
         def ip_str(self):
             '''Return IP string'''
-            return "10.%i.%i.%i" % (self.pod, self.sw, self.host)
+            return self._ip
     """
     def _add_port(self, src, dst):
         '''Generate port mapping for new edge.
@@ -305,12 +392,17 @@ class FatTreeTopo(StructuredTopo):
         return d
 
 
-    def __init__(self, k = 4, speed = 1.0):
+    def __init__(self, k = 4, speed = 1.0, port_map = True):
         '''Init.
 
         @param k switch degree
         @param speed bandwidth in Gbps
+        @param port_map precompute port numbers for every link
         '''
+        self._ids_by_dpid = {}  # [dpid] -> interned FatTreeNodeID
+        self._ids_by_name = {}  # [name] -> interned FatTreeNodeID
+        self._port_map = None  # [src][dst] -> (src_port, dst_port)
+
         core = StructuredNodeSpec(0, k, None, speed, type_str = 'core')
         agg = StructuredNodeSpec(k / 2, k / 2, speed, speed, type_str = 'agg')
         edge = StructuredNodeSpec(k / 2, k / 2, speed, speed,
@@ -321,7 +413,6 @@ class FatTreeTopo(StructuredTopo):
         super(FatTreeTopo, self).__init__(node_specs, edge_specs)
 
         self.k = k
-        self.id_gen = FatTreeTopo.FatTreeNodeID
         self.numPods = k
         self.aggPerPod = k / 2
 
@@ -358,10 +449,92 @@ class FatTreeTopo(StructuredTopo):
                     self.add_switch(core_id, **core_opts)
                     self.add_link(core_id, agg_id)
 
+        if port_map:
+            self._build_port_map()
+
+    def _build_port_map(self):
+        '''Precompute the port pair of every link, in both directions.'''
+        port_map = {}
+        for layer in (self.LAYER_HOST, self.LAYER_EDGE, self.LAYER_AGG):
+            for src in self.layer_nodes(layer):
+                for dst in self.up_nodes(src):
+                    src_port, dst_port = self._port(src, dst)
+                    port_map.setdefault(src, {})[dst] = (src_port, dst_port)
+                    port_map.setdefault(dst, {})[src] = (dst_port, src_port)
+        self._port_map = port_map
+
+
+    def id_gen(self, pod = 0, sw = 0, host = 0, dpid = None, name = None):
+        '''Return the interned FatTreeNodeID for a node.
+
+        Takes the same arguments as FatTreeNodeID.  Each id is built once, on
+        first use, and returned from a dict lookup afterwards.
+
+        @param pod pod ID
+        @param sw switch ID
+        @param host host ID
+        @param dpid optional dpid
+        @param name optional name
+        @return id FatTreeNodeID object
+        '''
+        if dpid:
+            node_id = self._ids_by_dpid.get(dpid)
+        elif name:
+            node_id = self._ids_by_name.get(name)
+        else:
+            node_id = self._ids_by_dpid.get((pod << 16) + (sw << 8) + host)
+        if node_id is None:
+            node_id = FatTreeTopo.FatTreeNodeID(pod, sw, host, dpid, name)
+            self._ids_by_dpid[node_id.dpid] = node_id
+            self._ids_by_name[node_id.name_str()] = node_id
+        return node_id
+
+    def host_names(self):
+        '''Return host names ordered by host index.
+
+        Host index x is the one used in traffic matrices: hosts are numbered
+        pod by pod, edge switch by edge switch.
+
+        @return names list of host names
+        '''
+        k = self.k
+        return [self.id_gen(pod, sw, host).name_str()
+                for pod in range(k)
+                for sw in range(k / 2)
+                for host in range(2, k / 2 + 2)]
 
     def port(self, src, dst):
         '''Get port number (optional)
 
+        Served from the precomputed port map when one was built.
+
+        @param src source switch name
+        @param dst destination switch name
+        @return tuple (src_port, dst_port):
+            src_port: port on source switch leading to the destination switch
+            dst_port: port on destination switch leading to the source switch
+        '''
+        if self._port_map is not None:
+            try:
+                return self._port_map[src][dst]
+            except KeyError:
+                pass
+        return self._port(src, dst)
+
+    def path_ports(self, path):
+        '''Return the ports joining each consecutive pair of nodes on a path.
+
+        @param path list of names
+        @return ports list of (out_port, in_port) tuples, one per hop
+        '''
+        port_map = self._port_map
+        if port_map is None:
+            return super(FatTreeTopo, self).path_ports(path)
+        return [port_map[path[i]][path[i + 1]] for i in range(len(path) - 1)]
+
+    def _port(self, src, dst):
+        '''Compute port number
+
         Note that the topological significance of DPIDs in FatTreeTopo enables
         this function to be implemented statelessly.
 
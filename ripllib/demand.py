@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+'''@package demand
+
+Hedera flow demand estimation.
+
+Estimates the natural demand of each flow, the rate it would reach if only
+its sender and receiver NICs limited it, by alternately splitting each
+sender's capacity among its flows and capping each receiver's incoming flows
+at their max-min fair share (Al-Fares et al., "Hedera: Dynamic Flow
+Scheduling for Data Center Networks", NSDI 2010).
+'''
+
+# Tolerance when deciding whether a demand changed
+EPSILON = 1e-9
+
+
+class DemandEstimator(object):
+    '''Host-by-host flow matrix with natural demand estimates.
+
+    Hosts are integer indices.  The matrix is sparse: each sender keeps a
+    dict of receiver to flow count, and each receiver the reverse.  Flows
+    between the same pair of hosts always share one estimate, so demands are
+    stored per pair, keyed by src * num_hosts + dst.
+
+    Adding or removing a flow only re-estimates the hosts it is connected to
+    through other flows, since no other estimate can change.  Demands are
+    fractions of a host's NIC capacity.
+    '''
+
+    def __init__(self, num_hosts):
+        '''Create DemandEstimator object.
+
+        @param num_hosts number of hosts
+        '''
+        self.num_hosts = num_hosts
+        self.src_flows = [{} for _ in range(num_hosts)]  # [src][dst] -> count
+        self.dst_flows = [{} for _ in range(num_hosts)]  # [dst][src] -> count
+        self.demands = {}  # [src * num_hosts + dst] -> per-flow demand
+
+    def add_flow(self, src, dst, estimate = True):
+        '''Add one flow.
+
+        @param src sender host index
+        @param dst receiver host index
+        @param estimate re-estimate the affected hosts now
+        @return srcs senders whose flows were re-estimated
+        '''
+        dsts = self.src_flows[src]
+        dsts[dst] = dsts.get(dst, 0) + 1
+        srcs = self.dst_flows[dst]
+        srcs[src] = srcs.get(src, 0) + 1
+        self.demands.setdefault(src * self.num_hosts + dst, 0.0)
+        return self._reestimate(src, dst, estimate)
+
+    def remove_flow(self, src, dst, estimate = True):
+        '''Remove one flow.
+
+        @param src sender host index
+        @param dst receiver host index
+        @param estimate re-estimate the affected hosts now
+        @return srcs senders whose flows were re-estimated
+        '''
+        dsts = self.src_flows[src]
+        srcs = self.dst_flows[dst]
+        if dsts[dst] == 1:
+            del dsts[dst]
+            del srcs[src]
+            del self.demands[src * self.num_hosts + dst]
+        else:
+            dsts[dst] -= 1
+            srcs[src] -= 1
+        return self._reestimate(src, dst, estimate)
+
+    def _reestimate(self, src, dst, estimate):
+        '''Re-estimate the hosts connected to a changed host pair.
+
+        @return srcs senders whose flows were re-estimated
+        '''
+        if not estimate:
+            return []
+        srcs, dsts = self._component(src, dst)
+        self._estimate(srcs, dsts)
+        return srcs
+
+    def demand(self, src, dst):
+        '''Return the estimated demand of each flow from src to dst.
+
+        @param src sender host index
+        @param dst receiver host index
+        @return demand fraction of NIC capacity, or 0.0 if there is no flow
+        '''
+        return self.demands.get(src * self.num_hosts + dst, 0.0)
+
+    def estimate(self):
+        '''Re-estimate every flow from scratch.'''
+        srcs = [h for h in range(self.num_hosts) if self.src_flows[h]]
+        dsts = [h for h in range(self.num_hosts) if self.dst_flows[h]]
+        self._estimate(srcs, dsts)
+
+    def _component(self, src, dst):
+        '''Return the senders and receivers connected to a host pair.
+
+        @param src sender host index
+        @param dst receiver host index
+        @return (srcs, dsts) lists of host indices
+        '''
+        srcs = set([src])
+        dsts = set([dst])
+        src_queue = [src]
+        dst_queue = [dst]
+        while src_queue or dst_queue:
+            while src_queue:
+                for d in self.src_flows[src_queue.pop()]:
+                    if d not in dsts:
+                        dsts.add(d)
+                        dst_queue.append(d)
+            while dst_queue:
+                for s in self.dst_flows[dst_queue.pop()]:
+                    if s not in srcs:
+                        srcs.add(s)
+                        src_queue.append(s)
+        return (sorted(srcs), sorted(dsts))
+
+    def _estimate(self, srcs, dsts):
+        '''Run the Hedera estimation over a set of senders and receivers.
+
+        Each pass of the paper's loop estimates every sender, then every
+        receiver.  Senders only touch their own flows and receivers only
+        their incoming ones, so a pass can skip the hosts none of whose flows
+        changed in the previous half-pass; the result is the same.
+
+        @param srcs sender host indices; must be closed under flows
+        @param dsts receiver host indices; must be closed under flows
+        '''
+        n = self.num_hosts
+        for src in srcs:
+            for dst in self.src_flows[src]:
+                self.demands[src * n + dst] = 0.0
+
+        converged = set()  # pairs whose demand is receiver-limited
+        dirty_srcs = srcs
+        while dirty_srcs:
+            dirty_dsts = set()
+            for src in dirty_srcs:
+                dirty_dsts.update(self._est_src(src, converged))
+            dirty_srcs = set()
+            for dst in dirty_dsts:
+                dirty_srcs.update(self._est_dst(dst, converged))
+
+    def _est_src(self, src, converged):
+        '''Split a sender's spare capacity among its unconverged flows.
+
+        @param src sender host index
+        @param converged set of converged pairs
+        @return dsts receivers of the flows whose demand changed
+        '''
+        n = self.num_hosts
+        demands = self.demands
+        base = src * n
+        converged_demand = 0.0
+        unconverged = 0
+        for dst, count in self.src_flows[src].iteritems():
+            if base + dst in converged:
+                converged_demand += demands[base + dst] * count
+            else:
+                unconverged += count
+        if not unconverged:
+            return ()
+
+        share = max(1.0 - converged_demand, 0.0) / unconverged
+        changed = []
+        for dst in self.src_flows[src]:
+            pair = base + dst
+            if pair not in converged and abs(demands[pair] - share) > EPSILON:
+                demands[pair] = share
+                changed.append(dst)
+        return changed
+
+    def _est_dst(self, dst, converged):
+        '''Cap an oversubscribed receiver's flows at their fair share.
+
+        @param dst receiver host index
+        @param converged set of converged pairs
+        @return srcs senders of the flows whose demand changed
+        '''
+        n = self.num_hosts
+        demands = self.demands
+        srcs = self.dst_flows[dst]
+        total = 0.0
+        limited = 0
+        for src, count in srcs.iteritems():
+            total += demands[src * n + dst] * count
+            limited += count
+        if total <= 1.0 + EPSILON:
+            return ()
+
+        # Flows below the fair share keep their demand and free up capacity
+        # for the rest, which lowers the bar; repeat until nothing drops out.
+        receiver_limited = list(srcs)
+        share = 1.0 / limited
+        below = 0.0
+        dropped = True
+        while dropped:
+            dropped = False
+            limited = 0
+            remaining = []
+            for src in receiver_limited:
+                count = srcs[src]
+                demand = demands[src * n + dst]
+                if demand < share:
+                    below += demand * count
+                    dropped = True
+                else:
+                    limited += count
+                    remaining.append(src)
+            receiver_limited = remaining
+            if limited:
+                share = (1.0 - below) / limited
+
+        changed = []
+        for src in receiver_limited:
+            pair = src * n + dst
+            if abs(demands[pair] - share) > EPSILON:
+                demands[pair] = share
+                changed.append(src)
+            converged.add(pair)
+        return changed
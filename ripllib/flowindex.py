@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+'''@package flowindex
+
+Index of the active flows of a controller.
+
+Flows are keyed by 5-tuple.  Besides the primary dict, the index keeps the
+flows sent by each host, received by each host and placed on each path, and
+updates all of them on every change, so none of those queries scans the
+flows.
+'''
+
+# Path index of a flow with no assigned path
+NO_PATH = -1
+
+
+class FlowIndex(object):
+    '''Active flows with secondary indexes by source, destination and path.
+
+    A path is (src edge index, dst edge index, path index), with edge indices
+    derived from host indices as in PathTable.
+    '''
+
+    def __init__(self, hosts_per_edge):
+        '''Create FlowIndex object.
+
+        @param hosts_per_edge hosts below each edge switch, k/2 in a fat tree
+        '''
+        self.hosts_per_edge = hosts_per_edge
+        self.flows = {}  # [key] -> [src_host, dst_host, path index]
+        self.by_src = {}  # [src_host] -> set of keys
+        self.by_dst = {}  # [dst_host] -> set of keys
+        self.by_path = {}  # [path] -> set of keys
+
+    def __len__(self):
+        return len(self.flows)
+
+    def __contains__(self, key):
+        return key in self.flows
+
+    def add(self, key, src_host, dst_host):
+        '''Add a flow with no path, unless it is already indexed.
+
+        @param key 5-tuple
+        @param src_host source host index
+        @param dst_host destination host index
+        @return True if the flow is new
+        '''
+        if key in self.flows:
+            return False
+        self.flows[key] = [src_host, dst_host, NO_PATH]
+        self.by_src.setdefault(src_host, set()).add(key)
+        self.by_dst.setdefault(dst_host, set()).add(key)
+        return True
+
+    def remove(self, key):
+        '''Remove a flow.
+
+        @param key 5-tuple
+        @return (src_host, dst_host), or None if it was not indexed
+        '''
+        flow = self.flows.get(key)
+        if flow is None:
+            return None
+        self.set_path(key, NO_PATH)
+        del self.flows[key]
+        src_host, dst_host = flow[0], flow[1]
+        self._discard(self.by_src, src_host, key)
+        self._discard(self.by_dst, dst_host, key)
+        return (src_host, dst_host)
+
+    def _discard(self, index, value, key):
+        '''Remove a key from a secondary index, dropping empty sets.'''
+        keys = index[value]
+        keys.discard(key)
+        if not keys:
+            del index[value]
+
+    def _path(self, flow):
+        '''Return the by_path key of a flow with a path.'''
+        return (flow[0] / self.hosts_per_edge, flow[1] / self.hosts_per_edge,
+                flow[2])
+
+    def hosts(self, key):
+        '''Return (src_host, dst_host) of a flow.'''
+        flow = self.flows[key]
+        return (flow[0], flow[1])
+
+    def path(self, key):
+        '''Return the path index of a flow, or NO_PATH.'''
+        return self.flows[key][2]
+
+    def set_path(self, key, path_idx):
+        '''Assign a flow a path index, or NO_PATH.'''
+        flow = self.flows[key]
+        if flow[2] == path_idx:
+            return
+        if flow[2] != NO_PATH:
+            self._discard(self.by_path, self._path(flow), key)
+        flow[2] = path_idx
+        if path_idx != NO_PATH:
+            self.by_path.setdefault(self._path(flow), set()).add(key)
+
+    def sent_by(self, src_host):
+        '''Return the keys of flows from a host.'''
+        return self.by_src.get(src_host, frozenset())
+
+    def sent_to(self, dst_host):
+        '''Return the keys of flows to a host.'''
+        return self.by_dst.get(dst_host, frozenset())
+
+    def on_path(self, src_idx, dst_idx, path_idx):
+        '''Return the keys of flows on a path between two edge switches.'''
+        return self.by_path.get((src_idx, dst_idx, path_idx), frozenset())
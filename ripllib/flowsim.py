@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+'''@package flowsim
+
+Flow-level fat-tree network simulator.
+
+Stands in for Mininet when comparing flow scheduling policies.  Each flow of
+a traffic matrix is routed once by a path-selection policy and then given its
+max-min fair share of every link it crosses; there are no packets, processes
+or switches involved, so large k and many traffic matrices are cheap.
+'''
+
+import random
+from heapq import heapify, heappop, heappush
+from math import sqrt
+
+import numpy as np
+
+from ripllib.anneal import Annealer
+from ripllib.demand import DemandEstimator
+from ripllib.linkusage import LinkUsage
+from ripllib.routing import FatTreeRouting
+
+# Tolerance when comparing fair-share levels
+EPSILON = 1e-9
+
+
+def max_min_rates(flow_links, capacities):
+    '''Return the max-min fair rate of every flow.
+
+    Progressive filling: all unfrozen flows grow at the same rate until some
+    link saturates, which freezes the flows crossing it.  A link's
+    saturation level only rises as flows elsewhere freeze, so a heap of
+    levels with lazy re-insertion finds the next bottleneck.
+
+    @param flow_links list of link id lists, one per flow
+    @param capacities list of link capacities, indexed by link id
+    @return rates list of flow rates; 0 for flows that cross no link
+    '''
+    link_flows = [[] for _ in capacities]
+    for f, links in enumerate(flow_links):
+        for l in links:
+            link_flows[l].append(f)
+
+    active = [len(flows) for flows in link_flows]
+    frozen = [0.0] * len(capacities)
+    rates = [0.0 if not links else None for links in flow_links]
+
+    heap = [(float(capacities[l]) / active[l], l)
+            for l in range(len(capacities)) if active[l]]
+    heapify(heap)
+    while heap:
+        level, l = heappop(heap)
+        if not active[l]:
+            continue
+        current = (capacities[l] - frozen[l]) / active[l]
+        if current > level + EPSILON:
+            heappush(heap, (current, l))
+            continue
+        for f in link_flows[l]:
+            if rates[f] is not None:
+                continue
+            rates[f] = current
+            for m in flow_links[f]:
+                frozen[m] += current
+                active[m] -= 1
+                if active[m] and m != l:
+                    heappush(heap, ((capacities[m] - frozen[m]) / active[m],
+                                    m))
+    return rates
+
+
+def policy_ecmp(sim, flows, rng):
+    '''Hash each flow onto one of its equal-cost paths.
+
+    Stands in for the controllers' 5-tuple hash, which is effectively random
+    per flow since iperf picks its source port.
+    '''
+    routes = []
+    for src, dst in flows:
+        paths = sim.paths(src, dst)
+        routes.append(paths[rng.getrandbits(32) % len(paths)])
+    return routes
+
+
+def policy_gff(sim, flows, rng):
+    '''Global First Fit, as in HederaController.
+
+    Flows are placed in arrival order on the first path with room for their
+    demand, reserving it on every link; a flow that fits nowhere is hashed.
+    Once a link is found full, the other paths through it are skipped.
+    '''
+    capacities = sim.capacities
+    usage = [0.0] * len(capacities)
+    demands = sim.demands(flows)
+    routes = []
+    for (src, dst), demand in zip(flows, demands):
+        paths = sim.paths(src, dst)
+        next_index = getattr(paths, 'next_index', None)
+        route = None
+        index = 0
+        while index < len(paths):
+            path = paths[index]
+            links = sim.path_links(path)
+            for depth, l in enumerate(links):
+                if usage[l] + demand > capacities[l] + EPSILON:
+                    break
+            else:
+                for l in links:
+                    usage[l] += demand
+                route = path
+                break
+            if next_index is None:
+                index += 1
+            else:
+                index = next_index(index, depth + 2)
+        if route is None:
+            route = paths[rng.getrandbits(32) % len(paths)]
+        routes.append(route)
+    return routes
+
+
+def policy_anneal(sim, flows, rng):
+    '''Simulated annealing, as in HederaController's anneal schedule.
+
+    All flows are placed at once by annealing the core switch of each
+    destination host, with no deadline so results don't depend on machine
+    speed.
+    '''
+    ids = sim.host_ids
+    annealer = Annealer(LinkUsage(sim.topo), deadline = None,
+                        seed = rng.getrandbits(32))
+    paths = annealer.schedule([ids[src] for src, dst in flows],
+                              [ids[dst] for src, dst in flows],
+                              sim.demands(flows))
+    return [sim.paths(src, dst)[x] for (src, dst), x in zip(flows, paths)]
+
+
+POLICIES = {'ecmp': policy_ecmp,
+            'gff': policy_gff,
+            'anneal': policy_anneal}
+
+
+class FlowSimulator(object):
+    '''Flow-level simulator over a FatTreeTopo.'''
+
+    def __init__(self, topo, routing = None):
+        '''Create FlowSimulator object.
+
+        @param topo FatTreeTopo object
+        @param routing routing engine returning complete path sets; defaults
+            to FatTreeRouting
+        '''
+        self.topo = topo
+        self.routing = routing or FatTreeRouting(topo)
+        self.hosts = topo.host_names()
+        self.host_ids = dict((name, i) for i, name in enumerate(self.hosts))
+
+        # Every link, once per direction; capacity comes from the edge spec
+        # of the upper layer.
+        self.links = {}  # [(src, dst)] -> link id
+        self.capacities = []
+        for layer in range(1, len(topo.node_specs)):
+            for lower in topo.layer_nodes(layer):
+                for upper in topo.up_nodes(lower):
+                    speed = topo.edge_specs[layer - 1].speed
+                    for link in ((lower, upper), (upper, lower)):
+                        self.links[link] = len(self.capacities)
+                        self.capacities.append(speed)
+
+    def flows(self, traffic):
+        '''Return the (src, dst) host name pairs of a traffic matrix.
+
+        @param traffic flow records, as loaded by ripllib.trafficfile
+        @return flows list of (src, dst) name pairs, sorted by src index
+        '''
+        hosts = self.hosts
+        order = np.argsort(traffic['src'], kind = 'mergesort')
+        return [(hosts[src_idx], hosts[dst_idx])
+                for src_idx, dst_idx in zip(traffic['src'][order].tolist(),
+                                            traffic['dst'][order].tolist())]
+
+    def paths(self, src, dst):
+        '''Return the equal-cost paths between two hosts.'''
+        return self.routing.get_route(src, dst, None, True)
+
+    def path_links(self, path):
+        '''Return the link ids along a path.'''
+        links = self.links
+        return [links[(path[i], path[i + 1])] for i in range(len(path) - 1)]
+
+    def demands(self, flows):
+        '''Return the demand of each flow, as a fraction of link capacity.
+
+        Demands are the natural demands of the Hedera estimator, limited only
+        by sender and receiver NICs.
+        '''
+        ids = self.host_ids
+        estimator = DemandEstimator(len(self.hosts))
+        for src, dst in flows:
+            estimator.add_flow(ids[src], ids[dst], estimate = False)
+        estimator.estimate()
+        return [estimator.demand(ids[src], ids[dst]) for src, dst in flows]
+
+    def run(self, flows, policy, rng):
+        '''Route flows with a policy and return their max-min fair rates.
+
+        @param flows list of (src, dst) name pairs, in arrival order
+        @param policy policy function, e.g. from POLICIES
+        @param rng random.Random object
+        @return rates list of flow rates in Gbps
+        '''
+        routes = policy(self, flows, rng)
+        flow_links = [self.path_links(route) for route in routes]
+        return max_min_rates(flow_links, self.capacities)
+
+    def aggregate(self, traffic, policy, trials = 10, seed = None):
+        '''Return aggregate throughput over repeated trials.
+
+        Each trial shuffles the flow arrival order and redraws flow hashes,
+        like a fresh testbed run.
+
+        @param traffic flow records, as loaded by ripllib.trafficfile
+        @param policy policy function, e.g. from POLICIES
+        @param trials number of trials
+        @param seed random seed
+        @return (mean, stddev) of aggregate throughput in Gbps
+        '''
+        rng = random.Random(seed)
+        flows = self.flows(traffic)
+        totals = []
+        for _ in range(trials):
+            rng.shuffle(flows)
+            totals.append(sum(self.run(flows, policy, rng)))
+        mean = sum(totals) / len(totals)
+        variance = sum((t - mean) ** 2 for t in totals) / len(totals)
+        return (mean, sqrt(variance))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+'''@package linkusage
+
+Link reservation table for Global First Fit on a FatTreeTopo.
+
+Reserved bandwidth lives in one float array indexed by integer link id, and
+each edge pair's equal-cost paths are a matrix of link ids, so checking every
+candidate path for room is a single vectorized expression.
+'''
+
+import numpy as np
+
+from ripllib.routing import FatTreeRouting
+
+# Tolerance when checking a reservation against capacity
+EPSILON = 1e-9
+
+
+class LinkUsage(object):
+    '''Reserved bandwidth on every switch-to-switch link of a FatTreeTopo.
+
+    Reservations are symmetric, so each link has one id for both directions.
+    The link from edge switch e to the agg switch at position a within its
+    pod is e * k/2 + a; the link from agg switch g (numbered like edge
+    switches) to the core switch at position c above it is
+    num_edges * k/2 + g * k/2 + c.
+
+    Edge switches are numbered by edge index, as in PathTable.  Row x of
+    path_links(src_idx, dst_idx) holds the link ids of path x, hop by hop, in
+    the path order of FatTreeRouting and PathTable.  Matrices are built on
+    first use, so only edge pairs that carry flows take memory.
+    '''
+
+    def __init__(self, topo, capacity = 1.0):
+        '''Create LinkUsage object.
+
+        @param topo FatTreeTopo object
+        @param capacity capacity of every link
+        '''
+        self.capacity = capacity
+        half = topo.k / 2
+        self.half = half
+        self.num_links = 2 * topo.k * half * half
+        self.usage = np.zeros(self.num_links)
+        self.matrices = {}  # [(src_idx, dst_idx)] -> link id matrix
+
+        # Agg and core positions along each inter-pod path, in path order.
+        routing = FatTreeRouting(topo)
+        agg_pos = [a - half for a in routing.agg_order]
+        core_pos = [c - 1 for c in routing.core_order]
+        self.intra_aggs = np.array(agg_pos, dtype = np.int32)
+        self.aggs = np.repeat(self.intra_aggs, half)
+        self.cores = np.tile(np.array(core_pos, dtype = np.int32), half)
+
+    def path_links(self, src_idx, dst_idx):
+        '''Return the link ids of every path between two edge switches.
+
+        @param src_idx source edge index
+        @param dst_idx destination edge index
+        @return links int matrix with one row per path, one column per hop
+        '''
+        key = (src_idx, dst_idx)
+        links = self.matrices.get(key)
+        if links is not None:
+            return links
+
+        half = self.half
+        src_pod = src_idx / half
+        dst_pod = dst_idx / half
+        if src_idx == dst_idx:
+            links = np.zeros((1, 0), dtype = np.int32)
+        elif src_pod == dst_pod:
+            a = self.intra_aggs
+            links = np.column_stack((src_idx * half + a, dst_idx * half + a))
+        else:
+            a = self.aggs
+            base = self.num_links / 2
+            links = np.column_stack((
+                src_idx * half + a,
+                base + (src_pod * half + a) * half + self.cores,
+                base + (dst_pod * half + a) * half + self.cores,
+                dst_idx * half + a))
+        self.matrices[key] = links
+        return links
+
+    def first_fit(self, src_idx, dst_idx, demand):
+        '''Return the first path with room for a demand.
+
+        @param src_idx source edge index
+        @param dst_idx destination edge index
+        @param demand bandwidth to fit
+        @return path_idx index of the path, or None if no path fits
+        '''
+        links = self.path_links(src_idx, dst_idx)
+        if not links.shape[1]:
+            return 0
+        peak = self.usage[links].max(axis = 1) + demand
+        fits = np.flatnonzero(peak <= self.capacity + EPSILON)
+        if not len(fits):
+            return None
+        return int(fits[0])
+
+    def reserve(self, src_idx, dst_idx, path_idx, demand):
+        '''Reserve a demand on every link of a path.
+
+        @param src_idx source edge index
+        @param dst_idx destination edge index
+        @param path_idx index of the path
+        @param demand bandwidth to reserve
+        @return links link ids reserved, to pass to release()
+        '''
+        links = self.path_links(src_idx, dst_idx)[path_idx]
+        self.usage[links] += demand
+        return links
+
+    def release(self, links, demand):
+        '''Release a reservation made by reserve().
+
+        @param links link ids returned by reserve()
+        @param demand bandwidth reserved
+        '''
+        self.usage[links] -= demand
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+'''@package pathtable
+
+Precomputed all-pairs equal-cost path table for a FatTreeTopo.
+
+Every edge-to-edge ECMP path set is stored once, as integer switch ids packed
+into a flat array, instead of as lists of lists of name strings per host pair.
+'''
+
+from array import array
+
+from ripllib.routing import FatTreeRouting
+
+
+class PathTable(object):
+    '''All edge-to-edge equal-cost paths of a FatTreeTopo.
+
+    Switches are numbered arithmetically: edge switches first (pod-major, so
+    the edge index of (pod, sw, 1) is pod * k/2 + sw), then agg switches, then
+    core switches.  Paths for the (src_edge_idx, dst_edge_idx) pair start at
+    offsets[src_edge_idx * num_edges + dst_edge_idx] in the flat nodes array
+    and are laid out back to back, in the same sorted order that
+    HashedStructuredRouting chooses from.
+
+    The table holds O(k^6) switch ids, two bytes each.
+    '''
+
+    def __init__(self, topo):
+        '''Create PathTable object.
+
+        @param topo FatTreeTopo object
+        '''
+        self.topo = topo
+        k = topo.k
+        half = k / 2
+        self.k = k
+        self.half = half
+        self.num_edges = k * half
+        self.num_aggs = k * half
+        self.num_cores = half * half
+
+        # Names of every switch, indexed by switch id.
+        self.names = []
+        for pod in range(k):
+            for sw in range(half):
+                self.names.append(topo.id_gen(pod, sw, 1).name_str())
+        for pod in range(k):
+            for sw in range(half, k):
+                self.names.append(topo.id_gen(pod, sw, 1).name_str())
+        for i in range(1, half + 1):
+            for c in range(1, half + 1):
+                self.names.append(topo.id_gen(k, i, c).name_str())
+        self.ids = dict((name, i) for i, name in enumerate(self.names))
+
+        routing = FatTreeRouting(topo)
+        self.nodes = array('H')
+        self.offsets = array('L', [0]) * (self.num_edges ** 2 + 1)
+        self._build(routing.agg_order, routing.core_order)
+
+    def _agg_id(self, pod, sw):
+        '''Return switch id of agg switch (pod, sw, 1).'''
+        return self.num_edges + pod * self.half + sw - self.half
+
+    def _core_id(self, agg_sw, c):
+        '''Return switch id of core switch c above agg switches agg_sw.'''
+        return (self.num_edges + self.num_aggs +
+                (agg_sw - self.half) * self.half + c - 1)
+
+    def _build(self, agg_order, core_order):
+        '''Fill nodes and offsets for every pair of edge switches.
+
+        Paths between two pods differ only in their src and dst edge switches,
+        so one template per pod pair is copied and patched per edge pair.
+
+        @param agg_order agg switch indices in path order
+        @param core_order core switch indices in path order
+        '''
+        k = self.k
+        half = self.half
+        num_edges = self.num_edges
+        nodes = self.nodes
+        offsets = self.offsets
+
+        intra = half
+        inter = half * half
+
+        for src_pod in range(k):
+            templates = []
+            for dst_pod in range(k):
+                template = array('H')
+                if src_pod == dst_pod:
+                    for a in agg_order:
+                        template.extend((0, self._agg_id(src_pod, a), 0))
+                else:
+                    for a in agg_order:
+                        for c in core_order:
+                            template.extend((0, self._agg_id(src_pod, a),
+                                             self._core_id(a, c),
+                                             self._agg_id(dst_pod, a), 0))
+                templates.append(template)
+
+            for src in range(src_pod * half, (src_pod + 1) * half):
+                for dst in range(num_edges):
+                    offsets[src * num_edges + dst] = len(nodes)
+                    if src == dst:
+                        nodes.append(src)
+                        continue
+                    dst_pod = dst / half
+                    block = array('H', templates[dst_pod])
+                    if dst_pod == src_pod:
+                        block[0::3] = array('H', [src]) * intra
+                        block[2::3] = array('H', [dst]) * intra
+                    else:
+                        block[0::5] = array('H', [src]) * inter
+                        block[4::5] = array('H', [dst]) * inter
+                    nodes.extend(block)
+        offsets[-1] = len(nodes)
+
+    def _path_len(self, src_idx, dst_idx):
+        '''Return number of switches on each path between two edge switches.'''
+        if src_idx == dst_idx:
+            return 1
+        elif src_idx / self.half == dst_idx / self.half:
+            return 3
+        return 5
+
+    def edge_index(self, name):
+        '''Return edge index of an edge switch.
+
+        Agg and core switches have switch ids too, but no paths start or end
+        at them.
+
+        @param name switch name
+        @return idx edge index, or None if name is not an edge switch
+        '''
+        idx = self.ids.get(name)
+        if idx is None or idx >= self.num_edges:
+            return None
+        return idx
+
+    def num_paths(self, src_idx, dst_idx):
+        '''Return number of equal-cost paths between two edge switches.
+
+        @param src_idx source edge index
+        @param dst_idx destination edge index
+        @return count number of paths
+        '''
+        pair = src_idx * self.num_edges + dst_idx
+        return ((self.offsets[pair + 1] - self.offsets[pair]) /
+                self._path_len(src_idx, dst_idx))
+
+    def path(self, src_idx, dst_idx, path_idx):
+        '''Return one path as switch ids.
+
+        @param src_idx source edge index
+        @param dst_idx destination edge index
+        @param path_idx index of path, in sorted order
+        @return path array of switch ids
+        '''
+        length = self._path_len(src_idx, dst_idx)
+        start = self.offsets[src_idx * self.num_edges + dst_idx]
+        start += path_idx * length
+        return self.nodes[start:start + length]
+
+    def path_names(self, src_idx, dst_idx, path_idx):
+        '''Return one path as switch names.
+
+        @param src_idx source edge index
+        @param dst_idx destination edge index
+        @param path_idx index of path, in sorted order
+        @return path list of names
+        '''
+        names = self.names
+        return [names[i] for i in self.path(src_idx, dst_idx, path_idx)]
+
+    def route(self, src_idx, dst_idx, hash_):
+        '''Return the path HashedStructuredRouting picks for a hash value.
+
+        @param src_idx source edge index
+        @param dst_idx destination edge index
+        @param hash_ hash value
+        @return path list of names
+        '''
+        path_idx = hash_ % self.num_paths(src_idx, dst_idx)
+        return self.path_names(src_idx, dst_idx, path_idx)
+
+    def memory_report(self):
+        '''Return memory used by the table.
+
+        @return report dict of path, entry and byte counts
+        '''
+        nodes_bytes = len(self.nodes) * self.nodes.itemsize
+        offsets_bytes = len(self.offsets) * self.offsets.itemsize
+        half = self.half
+        num_edges = self.num_edges
+        total_paths = num_edges * (1 + (half - 1) * half +
+                                   (num_edges - half) * half * half)
+        return {'paths': total_paths,
+                'entries': len(self.nodes),
+                'nodes_bytes': nodes_bytes,
+                'offsets_bytes': offsets_bytes,
+                'total_bytes': nodes_bytes + offsets_bytes}
@@ -5,6 +5,7 @@ Routing engine base class.
 
 @author Brandon Heller (brandonh@stanford.edu)
 '''
+from collections import OrderedDict
 from copy import copy
 from random import choice
 
@@ -357,3 +358,330 @@ class HashedStructuredRouting(StructuredRouting):
 
         super(HashedStructuredRouting, self).__init__(topo, choose_hashed)
 # pylint: enable-msg=W0613
+
+
+class FatTreePaths(object):
+    '''Lazy, ordered set of equal-cost paths between two FatTreeTopo nodes.
+
+    Paths are never enumerated up front.  Each one is described by an
+    (agg, core) choice pair and built on demand, in the same sorted order that
+    HashedStructuredRouting picks from, so that paths[hash_ % len(paths)] is
+    the path it would have chosen.
+    '''
+
+    def __init__(self, routing, src, dst, peak, aggs, cores):
+        '''Create FatTreePaths object.
+
+        @param routing FatTreeRouting object that builds the paths
+        @param src source name
+        @param dst destination name
+        @param peak layer at which the up and down halves of each path meet
+        @param aggs list of agg switch indices to choose from, in path order
+        @param cores list of core switch indices to choose from, in path order
+        '''
+        self.routing = routing
+        self.src = src
+        self.dst = dst
+        self.peak = peak
+        self.aggs = aggs
+        self.cores = cores
+
+    def __len__(self):
+        return len(self.aggs) * len(self.cores)
+
+    def __getitem__(self, index):
+        '''Return the index-th path in sorted order.
+
+        @param index path index; negative values count from the end
+        @return path list of names, from src to dst
+        '''
+        total = len(self)
+        if index < 0:
+            index += total
+        if index < 0 or index >= total:
+            raise IndexError('path index out of range')
+        agg = self.aggs[index / len(self.cores)]
+        core = self.cores[index % len(self.cores)]
+        return self.routing.build_path(self.src, self.dst, self.peak, agg,
+                                       core)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def next_index(self, index, depth):
+        '''Return the index of the next path that leaves a shared prefix.
+
+        Paths are sorted, so every path that shares its first depth nodes
+        with path index follows it directly.  This lets a caller that found a
+        full link skip every other path through that link.
+
+        @param index path index
+        @param depth length of the prefix of path index to skip past
+        @return next_index index of the first later path with another prefix,
+            or len(self) if there is none
+        '''
+        # The agg switch, then the core switch, sit this far along the path.
+        src_layer = self.routing.topo.layer(self.src)
+        agg_pos = src_layer - self.routing.topo.LAYER_AGG
+        core_pos = src_layer - self.routing.topo.LAYER_CORE
+        if depth > core_pos or (depth > agg_pos and len(self.cores) == 1):
+            return index + 1
+        elif depth > agg_pos:
+            return (index / len(self.cores) + 1) * len(self.cores)
+        return len(self)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class FatTreeRouting(Routing):
+    '''Closed-form hashed routing for a FatTreeTopo.
+
+    Returns exactly the routes HashedStructuredRouting returns, but computes
+    them arithmetically from the (pod, sw, host) structure of node names,
+    instead of enumerating every path on every call.  Choosing a path is
+    O(path length) regardless of k.
+
+    A path climbs from each endpoint to the lowest layer where their ancestors
+    meet (the peak), so it is fully determined by the agg switch index and the
+    core switch index it crosses.  The routes are sorted by name, so those
+    indices are sorted by the name of the switch they produce; with k >= 20
+    that is not numeric order ('0_10_1' < '0_9_1').
+
+    When complete is set, get_route returns a lazy FatTreePaths sequence in
+    the same sorted order rather than a list.  A hash_ of None selects the
+    leftmost path.
+    '''
+
+    def __init__(self, topo):
+        '''Create FatTreeRouting object.
+
+        @param topo FatTreeTopo object
+        '''
+        self.topo = topo
+        k = topo.k
+        self.agg_order = sorted(range(k / 2, k),
+                                key = lambda a: topo.id_gen(0, a, 1).name_str())
+        self.core_order = sorted(range(1, k / 2 + 1),
+                                 key = lambda c: topo.id_gen(k, 1, c).name_str())
+
+    def _ancestor(self, node_id, layer, agg, core):
+        '''Return the name of the ancestor of a node at a given layer.
+
+        @param node_id FatTreeNodeID of the starting node
+        @param layer layer of the ancestor
+        @param agg agg switch index chosen for the path
+        @param core core switch index chosen for the path
+        @return name ancestor name
+        '''
+        t = self.topo
+        if layer == t.LAYER_EDGE:
+            return t.id_gen(node_id.pod, node_id.sw, 1).name_str()
+        elif layer == t.LAYER_AGG:
+            return t.id_gen(node_id.pod, agg, 1).name_str()
+        else:
+            return t.id_gen(t.k, agg - t.k / 2 + 1, core).name_str()
+
+    def _half_path(self, name, peak, agg, core):
+        '''Return the path from a node up to, and including, the peak.
+
+        @param name starting node name
+        @param peak layer of the top of the path
+        @param agg agg switch index chosen for the path
+        @param core core switch index chosen for the path
+        @return path list of names
+        '''
+        node_id = self.topo.id_gen(name = name)
+        path = [name]
+        for layer in range(self.topo.layer(name) - 1, peak - 1, -1):
+            path.append(self._ancestor(node_id, layer, agg, core))
+        return path
+
+    def build_path(self, src, dst, peak, agg, core):
+        '''Return the path through the given peak, agg and core choices.
+
+        @param src source name
+        @param dst destination name
+        @param peak layer at which the up and down halves meet
+        @param agg agg switch index
+        @param core core switch index
+        @return path list of names, from src to dst
+        '''
+        down = self._half_path(dst, peak, agg, core)
+        down.reverse()
+        return self._half_path(src, peak, agg, core) + down[1:]
+
+    def paths(self, src, dst):
+        '''Return the set of equal-cost paths between two nodes.
+
+        @param src source name
+        @param dst destination name
+        @return paths FatTreePaths object, or None if no up-down path exists
+        '''
+        t = self.topo
+        k = t.k
+        src_layer = t.layer(src)
+        dst_layer = t.layer(dst)
+        src_id = t.id_gen(name = src)
+        dst_id = t.id_gen(name = dst)
+
+        # An agg or core endpoint pins the agg index of every path through it.
+        aggs = self.agg_order
+        for node_id, layer in ((src_id, src_layer), (dst_id, dst_layer)):
+            if layer == t.LAYER_AGG:
+                fixed = node_id.sw
+            elif layer == t.LAYER_CORE:
+                fixed = node_id.sw - 1 + k / 2
+            else:
+                continue
+            if aggs is not self.agg_order and aggs != [fixed]:
+                return None
+            aggs = [fixed]
+
+        if src_layer == t.LAYER_CORE and dst_layer == t.LAYER_CORE:
+            return None
+        elif (src_id.pod == dst_id.pod and src_layer >= t.LAYER_EDGE and
+              dst_layer >= t.LAYER_EDGE and src_id.sw == dst_id.sw):
+            return FatTreePaths(self, src, dst, t.LAYER_EDGE, [None], [None])
+        elif (src_id.pod == dst_id.pod and
+              (src_layer != t.LAYER_AGG or dst_layer != t.LAYER_AGG)):
+            return FatTreePaths(self, src, dst, t.LAYER_AGG, aggs, [None])
+
+        cores = self.core_order
+        if src_layer == t.LAYER_CORE:
+            cores = [src_id.host]
+        elif dst_layer == t.LAYER_CORE:
+            cores = [dst_id.host]
+        return FatTreePaths(self, src, dst, t.LAYER_CORE, aggs, cores)
+
+    def get_route(self, src, dst, hash_, complete = False):
+        '''Return flow path.
+
+        @param src source name (for host or switch)
+        @param dst destination name (for host or switch)
+        @param hash_ hash value
+        @param complete flag to return all paths
+
+        @return flow_path list of names to traverse (including inputs), or None
+        '''
+        if src == dst:
+            if complete:
+                return [[src]]
+            else:
+                return [src]
+
+        paths = self.paths(src, dst)
+        if paths is None:
+            return None
+        if complete:
+            return paths
+        return paths[(hash_ or 0) % len(paths)]
+
+
+class CachedRouting(Routing):
+    '''Bounded LRU cache in front of another routing engine.
+
+    Memoizes single routes per (src, dst, hash_), evicting the least
+    recently used route once more than size are held.  Each cached route is
+    indexed by every node it crosses, so invalidating a node drops only the
+    routes through it.  Routes are stored as tuples and handed out as fresh
+    lists, so callers may modify them.
+
+    Complete path sets are not cached: the wrapped engine may return them
+    lazily, and indexing their nodes would enumerate every path.
+
+    Wrapping RandomStructuredRouting makes its choice sticky per key.
+    '''
+
+    def __init__(self, routing, size = 1024):
+        '''Create CachedRouting object.
+
+        @param routing Routing object to cache routes from
+        @param size maximum number of cached routes
+        '''
+        self.topo = routing.topo
+        self.routing = routing
+        self.size = size
+        self.cache = OrderedDict()  # [key] -> (route, nodes)
+        self.node_keys = {}  # [node] -> set of keys whose route crosses it
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, key):
+        '''Drop a cached route and its node index entries.
+
+        @param key cache key
+        '''
+        route, nodes = self.cache.pop(key)
+        for node in nodes:
+            keys = self.node_keys[node]
+            keys.discard(key)
+            if not keys:
+                del self.node_keys[node]
+
+    def get_route(self, src, dst, hash_, complete = False):
+        '''Return flow path, from the cache if present.
+
+        @param src source name (for host or switch)
+        @param dst destination name (for host or switch)
+        @param hash_ hash value
+        @param complete flag to return all paths
+
+        @return flow_path list of names to traverse (including inputs), or None
+        '''
+        if complete:
+            return self.routing.get_route(src, dst, hash_, True)
+
+        key = (src, dst, hash_)
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            # Re-insert to mark as most recently used.
+            self.cache[key] = entry
+            self.hits += 1
+            route = entry[0]
+        else:
+            self.misses += 1
+            route = self.routing.get_route(src, dst, hash_, False)
+            nodes = set([src, dst])
+            if route is not None:
+                route = tuple(route)
+                nodes.update(route)
+            self.cache[key] = (route, nodes)
+            for node in nodes:
+                self.node_keys.setdefault(node, set()).add(key)
+
+            while len(self.cache) > self.size:
+                oldest = next(iter(self.cache))
+                self._remove(oldest)
+                self.evictions += 1
+        if route is None:
+            return None
+        return list(route)
+
+    def invalidate(self, node = None):
+        '''Drop cached routes that start, end or pass through a node.
+
+        @param node node name; if None, drop every cached route
+        @return count number of routes dropped
+        '''
+        if node is None:
+            count = len(self.cache)
+            self.cache.clear()
+            self.node_keys.clear()
+            return count
+        keys = list(self.node_keys.get(node, ()))
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def stats(self):
+        '''Return cache counters.
+
+        @return stats dict of hits, misses, evictions and current size
+        '''
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.cache)}
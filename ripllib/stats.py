@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+'''@package stats
+
+Streaming statistics for throughput measurements.
+
+Samples are folded in one at a time, so memory does not grow with the length
+of a run: mean and variance use Welford's update, and quantiles come from a
+compacting sketch.
+'''
+
+import random
+from math import sqrt
+
+
+class QuantileSketch(object):
+    '''Approximate quantiles of a stream in bounded memory.
+
+    Values are kept exactly until a level holds capacity of them.  A full
+    level is sorted and every other value, starting at a random offset, moves
+    up a level with twice the weight, as in the KLL sketch.  The sketch holds
+    O(capacity * log(n / capacity)) values after n samples, and is exact
+    while n < capacity.
+    '''
+
+    def __init__(self, capacity = 256, seed = 0):
+        '''Create QuantileSketch object.
+
+        @param capacity values per level before compacting
+        @param seed random seed for compaction offsets
+        '''
+        self.capacity = capacity
+        self.levels = [[]]
+        self.count = 0
+        self.rng = random.Random(seed)
+
+    def add(self, value):
+        '''Add one sample.'''
+        self.count += 1
+        self.levels[0].append(value)
+        level = 0
+        while len(self.levels[level]) >= self.capacity:
+            values = sorted(self.levels[level])
+            self.levels[level] = []
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            self.levels[level + 1].extend(values[self.rng.randrange(2)::2])
+            level += 1
+
+    def quantile(self, q):
+        '''Return the nearest-rank q-quantile.
+
+        @param q quantile, from 0.0 to 1.0
+        @return value, or None if no samples were added
+        '''
+        items = sorted((value, 1 << level)
+                       for level, values in enumerate(self.levels)
+                       for value in values)
+        if not items:
+            return None
+        target = q * sum(weight for value, weight in items)
+        seen = 0
+        for value, weight in items:
+            seen += weight
+            if seen >= target:
+                return value
+        return items[-1][0]
+
+
+class StreamStats(object):
+    '''Running count, mean, variance and quantiles of a stream.'''
+
+    def __init__(self, capacity = 256):
+        '''Create StreamStats object.
+
+        @param capacity QuantileSketch capacity
+        '''
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean
+        self.sketch = QuantileSketch(capacity)
+
+    def add(self, value):
+        '''Add one sample.'''
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.sketch.add(value)
+
+    def variance(self):
+        '''Return the population variance, or 0.0 before any samples.'''
+        if not self.count:
+            return 0.0
+        return self.m2 / self.count
+
+    def stddev(self):
+        '''Return the population standard deviation.'''
+        return sqrt(self.variance())
+
+    def quantile(self, q):
+        '''Return the approximate q-quantile; see QuantileSketch.'''
+        return self.sketch.quantile(q)
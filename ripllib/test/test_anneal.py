@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+'''Test simulated annealing flow placement.'''
+
+import unittest
+from time import time
+
+from ripllib.anneal import Annealer
+from ripllib.dctopo import FatTreeTopo
+from ripllib.linkusage import LinkUsage
+
+
+def overload(link_usage, src_hosts, dst_hosts, demands, paths):
+    '''Return the total load in excess of capacity of a placement.'''
+    half = link_usage.half
+    load = {}  # [(link id, going up)] -> load
+    for src, dst, demand, x in zip(src_hosts, dst_hosts, demands, paths):
+        links = link_usage.path_links(src / half, dst / half)[x]
+        for hop, link in enumerate(links):
+            key = (link, hop < len(links) / 2)
+            load[key] = load.get(key, 0) + demand
+    return sum(max(l - link_usage.capacity, 0) for l in load.values())
+
+
+class testAnnealer(unittest.TestCase):
+    '''Test Annealer placements and limits.'''
+
+    def testStride(self):
+        '''Verify annealing removes every overload of an inter-pod stride.'''
+        lu = LinkUsage(FatTreeTopo(8))
+        n = 128
+        src = range(n)
+        dst = [(x + 16) % n for x in src]
+        demands = [1.0] * n
+        annealer = Annealer(lu, iterations = 100000, deadline = None,
+                            seed = 0)
+        initial = overload(lu, src, dst, demands,
+                           [annealer._path_idx(s, d, annealer.cores[d])
+                            for s, d in zip(src, dst)])
+        paths = annealer.schedule(src, dst, demands)
+        self.assertTrue(initial > 0)
+        self.assertEqual(overload(lu, src, dst, demands, paths), 0)
+
+    def testPathKinds(self):
+        '''Verify path indices for inter-pod, intra-pod and edge flows.'''
+        lu = LinkUsage(FatTreeTopo(4))
+        annealer = Annealer(lu, seed = 0)
+        paths = annealer.schedule([0, 0, 0], [1, 2, 4], [0.1] * 3)
+        self.assertEqual(paths[0], 0)
+        self.assertTrue(0 <= paths[1] < 2)
+        self.assertTrue(0 <= paths[2] < 4)
+        self.assertEqual(annealer.schedule([], [], []), [])
+
+    def testDeadline(self):
+        '''Verify a round stops at its deadline.'''
+        lu = LinkUsage(FatTreeTopo(16))
+        n = 1024
+        src = range(n)
+        dst = [(x + 64) % n for x in src]
+        annealer = Annealer(lu, iterations = 10 ** 9, deadline = 0.2,
+                            seed = 0)
+        start = time()
+        annealer.schedule(src, dst, [1.0] * n)
+        self.assertTrue(time() - start < 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,7 @@
 
 import unittest
 
-from ripl.dctopo import FatTreeTopo
+from ripllib.dctopo import FatTreeTopo
 
 class testFatTreeTopo(unittest.TestCase):
     '''Test FatTreeTopo with varying k.'''
@@ -48,6 +48,24 @@ class testFatTreeTopo(unittest.TestCase):
             self.assertEqual(FatTreeTopo.FatTreeNodeID(x, y, z).dpid, b)
             self.assertEqual(str(FatTreeTopo.FatTreeNodeID(dpid = b)), str(a))
 
+    def testInternedNodeID(self):
+        '''Verify id_gen returns one immutable id per node.'''
+        ft = FatTreeTopo(4)
+        node_id = ft.id_gen(name = '1_0_3')
+        self.assertTrue(ft.id_gen(dpid = 0x010003) is node_id)
+        self.assertTrue(ft.id_gen(1, 0, 3) is node_id)
+        self.assertEqual(node_id.ip_str(), '10.1.0.3')
+        self.assertEqual(node_id.mac_str(), '00:00:00:01:00:03')
+        self.assertRaises(AttributeError, setattr, node_id, 'pod', 2)
+
+    def testHostNames(self):
+        '''Verify host names are ordered pod by pod, edge by edge.'''
+        ft = FatTreeTopo(4)
+        names = ft.host_names()
+        self.assertEqual(names[:4], ['0_0_2', '0_0_3', '0_1_2', '0_1_3'])
+        self.assertEqual(names[-1], '3_1_3')
+        self.assertEqual(sorted(names), sorted(ft.hosts()))
+
     def testUpNodesAndEdges(self):
         '''Verify number of up edges at each layer.'''
         ft = FatTreeTopo(4)
@@ -76,6 +94,25 @@ class testFatTreeTopo(unittest.TestCase):
             self.assertEqual(len(ft.down_nodes(host)), b)
             self.assertEqual(len(ft.down_edges(host)), b)
 
+    def testLayerIndex(self):
+        '''Verify indexed layers and neighbours match the graph.'''
+        ft = FatTreeTopo(4)
+        for layer in range(4):
+            nodes = [n for n in ft.g.nodes() if ft.layer(n) == layer]
+            self.assertEqual(sorted(ft.layer_nodes(layer)), sorted(nodes))
+        for name in ft.g.nodes():
+            layer = ft.layer(name)
+            up = [n for n in ft.g[name] if ft.layer(n) == layer - 1]
+            down = [n for n in ft.g[name] if ft.layer(n) == layer + 1]
+            self.assertEqual(sorted(ft.up_nodes(name)), sorted(up))
+            self.assertEqual(sorted(ft.down_nodes(name)), sorted(down))
+
+        # Re-adding nodes and links must not duplicate index entries.
+        ft.add_switch('0_0_1', **ft.def_nopts(ft.LAYER_EDGE, '0_0_1'))
+        ft.add_link('0_0_1', '0_2_1')
+        self.assertEqual(len(ft.layer_nodes(ft.LAYER_EDGE)), 8)
+        self.assertEqual(len(ft.up_nodes('0_0_1')), 2)
+
     def testPorts(self):
         '''Verify port numbering between selected nodes.'''
         ft = FatTreeTopo(4)
@@ -101,6 +138,20 @@ class testFatTreeTopo(unittest.TestCase):
             self.assertEqual(srcp, srcp_exp)
             self.assertEqual(dstp, dstp_exp)
 
+    def testPortMap(self):
+        '''Verify precomputed ports match computed ones, hop by hop.'''
+        ft = FatTreeTopo(4)
+        computed = FatTreeTopo(4, port_map = False)
+        for src, dst in ft.links():
+            self.assertEqual(ft.port(src, dst), computed.port(src, dst))
+            self.assertEqual(ft.port(dst, src), computed.port(dst, src))
+
+        path = ['0_0_2', '0_0_1', '0_2_1', '4_1_1', '1_2_1', '1_0_1', '1_0_2']
+        expected = [computed.port(path[i], path[i + 1]) for i in range(6)]
+        self.assertEqual(ft.path_ports(path), expected)
+        self.assertEqual(computed.path_ports(path), expected)
+        self.assertEqual(ft.path_ports(path[:1]), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+'''Test Hedera demand estimation.'''
+
+import random
+import unittest
+
+from ripllib.demand import DemandEstimator
+
+
+class testDemandEstimator(unittest.TestCase):
+    '''Test natural demand estimates.'''
+
+    def assertDemands(self, estimator, expected):
+        for (src, dst), demand in expected.iteritems():
+            self.assertAlmostEqual(estimator.demand(src, dst), demand)
+
+    def testSenderLimited(self):
+        '''Verify a sender splits its NIC among its flows.'''
+        est = DemandEstimator(4)
+        est.add_flow(0, 1)
+        self.assertDemands(est, {(0, 1): 1.0})
+        est.add_flow(0, 2)
+        est.add_flow(0, 3)
+        self.assertDemands(est, {(0, 1): 1.0 / 3, (0, 2): 1.0 / 3,
+                                 (0, 3): 1.0 / 3})
+
+    def testReceiverLimited(self):
+        '''Verify flows into a hotspot share the receiver NIC.'''
+        est = DemandEstimator(4)
+        for src in (1, 2, 3):
+            est.add_flow(src, 0)
+        self.assertDemands(est, {(1, 0): 1.0 / 3, (2, 0): 1.0 / 3,
+                                 (3, 0): 1.0 / 3})
+
+    def testMixed(self):
+        '''Verify receiver-limited flows free sender capacity.'''
+        est = DemandEstimator(6)
+        # Host 0 sends to 1 and 2; hosts 3, 4 and 5 also send to 2.
+        for src, dst in ((0, 1), (0, 2), (3, 2), (4, 2), (5, 2)):
+            est.add_flow(src, dst)
+        self.assertDemands(est, {(0, 1): 0.75, (0, 2): 0.25, (3, 2): 0.25,
+                                 (4, 2): 0.25, (5, 2): 0.25})
+
+    def testDuplicateFlows(self):
+        '''Verify parallel flows between one pair share its estimate.'''
+        est = DemandEstimator(3)
+        est.add_flow(0, 1)
+        est.add_flow(0, 1)
+        self.assertEqual(est.add_flow(2, 1), [0, 2])
+        self.assertDemands(est, {(0, 1): 1.0 / 3, (2, 1): 1.0 / 3})
+        est.remove_flow(0, 1)
+        self.assertDemands(est, {(0, 1): 0.5, (2, 1): 0.5})
+        est.remove_flow(0, 1)
+        self.assertDemands(est, {(0, 1): 0.0, (2, 1): 1.0})
+
+    def testIncrementalMatchesFull(self):
+        '''Verify incremental updates match a full re-estimation.'''
+        rng = random.Random(244)
+        n = 32
+        est = DemandEstimator(n)
+        flows = []
+        for _ in range(300):
+            if flows and rng.random() < 0.3:
+                src, dst = flows.pop(rng.randrange(len(flows)))
+                est.remove_flow(src, dst)
+            else:
+                src, dst = rng.randrange(n), rng.randrange(n)
+                flows.append((src, dst))
+                est.add_flow(src, dst)
+
+        full = DemandEstimator(n)
+        for src, dst in flows:
+            full.add_flow(src, dst, estimate = False)
+        full.estimate()
+        self.assertEqual(sorted(est.demands), sorted(full.demands))
+        for pair, demand in full.demands.iteritems():
+            self.assertAlmostEqual(est.demands[pair], demand)
+
+        # No NIC is oversubscribed.
+        for h in range(n):
+            out = sum(full.demand(h, d) * c
+                      for d, c in full.src_flows[h].iteritems())
+            into = sum(full.demand(s, h) * c
+                       for s, c in full.dst_flows[h].iteritems())
+            self.assertTrue(out <= 1.0 + 1e-6)
+            self.assertTrue(into <= 1.0 + 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+'''Test the active flow index.'''
+
+import unittest
+
+from ripllib.flowindex import FlowIndex, NO_PATH
+
+
+class testFlowIndex(unittest.TestCase):
+    '''Test FlowIndex secondary indexes.'''
+
+    def testAddRemove(self):
+        '''Verify source and destination indexes follow adds and removes.'''
+        flows = FlowIndex(2)
+        a = (1, 2, 6, 1000, 5001)
+        b = (1, 2, 6, 1001, 5001)
+        c = (3, 2, 17, 2000, 5002)
+        self.assertTrue(flows.add(a, 0, 4))
+        self.assertFalse(flows.add(a, 0, 4))
+        flows.add(b, 0, 4)
+        flows.add(c, 1, 4)
+        self.assertEqual(len(flows), 3)
+        self.assertEqual(flows.sent_by(0), set([a, b]))
+        self.assertEqual(flows.sent_to(4), set([a, b, c]))
+        self.assertEqual(flows.path(a), NO_PATH)
+
+        self.assertEqual(flows.remove(a), (0, 4))
+        self.assertEqual(flows.remove(a), None)
+        self.assertFalse(a in flows)
+        self.assertEqual(flows.sent_by(0), set([b]))
+        flows.remove(b)
+        flows.remove(c)
+        self.assertEqual(flows.sent_by(0), frozenset())
+        self.assertEqual((flows.by_src, flows.by_dst), ({}, {}))
+
+    def testPaths(self):
+        '''Verify the path index follows assignments and removes.'''
+        flows = FlowIndex(2)
+        a = (1, 2, 6, 1000, 5001)
+        b = (5, 2, 6, 1000, 5001)
+        flows.add(a, 0, 4)
+        flows.add(b, 1, 5)
+        flows.set_path(a, 3)
+        flows.set_path(b, 3)
+        self.assertEqual(flows.on_path(0, 2, 3), set([a, b]))
+        flows.set_path(a, 1)
+        self.assertEqual(flows.on_path(0, 2, 3), set([b]))
+        self.assertEqual(flows.on_path(0, 2, 1), set([a]))
+        flows.set_path(a, NO_PATH)
+        self.assertEqual(flows.on_path(0, 2, 1), frozenset())
+        flows.remove(b)
+        self.assertEqual(flows.by_path, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
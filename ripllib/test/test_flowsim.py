@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+'''Test the flow-level simulator.'''
+
+import random
+import unittest
+
+from ripllib.dctopo import FatTreeTopo
+from ripllib.flowsim import FlowSimulator, POLICIES, max_min_rates
+from ripllib.trafficfile import from_dict
+
+
+class testFlowSim(unittest.TestCase):
+    '''Test max-min fair sharing and policy results.'''
+
+    def testMaxMinRates(self):
+        '''Verify the classic bottleneck example.'''
+        # Flows 0 and 1 share link 0; flow 1 continues over link 1, which it
+        # shares with flow 2.
+        rates = max_min_rates([[0], [0, 1], [1]], [1.0, 2.0])
+        self.assertAlmostEqual(rates[0], 0.5)
+        self.assertAlmostEqual(rates[1], 0.5)
+        self.assertAlmostEqual(rates[2], 1.5)
+        self.assertEqual(max_min_rates([[]], []), [0.0])
+
+    def testStride(self):
+        '''Verify GFF reaches full bisection bandwidth where ECMP may not.'''
+        sim = FlowSimulator(FatTreeTopo(4))
+        n_hosts = len(sim.hosts)
+        traffic = from_dict(dict((str(x), [(x + 4) % n_hosts])
+                                 for x in range(n_hosts)))
+        mean, stddev = sim.aggregate(traffic, POLICIES['gff'], 5, 0)
+        self.assertAlmostEqual(mean, 16.0)
+        self.assertAlmostEqual(stddev, 0.0)
+        mean, stddev = sim.aggregate(traffic, POLICIES['ecmp'], 5, 0)
+        self.assertTrue(mean <= 16.0)
+        mean, stddev = sim.aggregate(traffic, POLICIES['anneal'], 5, 0)
+        self.assertAlmostEqual(mean, 16.0)
+
+    def testHotspot(self):
+        '''Verify every flow into one host shares its link.'''
+        sim = FlowSimulator(FatTreeTopo(4))
+        flows = [(src, sim.hosts[0]) for src in sim.hosts[1:]]
+        rates = sim.run(flows, POLICIES['ecmp'], random.Random(0))
+        for rate in rates:
+            self.assertAlmostEqual(rate, 1.0 / 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
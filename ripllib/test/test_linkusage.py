@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+'''Test array-backed link reservations.'''
+
+import random
+import unittest
+
+from ripllib.dctopo import FatTreeTopo
+from ripllib.linkusage import LinkUsage
+from ripllib.pathtable import PathTable
+
+
+def link_id(table, u, v):
+    '''Return the link id between two switch ids, from the layout docs.'''
+    u, v = min(u, v), max(u, v)
+    half = table.half
+    if u < table.num_edges:
+        return u * half + (v - table.num_edges) % half
+    agg = u - table.num_edges
+    core = v - table.num_edges - table.num_aggs - (agg % half) * half
+    return table.num_edges * half + agg * half + core
+
+
+class testLinkUsage(unittest.TestCase):
+    '''Test LinkUsage against PathTable paths.'''
+
+    def testPathLinks(self):
+        '''Verify every row follows its PathTable path hop by hop.'''
+        for k in (4, 6):
+            table = PathTable(FatTreeTopo(k))
+            usage = LinkUsage(table.topo)
+            for src in range(table.num_edges):
+                for dst in range(table.num_edges):
+                    links = usage.path_links(src, dst)
+                    self.assertEqual(len(links),
+                                     table.num_paths(src, dst))
+                    for x, row in enumerate(links):
+                        path = table.path(src, dst, x)
+                        self.assertEqual(list(row),
+                                         [link_id(table, path[i], path[i + 1])
+                                          for i in range(len(path) - 1)])
+
+    def testFirstFit(self):
+        '''Verify vectorized first fit matches a path-by-path scan.'''
+        table = PathTable(FatTreeTopo(4))
+        usage = LinkUsage(table.topo)
+        expected = {}
+        rng = random.Random(244)
+        for _ in range(200):
+            src = rng.randrange(table.num_edges)
+            dst = rng.randrange(table.num_edges)
+            demand = rng.choice((0.1, 0.25, 0.5, 1.0))
+
+            fit = None
+            for x in range(table.num_paths(src, dst)):
+                path = table.path(src, dst, x)
+                hops = [link_id(table, path[i], path[i + 1])
+                        for i in range(len(path) - 1)]
+                if all(expected.get(l, 0.0) + demand <= 1.0 for l in hops):
+                    fit = x
+                    break
+
+            x = usage.first_fit(src, dst, demand)
+            self.assertEqual(x, fit)
+            if x is not None:
+                links = usage.reserve(src, dst, x, demand)
+                for l in links:
+                    expected[l] = expected.get(l, 0.0) + demand
+                if rng.random() < 0.3:
+                    usage.release(links, demand)
+                    for l in links:
+                        expected[l] -= demand
+
+    def testReleaseAll(self):
+        '''Verify releasing every reservation empties the table.'''
+        table = PathTable(FatTreeTopo(4))
+        usage = LinkUsage(table.topo)
+        reserved = []
+        for src in range(table.num_edges):
+            x = usage.first_fit(src, 7 - src, 0.5)
+            reserved.append(usage.reserve(src, 7 - src, x, 0.5))
+        self.assertTrue(usage.usage.max() > 0)
+        for links in reserved:
+            usage.release(links, 0.5)
+        self.assertEqual(usage.usage.max(), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
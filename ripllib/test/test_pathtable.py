@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+'''Test the precomputed path table.'''
+
+import unittest
+
+from ripllib.dctopo import FatTreeTopo
+from ripllib.pathtable import PathTable
+from ripllib.routing import HashedStructuredRouting
+
+
+class testPathTable(unittest.TestCase):
+    '''Test PathTable against HashedStructuredRouting.'''
+
+    def testMatchesHashedRouting(self):
+        '''Verify every edge-to-edge path set and hashed choice.'''
+        ft = FatTreeTopo(4)
+        hashed = HashedStructuredRouting(ft)
+        table = PathTable(ft)
+        edges = ft.layer_nodes(ft.LAYER_EDGE)
+        for src in edges:
+            for dst in edges:
+                src_idx = table.edge_index(src)
+                dst_idx = table.edge_index(dst)
+                expected = sorted(hashed.get_route(src, dst, None, True))
+                count = table.num_paths(src_idx, dst_idx)
+                self.assertEqual(count, len(expected))
+                paths = [table.path_names(src_idx, dst_idx, i)
+                         for i in range(count)]
+                self.assertEqual(paths, expected)
+                for hash_ in range(count + 1):
+                    self.assertEqual(table.route(src_idx, dst_idx, hash_),
+                                     hashed.get_route(src, dst, hash_, False))
+
+    def testEdgeIndex(self):
+        '''Verify only edge switches have edge indices.'''
+        ft = FatTreeTopo(4)
+        table = PathTable(ft)
+        edges = sorted(table.edge_index(e)
+                       for e in ft.layer_nodes(ft.LAYER_EDGE))
+        self.assertEqual(edges, range(table.num_edges))
+        for layer in (ft.LAYER_AGG, ft.LAYER_CORE, ft.LAYER_HOST):
+            for name in ft.layer_nodes(layer):
+                self.assertEqual(table.edge_index(name), None)
+
+    def testMemoryReport(self):
+        '''Verify path and byte counts.'''
+        for k in range(4, 10, 2):
+            table = PathTable(FatTreeTopo(k))
+            report = table.memory_report()
+            edges = (k ** 2) / 2
+            paths = 0
+            for src in range(edges):
+                for dst in range(edges):
+                    paths += table.num_paths(src, dst)
+            self.assertEqual(report['paths'], paths)
+            self.assertEqual(report['nodes_bytes'], 2 * report['entries'])
+            self.assertEqual(report['total_bytes'],
+                             report['nodes_bytes'] + report['offsets_bytes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+'''Test routing engines.'''
+
+import unittest
+
+from ripllib.dctopo import FatTreeTopo
+from ripllib.routing import HashedStructuredRouting, FatTreeRouting
+from ripllib.routing import CachedRouting
+
+
+class testFatTreeRouting(unittest.TestCase):
+    '''Test FatTreeRouting against HashedStructuredRouting.'''
+
+    def testMatchesHashedRouting(self):
+        '''Verify path sets and hashed choices for every pair of nodes.'''
+        ft = FatTreeTopo(4)
+        hashed = HashedStructuredRouting(ft)
+        fast = FatTreeRouting(ft)
+        nodes = sorted(ft.nodes())
+        for src in nodes:
+            for dst in nodes:
+                expected = hashed.get_route(src, dst, None, True)
+                paths = fast.get_route(src, dst, None, True)
+                if expected is None:
+                    self.assertEqual(paths, None)
+                    continue
+                self.assertEqual(list(paths), sorted(expected))
+                for hash_ in range(len(expected) + 1):
+                    self.assertEqual(fast.get_route(src, dst, hash_, False),
+                                     hashed.get_route(src, dst, hash_, False))
+
+    def testPathCounts(self):
+        '''Verify number of equal-cost paths between edge switches.'''
+        for k in range(4, 10, 2):
+            ft = FatTreeTopo(k)
+            fast = FatTreeRouting(ft)
+            pairs = {('0_0_1', '0_0_1'): 1,
+                     ('0_0_1', '0_1_1'): k / 2,
+                     ('0_0_1', '1_0_1'): (k / 2) ** 2}
+            for (src, dst), total in pairs.iteritems():
+                self.assertEqual(len(fast.get_route(src, dst, None, True)),
+                                 total)
+
+    def testNameOrder(self):
+        '''Verify paths follow name order when indices reach two digits.'''
+        ft = FatTreeTopo(14)
+        fast = FatTreeRouting(ft)
+        paths = list(fast.get_route('0_0_1', '0_1_1', None, True))
+        self.assertEqual(paths, sorted(paths))
+        self.assertEqual(paths[0][1], '0_10_1')
+
+
+class testCachedRouting(unittest.TestCase):
+    '''Test LRU route caching.'''
+
+    def testHitsAndEvictions(self):
+        '''Verify cached routes match and the cache stays bounded.'''
+        ft = FatTreeTopo(4)
+        fast = FatTreeRouting(ft)
+        cached = CachedRouting(FatTreeRouting(ft), size = 2)
+        for hash_ in (0, 1, 0, 2, 0):
+            self.assertEqual(cached.get_route('0_0_1', '1_0_1', hash_, False),
+                             fast.get_route('0_0_1', '1_0_1', hash_, False))
+        self.assertEqual(cached.stats(),
+                         {'hits': 2, 'misses': 3, 'evictions': 1, 'size': 2})
+
+    def testInvalidate(self):
+        '''Verify invalidation drops only routes through a node.'''
+        ft = FatTreeTopo(4)
+        cached = CachedRouting(FatTreeRouting(ft))
+        route = cached.get_route('0_0_1', '1_0_1', 0, False)
+        other = cached.get_route('0_0_1', '0_1_1', 0, False)
+        self.assertEqual(cached.invalidate(route[2]), 1)
+        self.assertEqual(cached.invalidate(other[1]), 1)
+        self.assertEqual(cached.stats()['size'], 0)
+
+    def testCopiesAndCompletePaths(self):
+        '''Verify callers can't modify the cache and path sets stay lazy.'''
+        ft = FatTreeTopo(4)
+        fast = FatTreeRouting(ft)
+        cached = CachedRouting(FatTreeRouting(ft))
+        route = cached.get_route('0_0_1', '1_0_1', 0, False)
+        route.reverse()
+        self.assertEqual(cached.get_route('0_0_1', '1_0_1', 0, False),
+                         fast.get_route('0_0_1', '1_0_1', 0, False))
+        paths = cached.get_route('0_0_1', '1_0_1', None, True)
+        self.assertEqual(list(paths),
+                         list(fast.get_route('0_0_1', '1_0_1', None, True)))
+        self.assertEqual(cached.stats()['size'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
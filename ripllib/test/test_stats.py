@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+'''Test streaming statistics.'''
+
+import random
+import unittest
+
+from ripllib.stats import QuantileSketch, StreamStats
+
+
+class testStreamStats(unittest.TestCase):
+    '''Test StreamStats against two-pass formulas.'''
+
+    def testMeanVariance(self):
+        '''Verify Welford updates match the two-pass mean and variance.'''
+        rng = random.Random(244)
+        values = [rng.gauss(100.0, 15.0) for _ in range(1000)]
+        stats = StreamStats()
+        for value in values:
+            stats.add(value)
+        mean = sum(values) / len(values)
+        variance = sum((v - mean) ** 2 for v in values) / len(values)
+        self.assertEqual(stats.count, len(values))
+        self.assertAlmostEqual(stats.mean, mean)
+        self.assertAlmostEqual(stats.variance(), variance)
+
+    def testEmpty(self):
+        '''Verify an empty stream has no quantiles and zero variance.'''
+        stats = StreamStats()
+        self.assertEqual(stats.variance(), 0.0)
+        self.assertEqual(stats.quantile(0.5), None)
+
+
+class testQuantileSketch(unittest.TestCase):
+    '''Test QuantileSketch accuracy and size.'''
+
+    def testExactBelowCapacity(self):
+        '''Verify nearest-rank quantiles while nothing was compacted.'''
+        sketch = QuantileSketch(capacity = 256)
+        for value in range(100, 0, -1):
+            sketch.add(value)
+        self.assertEqual(sketch.quantile(0.5), 50)
+        self.assertEqual(sketch.quantile(0.99), 99)
+        self.assertEqual(sketch.quantile(0.0), 1)
+        self.assertEqual(sketch.quantile(1.0), 100)
+
+    def testBoundedError(self):
+        '''Verify rank error and memory stay small on a long stream.'''
+        rng = random.Random(244)
+        values = list(range(100000))
+        rng.shuffle(values)
+        sketch = QuantileSketch(capacity = 256)
+        for value in values:
+            sketch.add(value)
+        held = sum(len(level) for level in sketch.levels)
+        self.assertTrue(held < 256 * len(sketch.levels))
+        self.assertTrue(len(sketch.levels) <= 10)
+        for q in (0.5, 0.9, 0.99):
+            self.assertTrue(abs(sketch.quantile(q) - q * len(values)) <
+                            0.02 * len(values))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+'''Test traffic matrix files.'''
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ripllib.trafficfile import HEADER, RECORD, from_dict, k_for_hosts, load
+from ripllib.trafficfile import make_flows, write_binary
+
+
+class testTrafficFile(unittest.TestCase):
+    '''Test JSON and binary traffic matrices.'''
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testKForHosts(self):
+        '''Verify the smallest fat tree holding a number of hosts.'''
+        self.assertEqual(k_for_hosts(0), 4)
+        self.assertEqual(k_for_hosts(16), 4)
+        self.assertEqual(k_for_hosts(17), 6)
+        self.assertEqual(k_for_hosts(27648), 48)
+
+    def testFromDict(self):
+        '''Verify JSON dicts become flows sorted by src index.'''
+        flows = from_dict({'10': [1], '2': [3, 4]})
+        self.assertEqual(flows['src'].tolist(), [2, 2, 10])
+        self.assertEqual(flows['dst'].tolist(), [3, 4, 1])
+        self.assertEqual(flows['demand'].tolist(), [0.0] * 3)
+
+    def testBinaryRoundTrip(self):
+        '''Verify a binary matrix loads as a memory-mapped view.'''
+        flows = make_flows([0, 5, 7], [1, 2, 3], [0.5, 0.25, 1.0],
+                           [0.0, 1.5, 3.0])
+        path = os.path.join(self.dir, 'm.bin')
+        with open(path, 'wb') as f:
+            write_binary(f, 8, flows)
+        self.assertEqual(os.path.getsize(path),
+                         HEADER.size + len(flows) * RECORD.itemsize)
+
+        k, loaded = load(path)
+        self.assertEqual(k, 8)
+        self.assertTrue(isinstance(loaded, np.memmap))
+        self.assertFalse(loaded.flags.writeable)
+        self.assertEqual(loaded.tolist(), flows.tolist())
+
+    def testEitherFormat(self):
+        '''Verify load reads JSON and binary files of a matrix the same.'''
+        json_path = os.path.join(self.dir, 'm.json')
+        with open(json_path, 'w') as f:
+            json.dump({'0': [20], '20': [0]}, f)
+        k, flows = load(json_path)
+        self.assertEqual(k, 6)
+
+        bin_path = os.path.join(self.dir, 'm.bin')
+        with open(bin_path, 'wb') as f:
+            write_binary(f, k, flows)
+        self.assertEqual(load(bin_path)[1].tolist(), flows.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
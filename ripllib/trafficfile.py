@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+'''@package trafficfile
+
+Traffic matrix files.
+
+A traffic matrix is a record array of flows, one (src, dst, demand, start)
+record per flow, with hosts numbered as in FatTreeTopo.host_names().  Matrices
+are stored either as the JSON dicts written by traffic.py or in a binary
+format: a 16-byte header holding a magic string, a format version, k and the
+flow count, followed by packed little-endian flow records.  Binary files are
+memory-mapped, so loading one reads no flow data until it is used.
+'''
+
+import json
+import struct
+
+import numpy as np
+
+MAGIC = 'TRFM'
+VERSION = 1
+
+# Magic, version, k, number of flows
+HEADER = struct.Struct('<4sHHQ')
+
+# One flow: demand is a fraction of link capacity, or 0 if not given; start
+# is seconds after the run starts.
+RECORD = np.dtype([('src', '<u4'), ('dst', '<u4'),
+                   ('demand', '<f4'), ('start', '<f4')])
+
+
+def k_for_hosts(num_hosts):
+    '''Return the smallest fat-tree size with at least num_hosts hosts.'''
+    k = 4
+    while k * k * k / 4 < num_hosts:
+        k += 2
+    return k
+
+
+def make_flows(src, dst, demand = None, start = None):
+    '''Return a flow record array.
+
+    @param src sequence of source host indices
+    @param dst sequence of destination host indices
+    @param demand optional sequence of demands; 0 when not given
+    @param start optional sequence of start times; 0 when not given
+    @return flows RECORD array
+    '''
+    flows = np.zeros(len(src), dtype = RECORD)
+    flows['src'] = src
+    flows['dst'] = dst
+    if demand is not None:
+        flows['demand'] = demand
+    if start is not None:
+        flows['start'] = start
+    return flows
+
+
+def from_dict(traffic):
+    '''Return the flow records of a traffic.py JSON dict, sorted by src.
+
+    @param traffic dict of src host index string to list of dst indices
+    @return flows RECORD array
+    '''
+    src = []
+    dst = []
+    for src_idx in sorted(traffic, key = int):
+        for dst_idx in traffic[src_idx]:
+            src.append(int(src_idx))
+            dst.append(dst_idx)
+    return make_flows(src, dst)
+
+
+def write_binary(f, k, flows):
+    '''Write a binary traffic matrix.
+
+    @param f file object opened for binary writing
+    @param k fat-tree size
+    @param flows RECORD array
+    '''
+    f.write(HEADER.pack(MAGIC, VERSION, k, len(flows)))
+    f.write(np.ascontiguousarray(flows, dtype = RECORD).tobytes())
+
+
+def load_binary(path):
+    '''Memory-map a binary traffic matrix.
+
+    @param path file path
+    @return (k, flows): flows is a read-only RECORD view of the file
+    '''
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise Exception('Traffic file "%s" is truncated' % path)
+    magic, version, k, num_flows = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise Exception('Traffic file "%s" is not a version %d binary matrix'
+                        % (path, VERSION))
+    if not num_flows:
+        return (k, np.zeros(0, dtype = RECORD))
+    flows = np.memmap(path, dtype = RECORD, mode = 'r', offset = HEADER.size,
+                      shape = (num_flows,))
+    return (k, flows)
+
+
+def load_json(path):
+    '''Load a traffic.py JSON matrix.
+
+    JSON files don't record k, so it is the smallest k that holds every host.
+
+    @param path file path
+    @return (k, flows)
+    '''
+    with open(path, 'r') as f:
+        flows = from_dict(json.load(f))
+    num_hosts = 0
+    if len(flows):
+        num_hosts = max(flows['src'].max(), flows['dst'].max()) + 1
+    return (k_for_hosts(num_hosts), flows)
+
+
+def is_binary(path):
+    '''Return True if a file starts with the binary format's magic.'''
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load(path):
+    '''Load a traffic matrix in either format.
+
+    @param path file path
+    @return (k, flows)
+    '''
+    if is_binary(path):
+        return load_binary(path)
+    return load_json(path)
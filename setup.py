@@ -24,5 +24,6 @@ For Stanford CS244 Spring 2015 lab 3. Build on top of Brandon Heller's RIPL and
       license='GPL',
       install_requires=[
         'setuptools',
-        'networkx'
+        'networkx',
+        'numpy'
       ])
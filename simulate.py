@@ -0,0 +1,71 @@
+# simulate.py
+#
+# Flow-level stand-in for hedera.py: estimate the aggregate throughput of
+# each scheduling policy on a fat tree of any size, without Mininet, root or
+# Open vSwitch. Prints a json dict per traffic file with the same
+# <algorithm>_mean_gbps / <algorithm>_stddev_gbps keys that hedera.py saves
+# to results/.
+#
+# Example usage:
+#   $ python simulate.py traffic/stride1.json
+#   $ python simulate.py --policy ecmp gff --trials 20 traffic/*.json
+#   $ python simulate.py --k 48 traffic/rand_k48.bin
+#
+# Each file runs on a fat tree of its own k; --k rejects files built for any
+# other size, since their host indices would all land in the first pods.
+#
+# by Anh Truong (anhlt92)
+# and Ian Walsh (iwalsh)
+# for CS 244, Spring 2015
+
+import json
+import os
+from argparse import ArgumentParser
+from time import time
+
+from ripllib.dctopo import FatTreeTopo
+from ripllib.flowsim import FlowSimulator, POLICIES
+from ripllib.trafficfile import load as load_traffic
+
+parser = ArgumentParser(description='Flow-level Hedera simulation')
+parser.add_argument('traffic', type=str, nargs='+',
+                    help='Traffic files created by traffic.py, JSON or binary')
+parser.add_argument('--k', type=int, default=None,
+                    help='Fat tree size every file must be built for '
+                         '(default: each file\'s own)')
+parser.add_argument('--policy', type=str, nargs='+', default=['ecmp', 'gff'],
+                    choices=sorted(POLICIES), help='Policies to compare')
+parser.add_argument('--trials', type=int, default=10,
+                    help='Trials per (traffic, policy), for the stddev')
+parser.add_argument('--seed', type=int, default=None, help='Random seed')
+
+
+def main():
+    args = parser.parse_args()
+
+    start = time()
+    sims = {}  # [k] -> FlowSimulator
+
+    for traffic_file in args.traffic:
+        if not os.path.isfile(traffic_file):
+            raise Exception('Traffic file "%s" does not exist!' % traffic_file)
+        k, traffic = load_traffic(traffic_file)
+        if args.k is not None and k != args.k:
+            raise Exception('Traffic file "%s" is for k=%d, not k=%d' %
+                            (traffic_file, k, args.k))
+        if k not in sims:
+            sims[k] = FlowSimulator(FatTreeTopo(k=k, speed=1.0))  # 1.0 Gbps
+        sim = sims[k]
+
+        results = {}
+        for name in args.policy:
+            mean_gbps, stddev_gbps = sim.aggregate(traffic, POLICIES[name],
+                                                   args.trials, args.seed)
+            results['%s_mean_gbps' % name] = mean_gbps
+            results['%s_stddev_gbps' % name] = stddev_gbps
+        print json.dumps({traffic_file.split('/')[-1]: results})
+
+    print 'All done in %0.2fs!' % (time() - start)
+
+if __name__ == '__main__':
+    main()
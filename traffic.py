@@ -6,82 +6,110 @@
 #
 # Example usage:
 #   $ python traffic.py stride1 > traffic/stride1.json
+#   $ python traffic.py random --k 8 --seed 7 > traffic/rand_k8.json
+#   $ python traffic.py random --seed 7 --batch 3 --prefix traffic/rand
+#   $ python traffic.py random --k 48 --binary > traffic/rand_k48.bin
 #
 # by Anh Truong (anhlt92)
 # and Ian Walsh (iwalsh)
 # for CS 244 Lab 3, Spring 2015
 
-import random
 import json
+import sys
 from argparse import ArgumentParser
 
-N_HOSTS = 16
-N_HOSTS_PER_POD = 4
-N_PODS = 4
+import numpy as np
+
+from ripllib.trafficfile import make_flows, write_binary
 
 parser = ArgumentParser(description="Generate traffic matrix")
 parser.add_argument('pattern', type=str)
+parser.add_argument('--k', type=int, default=4,
+                    help='Switch degree of the FatTreeTopo')
+parser.add_argument('--seed', type=int, default=0,
+                    help='Random seed; the same seed gives the same matrices')
+parser.add_argument('--batch', type=int, default=None, metavar='M',
+                    help='Write M independent matrices to PREFIX0.json, '
+                         'PREFIX1.json, ... instead of printing one')
+parser.add_argument('--prefix', type=str, default=None,
+                    help='Output path prefix for --batch, e.g. traffic/rand')
+parser.add_argument('--binary', action='store_true',
+                    help='Write the binary format of ripllib.trafficfile '
+                         'instead of JSON')
+
+# Marks a host that sends nothing in a destination array
+NO_DST = -1
+
+
+# Host indices follow FatTreeTopo.host_names(): pod by pod, edge switch by
+# edge switch, with k / 2 hosts per edge switch and k / 2 edge switches per
+# pod. The counts are computed from k rather than by building the topology,
+# which alone takes seconds at k=48.
+#
+# Every pattern returns a destination array: entry x is the host that host x
+# sends to, or NO_DST.
+def n_hosts(k):
+    return k * k * k / 4
 
 
-def pod_idx(host_idx):
-    return host_idx / N_PODS
+def hosts_per_edge(k):
+    return k / 2
 
 
-# e.g. [0, 1, 2, 3] for pod_idx = 0
-def hosts_in_pod(pod_idx):
-    start = pod_idx * N_HOSTS_PER_POD
-    return range(start, start + N_HOSTS_PER_POD)
+def hosts_per_pod(k):
+    return k * k / 4
 
 
-def other_host_in_pod(host):
-    pod = hosts_in_pod(pod_idx(host))
-    pod.remove(host)
-    return random.choice(pod)
+def other_hosts(rng, hosts, size):
+    """
+    For every host x, return a random host other than x in x's aligned block
+    of size hosts: its edge switch, its pod, or the whole network.
+    """
+    start = hosts - hosts % size
+    dsts = start + rng.randint(size - 1, size=len(hosts))
+    return dsts + (dsts >= hosts)
 
 
-def other_host_outside_pod(host):
-    hosts = range(N_HOSTS)
-    pod = hosts_in_pod(pod_idx(host))
-    for h in pod:
-        hosts.remove(h)
-    return random.choice(hosts)
+def other_hosts_outside_pod(rng, k, hosts):
+    size = hosts_per_pod(k)
+    start = hosts - hosts % size
+    dsts = rng.randint(n_hosts(k) - size, size=len(hosts))
+    return dsts + size * (dsts >= start)
 
 
-def traffic_stride1():
-    return traffic_stride(1)
+def traffic_stride1(k, rng):
+    return traffic_stride(k, 1)
 
 
-def traffic_stride2():
-    return traffic_stride(2)
+def traffic_stride2(k, rng):
+    return traffic_stride(k, 2)
 
 
-def traffic_stride4():
-    return traffic_stride(4)
+def traffic_stride4(k, rng):
+    return traffic_stride(k, 4)
 
 
-def traffic_stride8():
-    return traffic_stride(8)
+def traffic_stride8(k, rng):
+    return traffic_stride(k, 8)
 
 
-def traffic_stride(i):
+def traffic_stride(k, i):
     """
-    A host with index x sends to the host with index (x + i) mod N_HOSTS
+    A host with index x sends to the host with index (x + i) mod N
     """
-    traffic = {}
-    for x in range(N_HOSTS):
-        traffic[str(x)] = [(x + i) % N_HOSTS]
-    return traffic
+    n = n_hosts(k)
+    return (np.arange(n) + i) % n
 
 
-def traffic_stag0203():
-    return traffic_staggered(0.2, 0.3)
+def traffic_stag0203(k, rng):
+    return traffic_staggered(k, rng, 0.2, 0.3)
 
 
-def traffic_stag0503():
-    return traffic_staggered(0.5, 0.3)
+def traffic_stag0503(k, rng):
+    return traffic_staggered(k, rng, 0.5, 0.3)
 
 
-def traffic_staggered(edge_p, pod_p):
+def traffic_staggered(k, rng, edge_p, pod_p):
     """
     A host sends to another host in the same edge switch with probability
     edge_p, and to its same pod with probability pod_p, and to the rest of
@@ -90,70 +118,53 @@ def traffic_staggered(edge_p, pod_p):
     ^ Somewhat ambiguously worded, but every host sends to exactly 1 other
     host: not 0, and not 3.
     """
-    traffic = {}
-    for x in range(N_HOSTS):
-        traffic[str(x)] = []
-
-        rand = random.random()
+    hosts = np.arange(n_hosts(k))
+    rand = rng.random_sample(len(hosts))
+    return np.select([rand <= edge_p, rand <= edge_p + pod_p],
+                     [other_hosts(rng, hosts, hosts_per_edge(k)),
+                      other_hosts(rng, hosts, hosts_per_pod(k))],
+                     other_hosts_outside_pod(rng, k, hosts))
 
-        if rand <= edge_p:
-            # Send to host on same edge switch w/ prob edge_p
-            if x % 2 == 0:
-                dst = x + 1
-            else:
-                dst = x - 1
-            traffic[str(x)].append(dst)
-        elif rand <= (edge_p + pod_p):
-            # Send to host in same pod with probability pod_p
-            traffic[str(x)].append(other_host_in_pod(x))
-        else:
-            # Send to non-pod host with prob (1 - edge_p - pod_p)
-            traffic[str(x)].append(other_host_outside_pod(x))
 
-    return traffic
-
-
-def traffic_random():
+def traffic_random(k, rng):
     """
     A host sends to any other host in the network with uniform probability.
     """
-    traffic = {}
-    for x in range(N_HOSTS):
-        hosts = range(N_HOSTS)
-        hosts.remove(x)
-        traffic[str(x)] = [random.choice(hosts)]
-    return traffic
+    hosts = np.arange(n_hosts(k))
+    return other_hosts(rng, hosts, len(hosts))
 
 
-def traffic_bijective():
+def traffic_bijective(k, rng):
     """
     There is a bijection between senders and recievers, so that each host is
     the dst of exactly one flow.
-    """
-    traffic = {}
-    dsts = range(N_HOSTS)
-    for x in range(N_HOSTS):
-        choice = random.choice(dsts)
-        while choice == x:
-            # A host shouldn't send to itself; might endlessly loop but meh, Ctrl+C
-            choice = random.choice(dsts)
-        traffic[str(x)] = [choice]
-        dsts.remove(choice)
-    return traffic
-
 
-def traffic_hotspot():
+    Draws one random permutation, then swaps each host left sending to
+    itself with a random other host; neither ends up sending to itself, so
+    one O(N) pass gives a derangement. A permutation has one fixed point on
+    average, so the result is close to, but not exactly, uniform over
+    derangements.
+    """
+    n = n_hosts(k)
+    dsts = rng.permutation(n)
+    for x in np.flatnonzero(dsts == np.arange(n)).tolist():
+        if dsts[x] != x:
+            continue  # Already swapped away by an earlier fixed point.
+        y = rng.randint(n - 1)
+        y += y >= x
+        dsts[x], dsts[y] = dsts[y], dsts[x]
+    return dsts
+
+
+def traffic_hotspot(k, rng):
     """
     All hosts try to send to the same dst host, chosen at random.
     """
-    dst = random.choice(range(N_HOSTS))
-    traffic = {}
-    for x in range(N_HOSTS):
-        if x == dst:
-            pass
-        else:
-            traffic[str(x)] = [dst]
-    return traffic
+    n = n_hosts(k)
+    dst = rng.randint(n)
+    dsts = np.repeat(dst, n)
+    dsts[dst] = NO_DST
+    return dsts
 
 
 TRAFFIC = {'stride1': traffic_stride1,
@@ -167,12 +178,44 @@ TRAFFIC = {'stride1': traffic_stride1,
            'hotspot': traffic_hotspot}
 
 
+def to_json(dsts):
+    """
+    Return the json dict of a destination array: a list of dsts per sender.
+    """
+    return json.dumps(dict((str(x), [dst])
+                           for x, dst in enumerate(dsts.tolist())
+                           if dst != NO_DST))
+
+
+def write_matrix(f, k, dsts, binary):
+    """
+    Write a destination array to a file as JSON or binary.
+    """
+    if binary:
+        srcs = np.flatnonzero(dsts != NO_DST)
+        write_binary(f, k, make_flows(srcs, dsts[srcs]))
+    else:
+        f.write(to_json(dsts))
+
+
 def main():
     args = parser.parse_args()
     if args.pattern not in TRAFFIC:
         raise Exception('Unrecognized traffic pattern "%s"' % args.pattern)
-    traffic = TRAFFIC[args.pattern]()
-    print json.dumps(traffic)
+    pattern = TRAFFIC[args.pattern]
+    if args.batch is None:
+        dsts = pattern(args.k, np.random.RandomState(args.seed))
+        write_matrix(sys.stdout, args.k, dsts, args.binary)
+        return
+
+    if args.prefix is None:
+        raise Exception('--batch needs an output --prefix')
+    ext = 'bin' if args.binary else 'json'
+    for i in range(args.batch):
+        # Matrix i depends only on (seed, i), so any one can be regenerated.
+        rng = np.random.RandomState([args.seed, i])
+        with open('%s%d.%s' % (args.prefix, i, ext), 'wb') as f:
+            write_matrix(f, args.k, pattern(args.k, rng), args.binary)
 
 if __name__ == '__main__':
     main()